@@ -0,0 +1,58 @@
+"""
+血染钟楼 - 游戏引擎
+更新日期: 2026-10-19
+
+不依赖 Flask 的无界面游戏引擎：剧本与角色数据、Game 状态机、夜间行动配置、
+信息生成与一致性世界求解器。main.py（说书人端）与 player_api.py（玩家端）
+只是在其上的 HTTP 适配层；模拟器、基准测试等批处理任务可直接导入本包。
+"""
+
+from .game_data import SCRIPTS, ROLE_TYPES, get_role_distribution, NIGHT_ORDER_PHASES, DAY_PHASES
+from .info_solver import WorldSolver, seat_mask, popcount
+from .votes import VoteLedger, DayNominations
+from .mailbox import Mailbox, add_persistence_hook
+from .game import Game
+from .night import get_action_type, get_night_action_config, classify_night_order
+from .views import build_player_view
+
+# 模拟器与配置推荐按需加载：避免导入引擎时连带加载批处理模块，
+# 也避免 python -m clocktower.simulator 时模块被重复导入
+_LAZY_EXPORTS = {
+    "simulate_game": "simulator",
+    "run_simulations": "simulator",
+    "suggest_setups": "balance",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = [
+    "SCRIPTS",
+    "ROLE_TYPES",
+    "get_role_distribution",
+    "NIGHT_ORDER_PHASES",
+    "DAY_PHASES",
+    "WorldSolver",
+    "seat_mask",
+    "popcount",
+    "VoteLedger",
+    "DayNominations",
+    "Mailbox",
+    "add_persistence_hook",
+    "Game",
+    "get_action_type",
+    "get_night_action_config",
+    "classify_night_order",
+    "build_player_view",
+    "simulate_game",
+    "run_simulations",
+    "suggest_setups",
+]
@@ -0,0 +1,76 @@
+"""
+血染钟楼 - 待处理行动
+更新日期: 2026-10-19
+
+说书人通知玩家行动时创建 PendingAction：它仍是一个普通字典（可直接 JSON 序列化，
+原有的 status / choice 等字段不变），同时带有全局唯一的 action_id、超时时间，
+并可被等待——玩家提交、说书人取消或超时都会立即唤醒所有等待者。
+行动登记在所属对局的 pending_actions 中，接口按 (对局, action_id) 查找，不提供跨对局的全局查找。
+
+状态：pending -> submitted -> confirmed；或 pending -> cancelled / expired。
+"""
+
+import itertools
+import threading
+import time
+
+DEFAULT_TIMEOUT = 600  # 秒
+
+_ids = itertools.count(1)
+
+
+class PendingAction(dict):
+    """可等待的待处理行动"""
+
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setdefault("action_id", f"act_{next(_ids)}")
+        self.setdefault("status", "pending")
+        self.setdefault("choice", None)
+        self.setdefault("expires_at", time.time() + timeout if timeout else None)
+        self._done = threading.Event()
+        if self["status"] != "pending":
+            self._done.set()
+
+    def __reduce__(self):
+        # 深拷贝/序列化时不复制事件对象，重建即可
+        return (PendingAction, (dict(self),))
+
+    @property
+    def action_id(self):
+        return self["action_id"]
+
+    def is_open(self):
+        """是否仍在等待玩家提交（顺带处理超时）"""
+        if self["status"] == "pending" and self["expires_at"] and time.time() >= self["expires_at"]:
+            self._finish("expired")
+        return self["status"] == "pending"
+
+    def submit(self, choice):
+        self["choice"] = choice
+        self._finish("submitted")
+
+    def cancel(self, reason="cancelled"):
+        if self["status"] == "pending":
+            self["cancel_reason"] = reason
+            self._finish("cancelled")
+
+    def confirm(self):
+        self["status"] = "confirmed"
+        self._done.set()
+
+    def _finish(self, status):
+        self["status"] = status
+        self["finished_at"] = time.time()
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """等待行动结束（提交/取消/超时），返回是否已结束"""
+        if not self.is_open():
+            return True
+        remaining = timeout
+        if self["expires_at"]:
+            until_expiry = max(0.0, self["expires_at"] - time.time())
+            remaining = until_expiry if timeout is None else min(timeout, until_expiry)
+        self._done.wait(remaining)
+        return not self.is_open()
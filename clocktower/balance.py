@@ -0,0 +1,236 @@
+"""
+血染钟楼 - 配置平衡评估
+更新日期: 2026-10-19
+
+在分配角色之前为指定剧本和人数推荐平衡的配置：
+1. 用 Game.draw_board 抽取大量合法配置（遵循人数分布与男爵/教父/方古/亡骨魔的外来者调整）；
+2. 用随机配置的模拟对局估计每个角色对善良胜率的影响，按加性模型给每个配置打分（heuristic）；
+3. 对启发式评分最好的一批配置，各自并行跑固定配置的模拟对局复核（playout）；
+4. 按善良胜率与目标胜率（默认 50%）的差距排序，返回前 N 个。
+
+完整排名按 (剧本, 人数, 修改项) 与评估参数缓存，不同的 N 从同一排名中截取，重复请求直接返回；
+同一缓存键同时只计算一次（后到的请求等待先到的结果）。模拟对局默认在模块共享的进程池中运行，
+并发请求不会各自再开一批进程。
+"""
+
+import os
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .game import Game
+from .game_data import SCRIPTS
+from .simulator import simulate_game, run_simulations
+
+
+METHODS = ["heuristic", "playout"]
+CACHE_SIZE = 64
+SHORTLIST_SIZE = 60  # playout 复核的配置数（不随返回数量变化，排名可按任意 N 截取）
+POOL_WORKERS = min(4, os.cpu_count() or 1)  # 共享进程池的工作进程数
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_inflight = {}  # 缓存键 -> threading.Event（正在计算）
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _cache_put(key, value):
+    with _cache_lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _compute_once(key, compute):
+    """读取缓存，未命中时计算并写入，返回 (结果, 是否命中缓存)
+
+    同一缓存键同时只计算一次：后到的调用等待先到的计算结束后读取缓存（先到的失败时重新计算）
+    """
+    while True:
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _cache[key], True
+            event = _inflight.get(key)
+            owner = event is None
+            if owner:
+                event = _inflight[key] = threading.Event()
+        if not owner:
+            event.wait()
+            continue
+        try:
+            value = compute()
+            _cache_put(key, value)
+            return value, False
+        finally:
+            with _cache_lock:
+                _inflight.pop(key, None)
+            event.set()
+
+
+def _shared_pool():
+    """模块共享的进程池（首次使用时创建，进程退出时由 concurrent.futures 回收）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+        return _pool
+
+
+def _map(func, tasks, workers):
+    """workers=1 在当前进程内运行，None 使用共享进程池，否则使用独立的进程池"""
+    if workers == 1:
+        return [func(task) for task in tasks]
+    if workers is None:
+        return list(_shared_pool().map(func, tasks))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, tasks))
+
+
+def clear_cache():
+    """清空评估缓存（剧本数据变更后使用）"""
+    with _cache_lock:
+        _cache.clear()
+
+
+def draw_boards(script_id, player_count, count, seed=0, exclude_roles=None, require_roles=None):
+    """抽取 count 次配置并去重，返回角色ID元组列表（元组内按ID排序）"""
+    rng = random.Random(seed)
+    game = Game("balance", script_id, player_count, seed=seed)
+    boards = []
+    seen = set()
+    for _ in range(count):
+        roles, _notes = game.draw_board(rng, exclude_roles, require_roles)
+        board = tuple(sorted(r["id"] for r in roles))
+        if board not in seen:
+            seen.add(board)
+            boards.append(board)
+    return boards
+
+
+def role_effects(script_id, player_count, games=400, seed=0, workers=None, policy="heuristic"):
+    """通过随机配置的模拟对局估计每个角色对善良胜率的影响
+
+    返回 {"base": 整体善良胜率, "effects": {角色ID: 胜率差}}；
+    出场局数少的角色会向 0 收缩，避免小样本噪声主导评分。
+    workers 为 None 时使用共享进程池。
+    """
+    key = ("effects", script_id, player_count, games, seed, policy)
+    return _compute_once(key, lambda: _role_effects(script_id, player_count, games, seed, workers, policy))[0]
+
+
+def _role_effects(script_id, player_count, games, seed, workers, policy):
+    if workers is None:
+        summary = run_simulations([script_id], [player_count], games, workers=POOL_WORKERS,
+                                  seed=seed, policy=policy, executor=_shared_pool())
+    else:
+        summary = run_simulations([script_id], [player_count], games, workers=workers,
+                                  seed=seed, policy=policy)
+    prefix = f"{script_id}/{player_count}"
+    base = summary["by_config"].get(prefix, {}).get("good_win_rate", 0.5)
+    effects = {}
+    for role_key, bucket in summary["by_role"].items():
+        role_id = role_key[len(prefix) + 1:]
+        weight = bucket["games"] / (bucket["games"] + 20)
+        effects[role_id] = (bucket["good_win_rate"] - base) * weight
+
+    return {"base": base, "effects": effects}
+
+
+def heuristic_estimate(board, effects):
+    """加性模型估计该配置下的善良胜率"""
+    estimate = effects["base"] + sum(effects["effects"].get(role_id, 0.0) for role_id in board)
+    return min(1.0, max(0.0, estimate))
+
+
+def _playout_board(task):
+    """在工作进程中对单个配置跑固定配置的模拟对局"""
+    script_id, player_count, board, seed, playouts, policy = task
+    rng = random.Random(seed)
+    good_wins = decided = 0
+    for _ in range(playouts):
+        result = simulate_game(script_id, player_count, rng.randrange(2 ** 32), policy, board=list(board))
+        if result["winner"]:
+            decided += 1
+            good_wins += result["winner"] == "good"
+    return {"games": playouts, "decided": decided, "good_win_rate": good_wins / decided if decided else None}
+
+
+def _describe(script_id, board):
+    """配置的展示信息（角色名称与阵营分组）"""
+    roles_by_id = {}
+    for role_type, roles in SCRIPTS[script_id]["roles"].items():
+        for role in roles:
+            roles_by_id[role["id"]] = (role, role_type)
+    groups = {"townsfolk": [], "outsider": [], "minion": [], "demon": []}
+    for role_id in board:
+        role, role_type = roles_by_id[role_id]
+        groups[role_type].append({"id": role_id, "name": role["name"]})
+    return {
+        "roles": groups,
+        "counts": {role_type: len(roles) for role_type, roles in groups.items()},
+    }
+
+
+def suggest_setups(script_id, player_count, top_n=5, method="playout", candidates=200, playouts=60,
+                   exclude_roles=None, require_roles=None, target=0.5, seed=0, workers=None,
+                   effect_games=400, policy="heuristic"):
+    """推荐平衡的配置，返回 {"cached": 是否命中缓存, "setups": [...]}（top_n 最多 SHORTLIST_SIZE 个）
+
+    workers 为 None 时使用共享进程池，1 时在当前进程内运行
+    """
+    if script_id not in SCRIPTS:
+        raise ValueError(f"无效的剧本: {script_id}")
+    if not 5 <= player_count <= 16:
+        raise ValueError("玩家数量必须在5-16之间")
+    if method not in METHODS:
+        raise ValueError(f"无效的评估方式: {method}")
+
+    exclude_roles = tuple(sorted(set(exclude_roles or [])))
+    require_roles = tuple(sorted(set(require_roles or [])))
+    # 返回数量不参与缓存键：完整排名只算一次，按 top_n 截取
+    key = ("ranking", script_id, player_count, exclude_roles, require_roles, method,
+           candidates, playouts, target, seed, effect_games, policy)
+    ranking, cached = _compute_once(key, lambda: _rank_setups(
+        script_id, player_count, method, candidates, playouts, exclude_roles, require_roles,
+        target, seed, workers, effect_games, policy))
+    return {"cached": cached, "setups": ranking[:top_n]}
+
+
+def _rank_setups(script_id, player_count, method, candidates, playouts, exclude_roles, require_roles,
+                 target, seed, workers, effect_games, policy):
+    """抽取并评估配置，返回按与目标胜率差距排序的配置列表"""
+    boards = draw_boards(script_id, player_count, candidates, seed, exclude_roles, require_roles)
+    effects = role_effects(script_id, player_count, effect_games, seed, workers, policy)
+    scored = [{"board": board, "heuristic_good_win_rate": heuristic_estimate(board, effects)} for board in boards]
+    scored.sort(key=lambda s: abs(s["heuristic_good_win_rate"] - target))
+
+    if method == "playout":
+        # 只复核启发式评分最好的一批配置
+        shortlist = scored[:SHORTLIST_SIZE]
+        rng = random.Random(seed)
+        tasks = [(script_id, player_count, s["board"], rng.randrange(2 ** 32), playouts, policy) for s in shortlist]
+        for s, outcome in zip(shortlist, _map(_playout_board, tasks, workers)):
+            s["playout"] = outcome
+            rate = outcome["good_win_rate"]
+            s["good_win_rate"] = rate if rate is not None else s["heuristic_good_win_rate"]
+        shortlist.sort(key=lambda s: abs(s["good_win_rate"] - target))
+        scored = shortlist
+    else:
+        for s in scored:
+            s["good_win_rate"] = s["heuristic_good_win_rate"]
+
+    setups = []
+    for s in scored[:SHORTLIST_SIZE]:
+        setup = _describe(script_id, s["board"])
+        setup["role_ids"] = list(s["board"])
+        setup["good_win_rate"] = round(s["good_win_rate"], 4)
+        setup["heuristic_good_win_rate"] = round(s["heuristic_good_win_rate"], 4)
+        setup["score"] = round(abs(s["good_win_rate"] - target), 4)
+        if "playout" in s:
+            setup["playout_games"] = s["playout"]["games"]
+        setups.append(setup)
+    return setups
@@ -0,0 +1,262 @@
+"""
+血染钟楼 - 死亡结算流水线
+更新日期: 2026-10-19
+
+每一次死亡（恶魔夜袭、天亮结算、处决、技能击杀、说书人判定）都包装成一个 DeathEvent，
+按阶段分发给登记在角色上的钩子：
+
+    attack      恶魔夜袭结算时（士兵、茶艺师、弄臣、镇长、守鸦人）
+    dying       死亡生效前，可阻止或改为假死（恶魔代言人、和平主义者、弄臣、僵怖）
+    died        死亡生效后（圣徒、月之子）
+    demon_dead  恶魔死亡后场上已无存活恶魔时（红唇女郎），event 为该次死亡
+
+owner 钩子只在死者就是该角色时触发；watch 钩子只要该角色在场，对所有死亡都触发。
+每局在分配角色/换角色时按在场角色位集取出相关钩子（按 (剧本, 位集) 缓存），
+因此一次死亡只需遍历在场角色的钩子，新增角色不会拖慢其他对局。
+
+钩子签名为 hook(game, event)，返回真值表示截断本阶段（阻止死亡、假死或不再继续结算）。
+同一阶段内按登记顺序执行。
+"""
+
+from collections import namedtuple
+
+STAGES = ("attack", "dying", "died", "demon_dead")
+HOOK_INDEX_CACHE_SIZE = 64  # 缓存的 (剧本, 位集) 钩子索引数
+
+DeathHook = namedtuple("DeathHook", "role_id kinds watch func")
+
+
+class DeathEvent:
+    """一次死亡（或死亡尝试）
+
+    kind: 死亡来源 —— "demon" 恶魔夜袭、"night" 天亮结算的夜间死亡、"execution" 处决、
+          "virgin" / "slayer" / "moonchild" 技能击杀、"storyteller" 说书人判定
+    result: 钩子写入的结果字段（由调用方合并进 API 返回）
+    """
+
+    __slots__ = ("player", "cause", "kind", "phase", "context", "result", "prevented", "fake", "died")
+
+    def __init__(self, player, cause, kind, phase=None, context=None):
+        self.player = player
+        self.cause = cause
+        self.kind = kind
+        self.phase = phase
+        self.context = context or {}
+        self.result = {}
+        self.prevented = False  # 死亡被阻止
+        self.fake = False       # 假死（看起来死了，实际存活）
+        self.died = False       # 死亡已生效
+
+
+_registry = {stage: [] for stage in STAGES}
+_indexes = {}
+
+
+def death_hook(stage, role_id, kinds=None, watch=False):
+    """登记角色钩子（kinds 为 None 时对所有死亡来源触发）"""
+    def register(func):
+        _registry[stage].append(DeathHook(role_id, frozenset(kinds) if kinds else None, watch, func))
+        return func
+    return register
+
+
+def hooks_in_play(table, in_play):
+    """在场角色位集对应的钩子索引 {阶段: (钩子, ...)}（同一剧本同一位集只构建一次）"""
+    key = (table.script_id, in_play)
+    index = _indexes.get(key)
+    if index is not None:
+        return index
+    index = {}
+    for stage, hooks in _registry.items():
+        relevant = []
+        for hook in hooks:
+            bit = table.bit.get(hook.role_id)
+            if bit is not None and in_play >> bit & 1:
+                relevant.append(hook)
+        if relevant:
+            index[stage] = tuple(relevant)
+    if len(_indexes) >= HOOK_INDEX_CACHE_SIZE:
+        _indexes.clear()
+    _indexes[key] = index
+    return index
+
+
+def dispatch(game, stage, event):
+    """把事件分发给本局在场角色的钩子，返回是否被截断"""
+    hooks = game._death_hooks.get(stage)
+    if not hooks:
+        return False
+    role = event.player.get("role") if event.player else None
+    role_id = role.get("id") if role else None
+    for hook in hooks:
+        if hook.kinds is not None and event.kind not in hook.kinds:
+            continue
+        if not hook.watch and hook.role_id != role_id:
+            continue
+        if hook.func(game, event):
+            return True
+    return False
+
+
+def _affected(player):
+    """醉酒或中毒（能力失效）"""
+    return player.get("drunk") or player.get("poisoned")
+
+
+# ==================== 恶魔夜袭（attack） ====================
+
+@death_hook("attack", "soldier", kinds=("demon",))
+def _soldier(game, event):
+    player = event.player
+    if not _affected(player):
+        game.log_event("attack.soldier", player["id"])
+        event.prevented = True
+        return True
+
+
+@death_hook("attack", "tea_lady", kinds=("demon",), watch=True)
+def _tea_lady(game, event):
+    player = event.player
+    if game._is_protected_by_tea_lady(player["id"]):
+        game.log_event("attack.tea_lady", player["id"])
+        event.prevented = True
+        return True
+
+
+@death_hook("attack", "fool", kinds=("demon",))
+def _fool(game, event):
+    """弄臣：首次死亡时不会死亡"""
+    player = event.player
+    if player.get("fool_used") or _affected(player):
+        return None
+    player["fool_used"] = True
+    event.prevented = True
+    if event.kind == "execution":
+        event.context["nomination"]["status"] = "fool_saved"
+        game.log_event("execution.fool", player["id"])
+        event.result.update({"fool_saved": True, "player": player})
+    else:
+        game.log_event("attack.fool", player["id"])
+    return True
+
+
+@death_hook("attack", "mayor", kinds=("demon",))
+def _mayor(game, event):
+    """镇长被攻击：标记后由说书人处理替死（process_mayor_death），不再继续结算"""
+    if not _affected(event.player):
+        event.result["mayor_targeted"] = True
+        return True
+
+
+@death_hook("attack", "ravenkeeper", kinds=("demon",))
+def _ravenkeeper(game, event):
+    player = event.player
+    if not _affected(player):
+        player["ravenkeeper_triggered"] = True
+        game.log_event("attack.ravenkeeper", player["id"])
+
+
+# ==================== 死亡生效前（dying） ====================
+
+@death_hook("dying", "devils_advocate", kinds=("execution",), watch=True)
+def _devils_advocate(game, event):
+    player = event.player
+    if not player.get("devils_advocate_protected"):
+        return None
+    event.context["nomination"]["status"] = "protected"
+    # 清除保护标记（只保护一次处决）
+    player["devils_advocate_protected"] = False
+    game.log_event("execution.devils_advocate", player["id"])
+    event.prevented = True
+    event.result.update({"protected_by_devils_advocate": True, "player": player})
+    return True
+
+
+@death_hook("dying", "pacifist", kinds=("execution",), watch=True)
+def _pacifist(game, event):
+    """和平主义者：善良玩家被处决时由说书人决定是否存活（返回特殊状态让前端处理）"""
+    player = event.player
+    if player.get("role_type") not in ("townsfolk", "outsider"):
+        return None
+    pacifist = next(
+        (p for p in game.players if p["alive"] and p.get("role", {}).get("id") == "pacifist"),
+        None
+    )
+    if not pacifist or _affected(pacifist):
+        return None
+    nomination = event.context["nomination"]
+    event.prevented = True
+    event.result.update({
+        "pacifist_intervention": True,
+        "pacifist_name": pacifist["name"],
+        "nominee_id": player["id"],
+        "nominee_name": player["name"],
+        "vote_count": nomination["vote_count"],
+        "required_votes": event.context["required_votes"],
+        "nomination_id": nomination["id"]
+    })
+    return True
+
+
+# 弄臣在处决时排在恶魔代言人与和平主义者之后
+death_hook("dying", "fool", kinds=("execution",))(_fool)
+
+
+@death_hook("dying", "zombuul", kinds=("night", "execution"))
+def _zombuul(game, event):
+    """僵怖：第一次死亡为假死"""
+    player = event.player
+    if getattr(game, 'zombuul_first_death', False) or _affected(player):
+        return None
+    player["appears_dead"] = True  # 看起来死了，但实际还活着
+    game.zombuul_first_death = True
+    event.fake = True
+    if event.kind == "execution":
+        game.log_event("execution.zombuul", player["id"])
+        event.result["zombuul_fake_death"] = True
+    else:
+        game.log_event("death.zombuul", player["id"])
+    return True
+
+
+# ==================== 死亡生效后（died） ====================
+
+@death_hook("died", "saint", kinds=("execution",))
+def _saint(game, event):
+    player = event.player
+    if _affected(player):
+        game.log_event("saint.affected", player["id"])
+        return None
+    game.log_event("saint.executed", player["id"])
+    event.result.update({
+        "saint_executed": True,
+        "game_end": {"ended": True, "winner": "evil", "reason": "圣徒被处决"}
+    })
+    return True
+
+
+@death_hook("died", "moonchild", kinds=("night", "execution"))
+def _moonchild(game, event):
+    player = event.player
+    if _affected(player):
+        return None
+    player["moonchild_triggered"] = True
+    game.pending_moonchild = player["id"]
+    game.log_event("moonchild.execution" if event.kind == "execution" else "moonchild.night", player["id"])
+    event.result.update({
+        "moonchild_triggered": True,
+        "moonchild_id": player["id"],
+        "moonchild_name": player["name"]
+    })
+
+
+# ==================== 无存活恶魔（demon_dead） ====================
+
+@death_hook("demon_dead", "scarlet_woman", watch=True)
+def _scarlet_woman(game, event):
+    """红唇女郎继承恶魔身份，游戏继续"""
+    triggered = game.check_scarlet_woman_trigger()
+    if triggered["triggered"]:
+        event.result.update({"scarlet_woman_triggered": True,
+                             "new_demon_name": triggered["new_demon_name"]})
+        return True
@@ -0,0 +1,86 @@
+"""
+血染钟楼 - 事件推送总线
+更新日期: 2026-10-19
+
+进程内的发布/订阅：每个订阅者（某局游戏中的某名玩家，或 player_id 为 None 的说书人端）
+持有一个有界队列；publish 一次即可把同一个事件扇出给多个接收者。
+Web 层通过 Server-Sent Events 把事件推送给浏览器，事件格式与玩家端 handleWebSocketMessage 一致。
+"""
+
+import queue
+import threading
+
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class Subscription:
+    """单个订阅者的事件队列"""
+
+    def __init__(self, bus, game_id, player_id):
+        self.bus = bus
+        self.game_id = game_id
+        self.player_id = player_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def get(self, timeout=None):
+        """等待下一个事件，超时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """按 (游戏ID, 玩家ID) 索引订阅者的事件总线"""
+
+    def __init__(self):
+        self._subscribers = {}  # 游戏ID -> {玩家ID: set(Subscription)}
+        self._lock = threading.Lock()
+
+    def subscribe(self, game_id, player_id=None):
+        subscription = Subscription(self, game_id, player_id)
+        with self._lock:
+            self._subscribers.setdefault(game_id, {}).setdefault(player_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            players = self._subscribers.get(subscription.game_id, {})
+            subscriptions = players.get(subscription.player_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del players[subscription.player_id]
+            if not players:
+                self._subscribers.pop(subscription.game_id, None)
+
+    def publish(self, game_id, player_ids, event):
+        """把事件扇出给指定玩家（player_ids 为 None 时发给该局全部订阅者），返回送达的订阅数"""
+        with self._lock:
+            players = self._subscribers.get(game_id)
+            if not players:
+                return 0
+            if player_ids is None:
+                targets = [s for subscriptions in players.values() for s in subscriptions]
+            else:
+                targets = [s for pid in player_ids for s in players.get(pid, ())]
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # 客户端消费太慢：丢弃事件，客户端仍可通过轮询补齐
+                subscription.dropped += 1
+        return len(targets)
+
+    def subscriber_count(self, game_id=None):
+        with self._lock:
+            games = [self._subscribers.get(game_id, {})] if game_id is not None else list(self._subscribers.values())
+            return sum(len(s) for players in games for s in players.values())
+
+
+# 进程内共享的事件总线
+bus = EventBus()
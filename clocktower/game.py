@@ -0,0 +1,2463 @@
+"""
+血染钟楼 - 游戏引擎核心
+更新日期: 2026-10-19
+
+Game 类：玩家管理、角色分配、夜间结算、信息生成、白天提名/投票/处决与胜负判定。
+本模块不依赖 Flask，可被 Web 应用、模拟器与基准测试直接导入。
+"""
+
+import random
+import threading
+import time
+from datetime import datetime
+
+from .game_data import SCRIPTS, ROLE_TYPES, get_role_distribution, NIGHT_ORDER_PHASES, DAY_PHASES
+from .info_solver import WorldSolver, seat_mask
+from .instrumentation import timed
+from .votes import DayNominations
+from .roles import get_role_table
+from .history import GameHistory
+from .gamelog import GameLog, STRUCTURED_ENTRY_BYTES
+from .deaths import DeathEvent, hooks_in_play, dispatch as dispatch_death
+from .mailbox import Mailbox
+from .events import bus as event_bus
+
+# 更新日期: 2026-10-19 - 改变外来者数量的设置阶段角色（教父的 ±1 需单独处理）
+OUTSIDER_MODIFIERS = {
+    "baron": 2,         # 男爵
+    "fang_gu": 1,       # 方古
+    "vigormortis": -1,  # 亡骨魔
+}
+
+# 更新日期: 2026-10-19 - 群发消息的分组（分组名 -> 玩家筛选条件）
+BROADCAST_GROUPS = {
+    "all": lambda p: True,
+    "alive": lambda p: p["alive"],
+    "dead": lambda p: not p["alive"],
+    "evil": lambda p: p.get("role_type") in ("minion", "demon"),
+    "good": lambda p: p.get("role_type") in ("townsfolk", "outsider"),
+    "minions": lambda p: p.get("role_type") == "minion",
+    "demon": lambda p: p.get("role_type") == "demon",
+}
+
+
+# 每个信箱条目（序号与消息引用）的大致开销；群发消息体共享，只按一份计入
+MESSAGE_REF_BYTES = 64
+
+
+def _message_size(message):
+    """消息占用的大致字节数（标题与内容）"""
+    return len(str(message.get("title", "")).encode("utf-8")) + len(str(message.get("content", "")).encode("utf-8"))
+
+
+class Game:
+    def __init__(self, game_id, script_id, player_count, seed=None):
+        # 更新日期: 2026-10-19 - 对局锁：请求线程与夜间流程线程修改（及构建缓存）时持有，可重入
+        self.lock = threading.RLock()
+        self.game_id = game_id
+        self.script_id = script_id
+        self.script = SCRIPTS[script_id]
+        self.player_count = player_count
+        self.players = []
+        self.role_distribution = get_role_distribution(player_count)
+        self.current_phase = "setup"  # setup, night, day
+        self.day_number = 0
+        self.night_number = 0
+        self.nominations = []
+        self.votes = {}
+        # 更新日期: 2026-10-19 - 当天提名索引（按ID/提名者/被提名者、投票账本、领先提名）
+        self.day_nominations = DayNominations(0, self.nominations)
+        self.executions = []
+        self.night_actions = []
+        self.night_deaths = []
+        self.game_log = GameLog()  # 更新日期: 2026-10-19 - 结构化日志，读取时才渲染
+        # 更新日期: 2026-10-19 - 日志与消息大小（字节）增量统计，供健康检查估算内存
+        self.log_bytes = 0
+        self.message_bytes = 0
+        self.mailboxes = {}  # 更新日期: 2026-10-19 - 玩家ID -> Mailbox
+        self.broadcast_refs = {}  # 更新日期: 2026-10-19 - 群发ID -> 仍引用该消息体的信箱数
+        self.created_at = datetime.now().isoformat()
+        # 更新日期: 2026-10-19 - 每局游戏独立的随机数生成器（相同种子+相同操作可完全复现）
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        # 更新日期: 2026-01-05 - 驱魔人追踪
+        self.exorcist_previous_targets = []  # 驱魔人之前选过的目标
+        self.demon_exorcised_tonight = False  # 恶魔今晚是否被驱魔
+        # 更新日期: 2026-01-05 - 僵怖、沙巴洛斯、珀追踪
+        self.zombuul_first_death = False  # 僵怖是否已经"假死"过
+        self.po_skipped_last_night = False  # 珀上一晚是否跳过了行动
+        self.shabaloth_revive_available = False  # 沙巴洛斯是否可以复活
+        # 更新日期: 2026-01-09 - 恶魔代言人追踪
+        self.devils_advocate_previous_targets = []  # 恶魔代言人之前选过的目标
+        self.devils_advocate_protected = None  # 今天被恶魔代言人保护的玩家ID
+        # 更新日期: 2026-01-09 - 弄臣、月之子、莽夫追踪
+        self.goon_chosen_tonight = False  # 莽夫今晚是否已被选择
+        self.pending_moonchild = None  # 等待处理的月之子（死亡时触发）
+        self.mayor_substitute_id = None  # 今晚替镇长死亡的玩家ID（天亮结算恶魔击杀时生效）
+        # 更新日期: 2026-10-19 - 信息历史与一致性世界求解器
+        self.info_history = {}  # 玩家ID -> 已告知信息的约束记录
+        self._world_solvers = {}  # 玩家ID -> WorldSolver（跨夜缓存幸存世界）
+        # 更新日期: 2026-10-19 - 夜间流程器固定的本夜顺序与当前唤醒位置（手动流程时为 None / 0）
+        self.current_night_order = None
+        self.current_night_index = 0
+        # 更新日期: 2026-10-19 - 按阶段缓存的可选目标列表与夜间行动配置（死亡/复活、换阶段时失效）
+        self._target_lists = {}
+        self._action_configs = {}
+        self._role_partitions = None  # 按角色类型的玩家划分与座位索引（与可选目标同时失效，换角色时也失效）
+        # 更新日期: 2026-10-19 - 在场角色位集（位下标见剧本角色表），分配角色、麻脸巫婆、传刀、红唇女郎时维护
+        self.roles_in_play = 0
+        self._role_counts = {}  # 位下标 -> 持有该角色的玩家数
+        self._death_hooks = {}  # 阶段 -> 在场角色的死亡钩子（随在场角色位集更新）
+        # 更新日期: 2026-10-19 - 按天的只追加历史（处决、提名、投票、死亡）
+        self.history = GameHistory()
+        
+    # 锁无法复制：深拷贝/序列化时去掉，恢复时重新创建
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("lock", None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+    
+    @property
+    def role_table(self):
+        return get_role_table(self.script_id)
+    
+    @timed("Game.to_dict")
+    def to_dict(self, locale=None):
+        return {
+            "game_id": self.game_id,
+            "script_id": self.script_id,
+            "script_name": self.script["name"],
+            "player_count": self.player_count,
+            "seed": self.seed,
+            "players": self.players,
+            "role_distribution": self.role_distribution,
+            "current_phase": self.current_phase,
+            "day_number": self.day_number,
+            "night_number": self.night_number,
+            "nominations": self.nominations,
+            "nomination_leader": self.nomination_leader(),
+            "votes": self.votes,
+            "executions": self.executions,
+            "night_deaths": self.night_deaths,
+            "game_log": self.game_log.render(self.players, locale)
+        }
+    
+    def add_log(self, message, log_type="info"):
+        """写入自由文本日志（仅用于说书人手写备注，其余日志请用 log_event）"""
+        self.game_log.append_text(message, log_type)
+        self.log_bytes += len(str(message).encode("utf-8"))
+    
+    def log_event(self, event_id, *args):
+        """写入结构化日志（事件与参数见 clocktower.gamelog.LOG_EVENTS，读取时才渲染为文本）"""
+        self.game_log.append(event_id, args)
+        self.log_bytes += STRUCTURED_ENTRY_BYTES
+    
+    def get_available_roles(self):
+        """获取当前剧本的所有可用角色"""
+        roles = {
+            "townsfolk": self.script["roles"]["townsfolk"],
+            "outsider": self.script["roles"]["outsider"],
+            "minion": self.script["roles"]["minion"],
+            "demon": self.script["roles"]["demon"]
+        }
+        return roles
+    
+    # 更新日期: 2026-10-19 - 抽取配置逻辑独立为 draw_board，供配置平衡评估复用
+    def draw_board(self, rng=None, exclude_roles=None, require_roles=None):
+        """抽取一套合法的角色配置（不修改游戏状态）
+        
+        遵循人数分布，并应用男爵、教父、方古、亡骨魔的外来者调整。
+        返回 (角色列表, 配置说明列表)，配置说明为 (日志事件ID, 参数...) 元组。
+        """
+        rng = rng or self.rng
+        exclude_roles = set(exclude_roles or [])
+        require_roles = set(require_roles or [])
+        available_roles = {
+            role_type: [r for r in roles if r["id"] not in exclude_roles]
+            for role_type, roles in self.get_available_roles().items()
+        }
+        distribution = self.role_distribution.copy()  # 复制一份，避免修改原始数据
+        notes = []
+        
+        def pick(role_type, count):
+            # 洗牌后优先放入指定必须在场的角色
+            pool = available_roles[role_type].copy()
+            rng.shuffle(pool)
+            pool.sort(key=lambda r: r["id"] not in require_roles)
+            return pool[:count]
+        
+        # 首先检查是否会有设置阶段能力的角色（男爵、教父等）
+        # 先预选爪牙和恶魔角色
+        selected_minions = pick("minion", distribution.get("minion", 0))
+        selected_demons = pick("demon", distribution.get("demon", 0))
+        
+        # 计算外来者调整（男爵 +2，方古 +1，亡骨魔 -1）
+        outsider_adjustment = 0
+        for role in selected_minions + selected_demons:
+            modifier = OUTSIDER_MODIFIERS.get(role["id"], 0)
+            if modifier:
+                outsider_adjustment += modifier
+                notes.append(("setup.outsider_modifier", role["id"], modifier, -modifier))
+        
+        # 教父：±1 外来者（根据当前外来者数量决定）
+        if any(m["id"] == "godfather" for m in selected_minions):
+            current_outsiders = distribution.get("outsider", 0) + outsider_adjustment
+            if current_outsiders == 0:
+                # 如果没有外来者，必须+1（否则教父无法使用能力）
+                outsider_adjustment += 1
+                notes.append(("setup.godfather_forced",))
+            else:
+                # 如果有外来者，随机选择+1或-1
+                godfather_choice = rng.choice([1, -1])
+                outsider_adjustment += godfather_choice
+                if godfather_choice == 1:
+                    notes.append(("setup.outsider_modifier", "godfather", 1, -1))
+                else:
+                    notes.append(("setup.outsider_modifier", "godfather", -1, 1))
+        
+        # 应用调整
+        if outsider_adjustment != 0:
+            total_good = distribution.get("outsider", 0) + distribution.get("townsfolk", 0)
+            outsider_count = distribution.get("outsider", 0) + outsider_adjustment
+            # 确保不会出现负数，也不超过剧本中外来者的数量
+            outsider_count = max(0, min(outsider_count, len(available_roles["outsider"])))
+            distribution["outsider"] = outsider_count
+            distribution["townsfolk"] = max(0, total_good - outsider_count)
+        
+        selected_roles = selected_minions + selected_demons
+        selected_roles.extend(pick("townsfolk", distribution.get("townsfolk", 0)))
+        selected_roles.extend(pick("outsider", distribution.get("outsider", 0)))
+        return selected_roles, notes
+    
+    def assign_roles_randomly(self, player_names, board=None):
+        """随机分配角色（board 为指定的角色配置，可为角色ID列表，不指定时随机抽取）"""
+        self.players = []
+        self.invalidate_targets()
+        available_roles = self.get_available_roles()
+        
+        if board is None:
+            selected_roles, notes = self.draw_board()
+            for note in notes:
+                self.log_event(*note)
+        else:
+            selected_roles = [self._find_role_by_id(r) if isinstance(r, str) else r for r in board]
+        
+        self.rng.shuffle(selected_roles)
+        self.rng.shuffle(player_names)
+        
+        # 为酒鬼准备假的镇民角色列表（排除已选的镇民）
+        selected_townsfolk_ids = [r["id"] for r in selected_roles if self._get_role_type(r) == "townsfolk"]
+        fake_townsfolk_for_drunk = [r for r in available_roles["townsfolk"] if r["id"] not in selected_townsfolk_ids]
+        
+        for i, name in enumerate(player_names):
+            role = selected_roles[i] if i < len(selected_roles) else None
+            
+            # 检查是否是酒鬼，如果是则分配假的镇民角色
+            is_the_drunk = role and role.get("id") == "drunk"
+            displayed_role = role
+            true_role = None
+            
+            if is_the_drunk and fake_townsfolk_for_drunk:
+                # 为酒鬼随机选择一个假的镇民角色显示
+                self.rng.shuffle(fake_townsfolk_for_drunk)
+                displayed_role = fake_townsfolk_for_drunk[0]
+                true_role = role  # 保存真实角色（酒鬼）
+            
+            player = {
+                "id": i + 1,
+                "name": name,
+                "role": displayed_role,
+                "role_type": self._get_role_type(role) if role else None,  # 真实角色类型
+                "true_role": true_role,  # 如果是酒鬼，存储真实角色
+                "is_the_drunk": is_the_drunk,  # 是否是酒鬼
+                "alive": True,
+                "poisoned": False,
+                "poisoned_until": None,  # 中毒结束时间 {"day": x, "night": y}
+                "drunk": is_the_drunk,  # 酒鬼永久处于醉酒状态
+                "drunk_until": None if not is_the_drunk else {"permanent": True},  # 酒鬼永久醉酒
+                "protected": False,
+                "vote_token": True,
+                "ability_used": False,  # 一次性技能是否已使用
+                "notes": ""
+            }
+            self.players.append(player)
+        
+        self._rebuild_roles_in_play()
+        self.log_event("setup.random", len(player_names))
+        
+        # 检查是否有占卜师，如果有，需要设置红鲱鱼
+        fortune_teller = next((p for p in self.players if p.get("role") and p["role"].get("id") == "fortune_teller"), None)
+        if fortune_teller:
+            # 随机选择一名善良玩家作为红鲱鱼
+            good_players = [p for p in self.players if p["role_type"] in ["townsfolk", "outsider"] and p["id"] != fortune_teller["id"]]
+            if good_players:
+                red_herring = self.rng.choice(good_players)
+                fortune_teller["red_herring_id"] = red_herring["id"]
+                self.log_event("setup.red_herring_pending")
+        
+        return self.players
+    
+    def assign_roles_manually(self, assignments):
+        """手动分配角色"""
+        self.players = []
+        self.invalidate_targets()
+        available_roles = self.get_available_roles()
+        
+        # 检查是否有设置阶段能力的角色
+        has_baron = any(a.get("role_id") == "baron" for a in assignments)
+        has_godfather = any(a.get("role_id") == "godfather" for a in assignments)
+        if has_baron:
+            self.log_event("setup.baron")
+        if has_godfather:
+            self.log_event("setup.godfather")
+        
+        # 收集已分配的镇民角色ID
+        assigned_townsfolk_ids = [a["role_id"] for a in assignments if a.get("role_id") and 
+                                   self._get_role_type(self._find_role_by_id(a["role_id"])) == "townsfolk"]
+        fake_townsfolk_for_drunk = [r for r in available_roles["townsfolk"] if r["id"] not in assigned_townsfolk_ids]
+        
+        for i, assignment in enumerate(assignments):
+            role = self._find_role_by_id(assignment["role_id"]) if assignment.get("role_id") else None
+            
+            # 检查是否是酒鬼
+            is_the_drunk = role and role.get("id") == "drunk"
+            displayed_role = role
+            true_role = None
+            
+            # 如果是酒鬼，检查是否指定了假角色，否则随机选择
+            if is_the_drunk:
+                if assignment.get("drunk_fake_role_id"):
+                    displayed_role = self._find_role_by_id(assignment["drunk_fake_role_id"])
+                elif fake_townsfolk_for_drunk:
+                    self.rng.shuffle(fake_townsfolk_for_drunk)
+                    displayed_role = fake_townsfolk_for_drunk[0]
+                true_role = role
+            
+            player = {
+                "id": i + 1,
+                "name": assignment["name"],
+                "role": displayed_role,
+                "role_type": self._get_role_type(role) if role else None,  # 真实角色类型
+                "true_role": true_role,  # 如果是酒鬼，存储真实角色
+                "is_the_drunk": is_the_drunk,  # 是否是酒鬼
+                "alive": True,
+                "poisoned": False,
+                "poisoned_until": None,
+                "drunk": is_the_drunk,  # 酒鬼永久处于醉酒状态
+                "drunk_until": None if not is_the_drunk else {"permanent": True},
+                "protected": False,
+                "vote_token": True,
+                "ability_used": False,
+                "notes": ""
+            }
+            self.players.append(player)
+        
+        self._rebuild_roles_in_play()
+        self.log_event("setup.manual", len(assignments))
+        
+        # 更新日期: 2026-01-05 - 手动分配也需要检查并设置占卜师红鲱鱼
+        # 检查是否有占卜师，如果有，需要设置红鲱鱼
+        fortune_teller = next((p for p in self.players if p.get("role") and p["role"].get("id") == "fortune_teller"), None)
+        if fortune_teller:
+            # 随机选择一名善良玩家作为红鲱鱼
+            good_players = [p for p in self.players if p["role_type"] in ["townsfolk", "outsider"] and p["id"] != fortune_teller["id"]]
+            if good_players:
+                red_herring = self.rng.choice(good_players)
+                fortune_teller["red_herring_id"] = red_herring["id"]
+                self.log_event("setup.red_herring_pending")
+        
+        return self.players
+    
+    def _find_role_by_id(self, role_id):
+        """根据角色ID查找角色"""
+        return self.role_table.find(role_id)
+    
+    def _get_role_type(self, role):
+        """获取角色类型"""
+        if not role:
+            return None
+        return self.role_table.role_type(role["id"])
+    
+    # 更新日期: 2026-10-19 - 在场角色位集
+    def set_player_role(self, player, role, role_type):
+        """修改玩家角色（所有换角色都应经过这里，以维护在场角色位集）"""
+        old_role = player.get("role")
+        self._count_role(old_role, -1)
+        player["role"] = role
+        player["role_type"] = role_type
+        self._role_partitions = None
+        self._count_role(role, 1)
+        self._death_hooks = hooks_in_play(self.role_table, self.roles_in_play)
+    
+    def _count_role(self, role, delta):
+        if not role:
+            return
+        index = self.role_table.bit.get(role.get("id"))
+        if index is None:
+            return
+        count = self._role_counts.get(index, 0) + delta
+        if count > 0:
+            self._role_counts[index] = count
+            self.roles_in_play |= 1 << index
+        else:
+            self._role_counts.pop(index, None)
+            self.roles_in_play &= ~(1 << index)
+    
+    def _rebuild_roles_in_play(self):
+        self._role_partitions = None
+        self.roles_in_play = 0
+        self._role_counts = {}
+        for player in self.players:
+            self._count_role(player.get("role"), 1)
+        self._death_hooks = hooks_in_play(self.role_table, self.roles_in_play)
+    
+    def role_in_play(self, role_id):
+        """该角色是否在场（按玩家当前的角色）"""
+        index = self.role_table.bit.get(role_id)
+        return index is not None and bool(self.roles_in_play >> index & 1)
+    
+    def role_picker(self):
+        """角色选择器载荷（按剧本与在场位集缓存，带版本号）"""
+        return self.role_table.picker(self.roles_in_play)
+    
+    @timed("Game.start_night")
+    def start_night(self):
+        """开始夜晚"""
+        self.night_number += 1
+        self.current_phase = "night"
+        self.night_deaths = []
+        self.night_actions = []
+        self.protected_players = []
+        self.demon_kills = []
+        self._night_kills_processed = False
+        self._pre_process_results = None
+        self.mayor_substitute_id = None
+        # 更新日期: 2026-01-05 - 重置驱魔人状态
+        self.demon_exorcised_tonight = False  # 重置恶魔被驱魔状态
+        # 更新日期: 2026-01-05 - 重置莽夫状态
+        self.goon_chosen_tonight = False  # 重置莽夫今晚是否被选择
+        self.current_night_order = None
+        self.current_night_index = 0
+        self.invalidate_targets()
+        
+        # 重置所有玩家的保护状态和守鸦人触发状态
+        for player in self.players:
+            player["protected"] = False
+            player.pop("ravenkeeper_triggered", None)
+            player.pop("ravenkeeper_choice_made", None)
+            player.pop("ravenkeeper_result", None)
+            
+            # 检查醉酒状态是否过期
+            if player.get("drunk") and player.get("drunk_until"):
+                until = player["drunk_until"]
+                if until.get("permanent"):
+                    pass  # 永久醉酒（酒鬼）不清除
+                elif until.get("night") and self.night_number > until["night"]:
+                    player["drunk"] = False
+                    player["drunk_until"] = None
+                    self.log_event("status.drunk_ended", player["id"])
+            
+            # 检查中毒状态是否过期（投毒者的毒在入夜时结束）
+            if player.get("poisoned") and player.get("poisoned_until"):
+                until = player["poisoned_until"]
+                if until.get("phase") == "night_start" and until.get("night") == self.night_number:
+                    player["poisoned"] = False
+                    player["poisoned_until"] = None
+                    self.log_event("status.poison_ended", player["id"])
+            
+        self.log_event("phase.night", self.night_number)
+        
+    # 更新日期: 2026-10-19 - 可选目标缓存
+    def set_player_alive(self, player, alive, cause="说书人判定", phase=None):
+        """修改玩家存活状态（所有死亡/复活都应经过这里，以使可选目标缓存失效并记入历史）
+        
+        phase: 死亡发生的阶段，默认为当前阶段（天亮时结算的夜间死亡传 "night"）
+        """
+        if player["alive"] and not alive:
+            self.history.record_death(self.day_number, phase or self.current_phase, player["id"], cause)
+        elif alive and not player["alive"]:
+            self.history.record_revive(player["id"])
+        player["alive"] = alive
+        self.invalidate_targets()
+    
+    # 更新日期: 2026-10-19 - 统一的死亡结算流水线
+    def resolve_death(self, player, cause, kind, phase=None, announce=None, **context):
+        """结算一次死亡：依次经过 dying 钩子（可阻止/假死）、生效、died 钩子（恶魔死亡后再经过
+        demon_dead 钩子），返回 DeathEvent
+        
+        kind: 死亡来源（见 clocktower.deaths.DeathEvent），决定哪些角色钩子参与
+        announce: 死亡生效后、died 钩子之前写入的日志 (事件ID, 参数...)
+        context: 传给钩子的额外信息（如处决时的 nomination / required_votes）
+        """
+        event = DeathEvent(player, cause, kind, phase, context)
+        if dispatch_death(self, "dying", event):
+            return event
+        self.set_player_alive(player, False, cause=cause, phase=phase)
+        event.died = True
+        if announce:
+            self.log_event(*announce)
+        dispatch_death(self, "died", event)
+        # 场上已无存活恶魔时，由在场角色的钩子判定是否有人继承恶魔身份（红唇女郎）
+        if player.get("role_type") == "demon" and not any(
+                p["alive"] and p.get("role_type") == "demon" for p in self.players):
+            dispatch_death(self, "demon_dead", event)
+        return event
+    
+    def resolve_attack(self, player, cause="恶魔击杀"):
+        """结算恶魔夜袭（只判定是否致死，死亡在天亮时由 resolve_death 生效）"""
+        event = DeathEvent(player, cause, "demon", "night")
+        dispatch_death(self, "attack", event)
+        return event
+    
+    def record_execution(self, execution):
+        """记录一次处决（同时写入当天历史）"""
+        self.executions.append(execution)
+        self.history.record_execution(self.day_number, execution)
+    
+    def invalidate_targets(self):
+        """清空可选目标列表、夜间行动配置与角色划分缓存"""
+        self._target_lists = {}
+        self._action_configs = {}
+        self._role_partitions = None
+    
+    def target_list(self, kind="alive", exclude_id=None):
+        """可选目标列表 [{"id", "name"}]，同一阶段内缓存（返回的列表为共享对象，不要修改）
+        
+        kind: "alive" 存活玩家；"all" 全部玩家；"exorcist" / "devils_advocate" 排除此前选过的目标的存活玩家
+        exclude_id: 排除的玩家（通常是行动者本人）
+        """
+        key = (kind, exclude_id)
+        targets = self._target_lists.get(key)
+        if targets is None:
+            if kind == "alive":
+                players = [p for p in self.players if p["alive"]]
+            elif kind == "all":
+                players = self.players
+            elif kind in ("exorcist", "devils_advocate"):
+                previous = set(getattr(self, f"{kind}_previous_targets", []))
+                players = [p for p in self.players if p["alive"] and p["id"] not in previous]
+            else:
+                raise ValueError(f"未知的目标类型: {kind}")
+            targets = self._target_lists[key] = [{"id": p["id"], "name": p["name"]} for p in players if p["id"] != exclude_id]
+        return targets
+    
+    @timed("Game.get_night_order")
+    def get_night_order(self):
+        """获取夜晚行动顺序"""
+        night_roles = []
+        is_first_night = self.night_number == 1
+        
+        # 定义一次性技能角色
+        once_per_game_roles = [
+            "slayer",       # 杀手
+            "virgin",       # 贞洁者
+            "courtier",     # 侍臣
+            "professor",    # 教授
+            "seamstress",   # 女裁缝
+            "philosopher",  # 哲学家
+            "artist",       # 艺术家
+            "assassin"      # 刺客
+        ]
+        
+        for player in self.players:
+            if player["alive"] and player["role"]:
+                role = player["role"]
+                role_id = role.get("id", "")
+                
+                # 跳过被动触发的角色（如守鸦人、贤者等 - 只在触发时处理）
+                if role.get("passive_trigger"):
+                    continue
+                
+                # 跳过说书人控制的角色（如修补匠、造谣者等）
+                if role.get("storyteller_controlled"):
+                    continue
+                
+                # 检查是否是一次性技能且已使用
+                if role_id in once_per_game_roles and player.get("ability_used", False):
+                    continue  # 跳过已使用技能的一次性角色
+                
+                if is_first_night and role.get("first_night"):
+                    night_roles.append({
+                        "player": player,
+                        "role": role,
+                        "order": role.get("night_order", 99)
+                    })
+                elif not is_first_night and role.get("other_nights"):
+                    night_roles.append({
+                        "player": player,
+                        "role": role,
+                        "order": role.get("night_order", 99)
+                    })
+        
+        # 按顺序排序
+        night_roles.sort(key=lambda x: x["order"])
+        return night_roles
+    
+    def record_night_action(self, player_id, action, target=None, result=None, action_type=None, extra_data=None):
+        """记录夜间行动"""
+        player = next((p for p in self.players if p["id"] == player_id), None)
+        target_player = next((p for p in self.players if p["id"] == target), None) if target else None
+        
+        # 一次性技能角色列表
+        once_per_game_roles = [
+            "slayer", "virgin", "courtier", "professor", 
+            "seamstress", "philosopher", "artist", "assassin"
+        ]
+        
+        self.night_actions.append({
+            "player_id": player_id,
+            "action": action,
+            "target": target,
+            "result": result,
+            "action_type": action_type,
+            "time": datetime.now().strftime("%H:%M:%S")
+        })
+        
+        # 处理保护类行动
+        if action_type == "protect" and target:
+            if not hasattr(self, 'protected_players'):
+                self.protected_players = []
+            self.protected_players.append(target)
+            if target_player:
+                target_player["protected"] = True
+                self.log_event("night.protect", player_id, target)
+            
+            # 旅店老板特殊处理：第二个目标
+            if extra_data and extra_data.get("second_target"):
+                second_target_id = extra_data["second_target"]
+                second_target_player = next((p for p in self.players if p["id"] == second_target_id), None)
+                if second_target_player:
+                    self.protected_players.append(second_target_id)
+                    second_target_player["protected"] = True
+                    self.log_event("night.protect_also", player_id, second_target_id)
+                
+                # 处理其中一人醉酒
+                drunk_target_id = extra_data.get("drunk_target")
+                if drunk_target_id:
+                    drunk_player = next((p for p in self.players if p["id"] == drunk_target_id), None)
+                    if drunk_player:
+                        drunk_player["drunk"] = True
+                        drunk_player["drunk_until"] = {
+                            "day": self.day_number + 1,
+                            "night": self.night_number + 1
+                        }
+                        self.log_event("night.innkeeper_drunk", drunk_target_id)
+        
+        # 处理击杀类行动（恶魔）
+        # 更新日期: 2026-01-05 - 添加驱魔人阻止恶魔行动逻辑
+        elif action_type == "kill" and target:
+            # 检查恶魔是否被驱魔人阻止
+            if getattr(self, 'demon_exorcised_tonight', False):
+                self.log_event("night.exorcised", player_id)
+                # 小恶魔传刀仍然可以生效（自杀不受驱魔影响）
+                if player and player.get("role", {}).get("id") == "imp" and target == player_id:
+                    self.process_imp_suicide(player_id)
+            else:
+                if not hasattr(self, 'demon_kills'):
+                    self.demon_kills = []
+                self.demon_kills.append({
+                    "killer_id": player_id,
+                    "target_id": target,
+                    "killer_name": player['name'] if player else '未知',
+                    "target_name": target_player['name'] if target_player else '未知'
+                })
+                self.log_event("night.kill", player_id, target)
+                
+                # 立即检查目标是否是守鸦人
+                self.check_and_trigger_ravenkeeper(target)
+                
+                # 小恶魔传刀逻辑：如果小恶魔选择自杀
+                if player and player.get("role", {}).get("id") == "imp" and target == player_id:
+                    self.process_imp_suicide(player_id)
+        
+        # 更新日期: 2026-01-05 - 僵怖击杀（如果今天没人因其能力死亡才能杀人）
+        elif action_type == "zombuul_kill":
+            if getattr(self, 'demon_exorcised_tonight', False):
+                self.log_event("night.demon_exorcised", player_id, "zombuul")
+            elif target:
+                # 检查今天白天是否有人死亡（被处决等）
+                # 僵怖只有在"没有人因其能力死亡"时才能杀人
+                # 这里简化处理：如果选择了目标就添加到击杀列表
+                if not hasattr(self, 'demon_kills'):
+                    self.demon_kills = []
+                self.demon_kills.append({
+                    "killer_id": player_id,
+                    "target_id": target,
+                    "killer_name": player['name'] if player else '未知',
+                    "target_name": target_player['name'] if target_player else '未知',
+                    "kill_type": "zombuul"
+                })
+                self.log_event("night.demon_kill", player_id, "zombuul", target)
+                self.check_and_trigger_ravenkeeper(target)
+            else:
+                self.log_event("night.demon_no_kill", player_id, "zombuul")
+        
+        # 更新日期: 2026-01-05 - 沙巴洛斯击杀（每晚杀两人，可选复活）
+        elif action_type == "shabaloth_kill":
+            if getattr(self, 'demon_exorcised_tonight', False):
+                self.log_event("night.demon_exorcised", player_id, "shabaloth")
+            else:
+                if not hasattr(self, 'demon_kills'):
+                    self.demon_kills = []
+                
+                # 第一个目标
+                if target:
+                    self.demon_kills.append({
+                        "killer_id": player_id,
+                        "target_id": target,
+                        "killer_name": player['name'] if player else '未知',
+                        "target_name": target_player['name'] if target_player else '未知',
+                        "kill_type": "shabaloth"
+                    })
+                    self.log_event("night.demon_kill", player_id, "shabaloth", target)
+                    self.check_and_trigger_ravenkeeper(target)
+                
+                # 第二个目标（通过 extra_data 传递）
+                second_target = extra_data.get("second_target") if extra_data else None
+                if second_target:
+                    second_target_player = next((p for p in self.players if p["id"] == second_target), None)
+                    if second_target_player:
+                        self.demon_kills.append({
+                            "killer_id": player_id,
+                            "target_id": second_target,
+                            "killer_name": player['name'] if player else '未知',
+                            "target_name": second_target_player['name'],
+                            "kill_type": "shabaloth"
+                        })
+                        self.log_event("night.demon_kill", player_id, "shabaloth", second_target)
+                        self.check_and_trigger_ravenkeeper(second_target)
+                
+                # 复活（通过 extra_data 传递）
+                revive_target = extra_data.get("revive_target") if extra_data else None
+                if revive_target:
+                    revive_player = next((p for p in self.players if p["id"] == revive_target), None)
+                    if revive_player and not revive_player["alive"]:
+                        self.set_player_alive(revive_player, True)
+                        revive_player["vote_token"] = True
+                        self.log_event("night.shabaloth_revive", player_id, revive_target)
+        
+        # 更新日期: 2026-01-05 - 珀击杀（上晚不杀则本晚可杀三人）
+        elif action_type == "po_kill":
+            if getattr(self, 'demon_exorcised_tonight', False):
+                self.log_event("night.demon_exorcised", player_id, "po")
+                # 即使被驱魔，也记录为"选择了行动"，不触发三杀
+                self.po_skipped_last_night = False
+            elif target is None and (extra_data is None or not extra_data.get("targets")):
+                # 选择不杀任何人 - 下一晚可以杀三人
+                self.po_skipped_last_night = True
+                self.log_event("night.po_charge", player_id)
+            else:
+                if not hasattr(self, 'demon_kills'):
+                    self.demon_kills = []
+                
+                # 获取目标列表（可能是1个或3个）
+                targets = extra_data.get("targets", [target]) if extra_data else [target]
+                if target and target not in targets:
+                    targets = [target] + targets
+                
+                # 清除重复并限制数量
+                targets = list(dict.fromkeys([t for t in targets if t]))  # 去重且保持顺序
+                can_kill_three = getattr(self, 'po_skipped_last_night', False)
+                max_targets = 3 if can_kill_three else 1
+                targets = targets[:max_targets]
+                
+                for t in targets:
+                    t_player = next((p for p in self.players if p["id"] == t), None)
+                    if t_player:
+                        self.demon_kills.append({
+                            "killer_id": player_id,
+                            "target_id": t,
+                            "killer_name": player['name'] if player else '未知',
+                            "target_name": t_player['name'],
+                            "kill_type": "po"
+                        })
+                        self.log_event("night.demon_kill", player_id, "po", t)
+                        self.check_and_trigger_ravenkeeper(t)
+                
+                # 重置状态
+                self.po_skipped_last_night = False
+        
+        # 处理投毒类行动
+        elif action_type == "poison" and target:
+            if target_player:
+                target_player["poisoned"] = True
+                # 投毒持续到第二天夜晚开始时（当晚和明天白天有效，再次入夜时结束）
+                target_player["poisoned_until"] = {"night": self.night_number + 1, "phase": "night_start"}
+                self.log_event("night.poison", player_id, target)
+        
+        # 处理普卡的特殊投毒（选择新目标中毒，前一晚目标死亡）
+        elif action_type == "pukka_poison" and target:
+            if target_player and player:
+                # 获取普卡之前的中毒目标
+                previous_victim_id = player.get("pukka_previous_target")
+                
+                # 前一晚的目标死亡（如果存在且未被保护）
+                if previous_victim_id:
+                    previous_victim = next((p for p in self.players if p["id"] == previous_victim_id), None)
+                    if previous_victim and previous_victim["alive"]:
+                        # 检查是否被保护
+                        is_protected = previous_victim.get("protected", False)
+                        if not is_protected:
+                            # 添加到恶魔击杀列表
+                            if not hasattr(self, 'demon_kills'):
+                                self.demon_kills = []
+                            self.demon_kills.append({
+                                "killer_id": player_id,
+                                "target_id": previous_victim_id,
+                                "killer_name": player['name'],
+                                "target_name": previous_victim['name'],
+                                "kill_type": "pukka_delayed"
+                            })
+                            self.log_event("night.pukka_death", previous_victim_id)
+                            self.check_and_trigger_ravenkeeper(previous_victim_id)
+                        else:
+                            self.log_event("night.pukka_protected", previous_victim_id)
+                        
+                        # 清除前一个目标的中毒状态（恢复健康）
+                        previous_victim["poisoned"] = False
+                        previous_victim.pop("poisoned_until", None)
+                
+                # 新目标中毒
+                target_player["poisoned"] = True
+                target_player["poisoned_by_pukka"] = True
+                # 普卡的毒持续到被新目标取代
+                target_player["poisoned_until"] = None  # 无期限，直到被新目标取代
+                
+                # 记录当前目标为下一晚的前一目标
+                player["pukka_previous_target"] = target
+                
+                self.log_event("night.pukka_poison", player_id, target)
+        
+        # 处理醉酒类行动（如侍臣让目标醉酒3天3夜）
+        elif action_type == "drunk" and target:
+            if target_player:
+                duration = extra_data.get("duration", 3) if extra_data else 3  # 默认3天3夜
+                target_player["drunk"] = True
+                target_player["drunk_until"] = {
+                    "day": self.day_number + duration,
+                    "night": self.night_number + duration
+                }
+                self.log_event("night.drunk", player_id, target, duration)
+        
+        # 处理水手的特殊醉酒（水手和目标中一人醉酒）
+        elif action_type == "sailor_drunk" and target:
+            if target_player and player:
+                # 由说书人决定谁醉酒（通过 extra_data.drunk_choice）
+                drunk_choice = extra_data.get("drunk_choice", "target") if extra_data else "target"
+                drunk_player = target_player if drunk_choice == "target" else player
+                
+                drunk_player["drunk"] = True
+                # 醉酒持续到明天黄昏
+                drunk_player["drunk_until"] = {
+                    "day": self.day_number + 1,
+                    "night": self.night_number + 1
+                }
+                self.log_event("night.sailor", player_id, target, drunk_player["id"])
+        
+        # 处理祖母选择孙子
+        elif action_type == "grandchild_select" and target:
+            if target_player:
+                target_player["is_grandchild"] = True
+                target_player["grandchild_of"] = player_id
+                # 同时记录祖母知道孙子的角色
+                player["grandchild_id"] = target
+                self.log_event("night.grandchild", player_id, target, target_player["role"]["id"] if target_player.get("role") else None)
+        
+        # 处理管家选择主人
+        elif action_type == "butler_master" and target:
+            if target_player and player:
+                player["butler_master_id"] = target
+                player["butler_master_name"] = target_player["name"]
+                self.log_event("night.butler", player_id, target)
+        
+        # 更新日期: 2026-01-05 - 驱魔人选择目标
+        elif action_type == "exorcist" and target:
+            if target_player and player:
+                # 记录驱魔人选择的目标
+                if not hasattr(self, 'exorcist_previous_targets'):
+                    self.exorcist_previous_targets = []
+                
+                # 将目标添加到之前选过的列表
+                self.exorcist_previous_targets.append(target)
+                self.invalidate_targets()
+                
+                # 检查驱魔人是否醉酒/中毒
+                is_affected = player.get("drunk") or player.get("poisoned")
+                
+                if not is_affected:
+                    # 检查目标是否是恶魔
+                    if target_player.get("role_type") == "demon":
+                        self.demon_exorcised_tonight = True
+                        self.log_event("night.exorcist", player_id, target)
+                    else:
+                        self.log_event("night.exorcist_miss", player_id, target)
+                else:
+                    self.log_event("night.exorcist_affected", player_id, target)
+        
+        # 更新日期: 2026-01-05 - 恶魔代言人选择目标
+        elif action_type == "devils_advocate" and target:
+            if target_player and player:
+                # 记录恶魔代言人选择的目标
+                if not hasattr(self, 'devils_advocate_previous_targets'):
+                    self.devils_advocate_previous_targets = []
+                
+                # 将目标添加到之前选过的列表
+                self.devils_advocate_previous_targets.append(target)
+                self.invalidate_targets()
+                
+                # 检查恶魔代言人是否醉酒/中毒
+                is_affected = player.get("drunk") or player.get("poisoned")
+                
+                if not is_affected:
+                    # 设置今天被保护的玩家
+                    self.devils_advocate_protected = target
+                    target_player["devils_advocate_protected"] = True
+                    self.log_event("night.devils_advocate", player_id, target)
+                else:
+                    self.log_event("night.devils_advocate_affected", player_id, target)
+        
+        # 更新日期: 2026-01-08 - 麻脸巫婆改变角色
+        elif action_type == "pit_hag" and target:
+            if target_player and player and extra_data:
+                new_role_id = extra_data.get("new_role_id")
+                
+                # 检查麻脸巫婆是否醉酒/中毒
+                is_affected = player.get("drunk") or player.get("poisoned")
+                
+                if not is_affected and new_role_id:
+                    # 获取新角色信息
+                    new_role = self._find_role_by_id(new_role_id)
+                    new_role_type = self._get_role_type(new_role)
+                    
+                    if new_role:
+                        old_role = target_player.get("role", {})
+                        old_role_name = old_role.get("name", "未知") if old_role else "未知"
+                        old_role_type = target_player.get("role_type")
+                        
+                        # 检查是否创造了新恶魔
+                        created_demon = new_role_type == "demon" and old_role_type != "demon"
+                        
+                        # 改变目标的角色
+                        self.set_player_role(target_player, new_role, new_role_type)
+                        
+                        # 标记角色变更事件
+                        if not hasattr(self, 'pit_hag_changes'):
+                            self.pit_hag_changes = []
+                        
+                        change_info = {
+                            "target_id": target,
+                            "target_name": target_player["name"],
+                            "old_role": old_role_name,
+                            "new_role": new_role.get("name", "未知"),
+                            "created_demon": created_demon
+                        }
+                        self.pit_hag_changes.append(change_info)
+                        
+                        if created_demon:
+                            # 如果创造了新恶魔，标记需要说书人决定今晚的死亡
+                            self.pit_hag_created_demon = True
+                            self.log_event("night.pit_hag_demon", player_id, target, old_role.get("id") if old_role else None, new_role["id"])
+                        else:
+                            self.log_event("night.pit_hag", player_id, target, old_role.get("id") if old_role else None, new_role["id"])
+                    else:
+                        self.log_event("night.pit_hag_no_role", player_id)
+                else:
+                    self.log_event("night.pit_hag_affected", player_id)
+        
+        # 处理跳过行动
+        elif action_type == "skip":
+            self.log_event("night.skip", player_id)
+        
+        # 更新日期: 2026-01-12 - 处理信息类行动
+        elif action_type == "info":
+            if target_player:
+                self.log_event("night.info_about", player_id, target)
+            else:
+                self.log_event("night.info", player_id)
+        
+        # 其他行动
+        elif player:
+            if target_player:
+                self.log_event("night.action_on", player_id, action, target)
+            else:
+                self.log_event("night.action", player_id, action)
+        
+        # 标记一次性技能已使用（只要执行了行动且不是跳过）
+        if player and action_type != "skip":
+            role_id = player.get("role", {}).get("id", "") if player.get("role") else ""
+            if role_id in once_per_game_roles:
+                player["ability_used"] = True
+                self.log_event("ability.used", player_id)
+    
+    # 更新日期: 2026-01-02 - 添加小恶魔传刀功能
+    def process_imp_suicide(self, imp_player_id):
+        """处理小恶魔自杀传刀"""
+        imp_player = next((p for p in self.players if p["id"] == imp_player_id), None)
+        if not imp_player:
+            return
+        
+        # 找到存活的爪牙
+        alive_minions = [p for p in self.players if p["alive"] and p.get("role_type") == "minion"]
+        
+        if not alive_minions:
+            self.log_event("night.imp_no_minion", imp_player_id)
+            return
+        
+        # 随机选择一名爪牙成为新的小恶魔
+        new_imp = self.rng.choice(alive_minions)
+        old_role = new_imp.get("role", {}).get("name", "未知")
+        old_role_id = new_imp.get("role", {}).get("id")
+        
+        # 更新爪牙的角色为小恶魔
+        self.set_player_role(new_imp, self._find_role_by_id("imp"), "demon")
+        
+        # 标记传刀事件
+        if not hasattr(self, 'imp_starpass'):
+            self.imp_starpass = []
+        self.imp_starpass.append({
+            "old_imp_id": imp_player_id,
+            "old_imp_name": imp_player["name"],
+            "new_imp_id": new_imp["id"],
+            "new_imp_name": new_imp["name"],
+            "old_role": old_role
+        })
+        
+        self.log_event("night.imp_starpass", imp_player_id, new_imp["id"], old_role_id)
+    
+    # 更新日期: 2026-01-05 - 茶艺师保护检查辅助函数
+    def _is_protected_by_tea_lady(self, player_id):
+        """检查玩家是否被茶艺师保护（茶艺师的存活善良邻居无法死亡）"""
+        # 找到存活的茶艺师
+        tea_lady = next(
+            (p for p in self.players if p["alive"] and p.get("role", {}).get("id") == "tea_lady"),
+            None
+        )
+        
+        if not tea_lady:
+            return False
+        
+        # 检查茶艺师是否醉酒/中毒
+        if tea_lady.get("drunk") or tea_lady.get("poisoned"):
+            return False
+        
+        # 更新日期: 2026-10-19 - 按座位顺序（players 下标）取左右最近的存活邻居
+        neighbors = self._alive_neighbors(self.players.index(tea_lady))
+        if len(neighbors) < 2:
+            return False
+        
+        # 检查两个邻居是否都是善良的
+        if not all(p.get("role_type") in ["townsfolk", "outsider"] for p in neighbors):
+            return False
+        
+        # 如果目标是茶艺师的邻居，则被保护
+        return any(p["id"] == player_id for p in neighbors)
+
+    def process_night_kills(self):
+        """处理夜间击杀，考虑保护效果"""
+        if not hasattr(self, 'demon_kills'):
+            return []
+        
+        actual_deaths = []
+        protected = getattr(self, 'protected_players', [])
+        
+        for kill in self.demon_kills:
+            target_id = kill["target_id"]
+            target_player = next((p for p in self.players if p["id"] == target_id), None)
+            
+            if not target_player:
+                continue
+            
+            # 检查是否被保护
+            if target_id in protected:
+                self.log_event("night.protected", target_id)
+                continue
+            
+            # 士兵、茶艺师、弄臣、镇长、守鸦人等由在场角色的钩子结算
+            event = self.resolve_attack(target_player)
+            if event.prevented:
+                continue
+            
+            death = {
+                "player_id": target_id,
+                "player_name": target_player["name"],
+                "cause": "恶魔击杀"
+            }
+            death.update(event.result)  # 镇长被攻击时带 mayor_targeted，由 process_mayor_death 处理替死
+            if death.get("mayor_targeted") and getattr(self, 'mayor_substitute_id', None):
+                self._apply_mayor_substitute(death)
+            actual_deaths.append(death)
+        
+        return actual_deaths
+    
+    # 更新日期: 2026-10-19 - 镇长替死在夜间决定、天亮结算
+    def process_mayor_death(self, substitute_id=None):
+        """镇长被恶魔攻击时的替死决定（substitute_id 为 None 时镇长自己死亡），返回替死玩家
+        
+        说书人通常在天亮前决定：记录下来，由 process_night_kills 结算击杀时替换死者；
+        已经结算出的死亡记录（守鸦人检查时的预处理结果、夜间死亡列表）直接替换
+        """
+        mayor = next((p for p in self.players if p.get("role") and p["role"].get("id") == "mayor"), None)
+        substitute = next((p for p in self.players if p["id"] == substitute_id), None) if substitute_id else None
+        self.mayor_substitute_id = substitute["id"] if substitute else None
+        for deaths in (self.night_deaths, getattr(self, '_pre_process_results', None) or []):
+            for death in deaths:
+                if death.get("mayor_targeted"):
+                    if substitute:
+                        self._apply_mayor_substitute(death)
+                    else:
+                        death.pop("mayor_targeted", None)
+        if substitute:
+            self.log_event("mayor.substitute", mayor["id"] if mayor else None, substitute["id"])
+        else:
+            self.log_event("mayor.declined", mayor["id"] if mayor else None)
+        return substitute
+    
+    def _apply_mayor_substitute(self, death):
+        substitute = next(p for p in self.players if p["id"] == self.mayor_substitute_id)
+        death["player_id"] = substitute["id"]
+        death["player_name"] = substitute["name"]
+        death["cause"] = "镇长替死"
+        death.pop("mayor_targeted", None)
+    
+    def check_and_trigger_ravenkeeper(self, target_id):
+        """在记录击杀行动后立即检查目标是否是守鸦人，如果是则触发其能力"""
+        target_player = next((p for p in self.players if p["id"] == target_id), None)
+        if not target_player:
+            return
+        
+        is_ravenkeeper = (target_player.get("role") and 
+                          target_player["role"].get("id") == "ravenkeeper")
+        if not is_ravenkeeper:
+            return
+        
+        # 检查是否被保护
+        protected = getattr(self, 'protected_players', [])
+        if target_id in protected:
+            return
+        
+        # 检查是否是士兵（不会被杀）
+        if target_player.get("role", {}).get("id") == "soldier":
+            if not target_player.get("poisoned") and not target_player.get("drunk"):
+                return
+        
+        # 守鸦人未中毒/醉酒时触发（中毒/醉酒时也触发，但给假信息，由API层处理）
+        if not target_player.get("ravenkeeper_triggered"):
+            target_player["ravenkeeper_triggered"] = True
+            target_player["ravenkeeper_choice_made"] = False
+            target_player["ravenkeeper_result"] = None
+            self.log_event("ravenkeeper.triggered", target_player["id"])
+
+    def check_ravenkeeper_trigger(self):
+        """检查是否有守鸦人需要被唤醒（兼容说书人端调用）"""
+        # 先处理夜间击杀（如果尚未处理），以确定谁死了、是否触发守鸦人
+        if not getattr(self, '_night_kills_processed', False):
+            self._pre_process_results = self.process_night_kills()
+            self._night_kills_processed = True
+        
+        for death in getattr(self, 'demon_kills', []):
+            target_id = death.get("target_id")
+            target_player = next((p for p in self.players if p["id"] == target_id), None)
+            if target_player and target_player.get("ravenkeeper_triggered"):
+                return {
+                    "triggered": True,
+                    "player_id": target_id,
+                    "player_name": target_player["name"],
+                    "choice_made": target_player.get("ravenkeeper_choice_made", False),
+                    "result": target_player.get("ravenkeeper_result")
+                }
+        return {"triggered": False}
+    
+    def add_night_death(self, player_id, cause="恶魔击杀"):
+        """添加夜间死亡"""
+        player = next((p for p in self.players if p["id"] == player_id), None)
+        if player:
+            self.night_deaths.append({
+                "player_id": player_id,
+                "player_name": player["name"],
+                "cause": cause
+            })
+    
+    @timed("Game.start_day")
+    def start_day(self):
+        """开始白天"""
+        self.day_number += 1
+        self.current_phase = "day"
+        self.nominations = []
+        self.votes = {}
+        self.day_nominations = DayNominations(self.day_number, self.nominations)
+        self.invalidate_targets()
+        
+        # 更新日期: 2026-01-05 - 清除上一天的恶魔代言人保护
+        self.devils_advocate_protected = None
+        for p in self.players:
+            p.pop("devils_advocate_protected", None)
+        
+        # 处理恶魔击杀（考虑保护），复用守鸦人检查时的预处理结果
+        if getattr(self, '_night_kills_processed', False):
+            demon_deaths = getattr(self, '_pre_process_results', [])
+            self._night_kills_processed = False
+            self._pre_process_results = None
+        else:
+            demon_deaths = self.process_night_kills()
+        for death in demon_deaths:
+            if death not in self.night_deaths:
+                self.night_deaths.append(death)
+        
+        # 处理夜间死亡（钩子结果如红唇女郎继承恶魔身份合并后返回）
+        results = {}
+        for death in self.night_deaths:
+            player = next((p for p in self.players if p["id"] == death["player_id"]), None)
+            if player:
+                # 僵怖假死、月之子等由在场角色的钩子结算
+                event = self.resolve_death(player, death["cause"], "night", phase="night",
+                                           announce=("death.night", player["id"], death["cause"]))
+                results.update(event.result)
+        
+        self.log_event("phase.day", self.day_number)
+        return results
+    
+    def nominate(self, nominator_id, nominee_id):
+        """提名"""
+        nominator = next((p for p in self.players if p["id"] == nominator_id), None)
+        nominee = next((p for p in self.players if p["id"] == nominee_id), None)
+        
+        if not nominator or not nominee:
+            return {"success": False, "error": "无效的玩家"}
+        
+        if not nominator["alive"]:
+            return {"success": False, "error": "死亡玩家不能提名"}
+        
+        # 检查是否已经提名过 / 已经被提名过（每名玩家每天只能提名一次、被提名一次）
+        if nominator_id in self.day_nominations.by_nominator:
+            return {"success": False, "error": "该玩家今天已经提名过"}
+        if nominee_id in self.day_nominations.by_nominee:
+            return {"success": False, "error": "该玩家今天已经被提名过"}
+        
+        nomination = {
+            "id": len(self.nominations) + 1,
+            "nominator_id": nominator_id,
+            "nominator_name": nominator["name"],
+            "nominee_id": nominee_id,
+            "nominee_name": nominee["name"],
+            "votes": [],
+            "vote_count": 0,
+            "status": "pending"
+        }
+        
+        self.day_nominations.add(nomination, self.players)
+        self.history.record_nomination(self.day_number, nomination, nominator)
+        self.log_event("nomination", nominator_id, nominee_id)
+        
+        # 检查贞洁者能力触发
+        virgin_triggered = False
+        nominee_role_id = nominee.get("role", {}).get("id") if nominee.get("role") else None
+        
+        # 如果被提名者是贞洁者，且能力未使用，且提名者是镇民
+        if (nominee_role_id == "virgin" and 
+            not nominee.get("virgin_ability_used", False) and
+            nominator.get("role_type") == "townsfolk"):
+            
+            # 标记贞洁者能力已使用
+            nominee["virgin_ability_used"] = True
+            
+            # 提名者立即被处决
+            self.resolve_death(nominator, "贞洁者", "virgin")
+            
+            # 记录处决
+            self.record_execution({
+                "day": self.day_number,
+                "executed_id": nominator_id,
+                "executed_name": nominator["name"],
+                "reason": "virgin_ability",
+                "vote_count": 0,
+                "required_votes": 0
+            })
+            
+            virgin_triggered = True
+            self.log_event("execution.virgin", nominator["id"])
+            
+            # 更新提名状态
+            nomination["status"] = "virgin_triggered"
+        
+        return {
+            "success": True, 
+            "nomination": nomination,
+            "virgin_triggered": virgin_triggered,
+            "executed_player": nominator["name"] if virgin_triggered else None
+        }
+    
+    # 更新日期: 2026-10-19 - 说书人端与玩家端统一通过投票账本记票
+    def vote(self, nomination_id, voter_id, vote_value):
+        """投票"""
+        nomination = self.get_nomination(nomination_id)
+        voter = next((p for p in self.players if p["id"] == voter_id), None)
+        
+        if not nomination or not voter:
+            return {"success": False, "error": "无效的提名或玩家"}
+        
+        ledger = self.get_vote_ledger(nomination)
+        error = ledger.check(voter, vote_value)
+        if error:
+            return {"success": False, "error": error}
+        
+        self._start_voting(nomination)
+        ledger.record(voter, vote_value)
+        self.history.record_vote(self.day_number, nomination, voter, vote_value)
+        
+        self.log_event("vote.yes" if vote_value else "vote.no", voter_id, nomination["nominee_id"])
+        return {
+            "success": True,
+            "vote_count": nomination["vote_count"],
+            "total_voters": len(nomination["voters"]),
+            "tally": self._publish_tally(nomination, ledger),
+            "leader": self.nomination_leader()
+        }
+    
+    # 更新日期: 2026-10-19 - 线下说书：一次请求记录整轮举手结果
+    def vote_batch(self, nomination_id, votes):
+        """按座位顺序批量记票
+
+        votes 与 self.players 一一对应：True = 赞成，False = 反对，None = 未投票。
+        先按整批投票判定合法性（管家的赞成票取决于主人在本批或之前是否赞成），再按顺时针
+        顺序记票，votes 列表、账本、日志与下一位投票者游标都保持顺时针；
+        已用过投票令牌的死亡玩家举手无效，整轮只写一条日志。
+        """
+        nomination = self.get_nomination(nomination_id)
+        if not nomination:
+            return {"success": False, "error": "无效的提名"}
+        if not isinstance(votes, list) or len(votes) != len(self.players):
+            return {"success": False, "error": f"投票向量长度必须为 {len(self.players)}"}
+        
+        ledger = self.get_vote_ledger(nomination)
+        seats = ledger.clockwise_seats()
+        # 第一遍：判定每一票是否有效；管家最后判定，主人本批的赞成票已知
+        accepted = {}
+        rejected = []
+        batch_yes = set()
+        for seat in sorted(seats, key=lambda seat: bool(self.players[seat].get("butler_master_id"))):
+            if votes[seat] is None:
+                continue
+            voter = self.players[seat]
+            vote_value = bool(votes[seat])
+            # 没有投票令牌的死亡玩家不投票，反对票直接忽略
+            if not vote_value and not voter["alive"] and not voter.get("vote_token", False):
+                continue
+            master_id = voter.get("butler_master_id")
+            error = ledger.check(voter, vote_value, master_votes_yes=master_id in batch_yes if master_id else None)
+            if error:
+                rejected.append({"voter_id": voter["id"], "voter_name": voter["name"], "error": error})
+                continue
+            accepted[seat] = vote_value
+            if vote_value:
+                batch_yes.add(voter["id"])
+        
+        # 第二遍：按顺时针顺序记票
+        yes_ids = []
+        recorded = 0
+        for seat in seats:
+            if seat not in accepted:
+                continue
+            voter = self.players[seat]
+            vote_value = accepted[seat]
+            self._start_voting(nomination)
+            ledger.record(voter, vote_value)
+            self.history.record_vote(self.day_number, nomination, voter, vote_value)
+            recorded += 1
+            if vote_value:
+                yes_ids.append(voter["id"])
+        
+        required_votes = self.required_votes()
+        self.log_event("vote.batch", tuple(yes_ids), nomination["nominee_id"], nomination["vote_count"], required_votes)
+        return {
+            "success": True,
+            "recorded": recorded,
+            "rejected": rejected,
+            "vote_count": nomination["vote_count"],
+            "required_votes": required_votes,
+            "threshold_reached": nomination["vote_count"] >= required_votes,
+            "tally": self._publish_tally(nomination, ledger, required_votes),
+            "leader": self.nomination_leader()
+        }
+    
+    # 更新日期: 2026-10-19 - 投票状态与实时票数推送
+    def _start_voting(self, nomination):
+        """首次记票即进入投票状态（已处决/失败等结算状态不变）"""
+        if nomination["status"] == "pending":
+            nomination["status"] = "voting"
+    
+    def _publish_tally(self, nomination, ledger, required_votes=None):
+        """把实时票数推送给该局全部订阅者（说书人端与玩家端），返回票数摘要"""
+        tally = ledger.summary(required_votes if required_votes is not None else self.required_votes())
+        event_bus.publish(self.game_id, None, {"type": "vote", "nomination_id": nomination["id"], "tally": tally})
+        return tally
+    
+    def get_nomination(self, nomination_id):
+        """按ID查找当天的提名"""
+        return self.day_nominations.get(nomination_id)
+    
+    def get_vote_ledger(self, nomination):
+        """获取提名对应的投票账本"""
+        return self.day_nominations.ledger(nomination, self.players)
+    
+    def nomination_leader(self):
+        """当前票数领先的提名（含是否平票、是否将被处决）"""
+        return self.day_nominations.leader(self.required_votes())
+    
+    def required_votes(self):
+        """处决所需票数（存活玩家的一半）"""
+        alive_count = len([p for p in self.players if p["alive"]])
+        return (alive_count // 2) + 1
+    
+    # 更新日期: 2026-01-02 - 修复圣徒能力，添加红唇女郎处决后检测
+    @timed("Game.execute")
+    def execute(self, nomination_id):
+        """执行处决"""
+        nomination = self.get_nomination(nomination_id)
+        if not nomination:
+            return {"success": False, "error": "无效的提名"}
+        
+        nominee = next((p for p in self.players if p["id"] == nomination["nominee_id"]), None)
+        if not nominee:
+            return {"success": False, "error": "无效的被提名者"}
+        
+        # 计算需要的票数（存活玩家的一半）
+        required_votes = self.required_votes()
+        
+        if nomination["vote_count"] >= required_votes:
+            # 恶魔代言人、和平主义者、弄臣、僵怖、圣徒、月之子等由在场角色的钩子结算
+            event = self.resolve_death(
+                nominee, "处决", "execution",
+                announce=("execution.executed", nominee["id"], nomination["vote_count"], required_votes),
+                nomination=nomination, required_votes=required_votes
+            )
+            if event.prevented:
+                result = {"success": True, "executed": False}
+                result.update(event.result)
+                return result
+            
+            nomination["status"] = "executed"
+            self.record_execution({
+                "day": self.day_number,
+                "executed_id": nominee["id"],
+                "executed_name": nominee["name"],
+                "vote_count": nomination["vote_count"],
+                "required_votes": required_votes
+            })
+            
+            # 红唇女郎继承恶魔身份等由 resolve_death 的钩子结算，结果一并返回
+            result = {"success": True, "executed": True, "player": nominee}
+            result.update(event.result)
+            return result
+        else:
+            nomination["status"] = "failed"
+            self.log_event("execution.failed", nominee["id"], nomination["vote_count"], required_votes)
+            return {"success": True, "executed": False}
+    
+    # 更新日期: 2026-01-02 - 添加红唇女郎能力检测
+    @timed("Game.check_game_end")
+    def check_game_end(self):
+        """检查游戏是否结束（只读：视图构建与轮询也会调用；红唇女郎继承在 resolve_death 中结算）"""
+        alive_players = [p for p in self.players if p["alive"]]
+        demons_alive = [p for p in alive_players if p["role_type"] == "demon"]
+        
+        # 没有存活恶魔（红唇女郎已在恶魔死亡时继承），善良获胜
+        if not demons_alive:
+            return {"ended": True, "winner": "good", "reason": "恶魔已被消灭"}
+        
+        # 只剩2名玩家且恶魔存活，邪恶获胜
+        if len(alive_players) <= 2 and demons_alive:
+            return {"ended": True, "winner": "evil", "reason": "邪恶势力占领了小镇"}
+        
+        return {"ended": False}
+    
+    # 更新日期: 2026-01-02 - 红唇女郎能力实现
+    def check_scarlet_woman_trigger(self):
+        """检查红唇女郎是否触发能力"""
+        alive_players = [p for p in self.players if p["alive"]]
+        
+        # 红唇女郎能力条件：存活玩家>=5人
+        if len(alive_players) < 5:
+            self.log_event("scarlet_woman.too_few", len(alive_players))
+            return {"triggered": False}
+        
+        # 找到存活的红唇女郎
+        scarlet_woman = next(
+            (p for p in alive_players if p.get("role", {}).get("id") == "scarlet_woman"),
+            None
+        )
+        
+        if not scarlet_woman:
+            return {"triggered": False}
+        
+        # 检查红唇女郎是否醉酒或中毒（能力失效）
+        if scarlet_woman.get("drunk") or scarlet_woman.get("poisoned"):
+            self.log_event("scarlet_woman.affected", scarlet_woman["id"])
+            return {"triggered": False}
+        
+        # 找到刚死亡的恶魔角色
+        dead_demon = next(
+            (p for p in self.players if not p["alive"] and p.get("role_type") == "demon"),
+            None
+        )
+        
+        demon_role = dead_demon.get("role", {}) if dead_demon else self._find_role_by_id("imp")
+        
+        # 红唇女郎成为恶魔
+        self.set_player_role(scarlet_woman, demon_role, "demon")
+        
+        self.log_event("scarlet_woman.promoted", scarlet_woman["id"], demon_role.get("id"))
+        
+        return {
+            "triggered": True,
+            "new_demon_id": scarlet_woman["id"],
+            "new_demon_name": scarlet_woman["name"]
+        }
+    
+    def update_player_status(self, player_id, status_type, value):
+        """更新玩家状态"""
+        player = next((p for p in self.players if p["id"] == player_id), None)
+        if player and status_type in ["poisoned", "drunk", "protected", "alive"]:
+            if status_type == "alive":
+                self.set_player_alive(player, value)
+            else:
+                player[status_type] = value
+            self.log_event("status.updated", player_id, status_type, bool(value))
+            return {"success": True}
+        return {"success": False, "error": "无效的玩家或状态"}
+    
+    @timed("Game.generate_info")
+    def generate_info(self, player_id, info_type, targets=None):
+        """生成角色信息"""
+        player = next((p for p in self.players if p["id"] == player_id), None)
+        if not player or not player["role"]:
+            return None
+        
+        # 获取目标玩家
+        target_players = []
+        if targets:
+            for tid in targets:
+                tp = next((p for p in self.players if p["id"] == tid), None)
+                if tp:
+                    target_players.append(tp)
+        
+        return self._generate_info_for_player(player, target_players)
+    
+    def _generate_info_for_player(self, player, target_players):
+        """根据玩家角色分派到对应的信息生成函数"""
+        role = player["role"]
+        role_id = role["id"]
+        
+        # 检查玩家是否处于醉酒/中毒状态（信息可能错误）
+        is_drunk_or_poisoned = player.get("drunk", False) or player.get("poisoned", False)
+        
+        # 根据角色类型生成信息
+        info = None
+        if role_id == "washerwoman":
+            info = self._generate_washerwoman_info(player, is_drunk_or_poisoned)
+        elif role_id == "librarian":
+            info = self._generate_librarian_info(player, is_drunk_or_poisoned)
+        elif role_id == "investigator":
+            info = self._generate_investigator_info(player, is_drunk_or_poisoned)
+        elif role_id == "chef":
+            info = self._generate_chef_info(player, is_drunk_or_poisoned)
+        elif role_id == "empath":
+            info = self._generate_empath_info(player, is_drunk_or_poisoned)
+        elif role_id == "fortune_teller":
+            info = self._generate_fortune_teller_info(player, target_players, is_drunk_or_poisoned)
+        elif role_id == "clockmaker":
+            info = self._generate_clockmaker_info(player, is_drunk_or_poisoned)
+        elif role_id == "chambermaid":
+            info = self._generate_chambermaid_info(player, target_players, is_drunk_or_poisoned)
+        elif role_id == "seamstress":
+            info = self._generate_seamstress_info(player, target_players, is_drunk_or_poisoned)
+        elif role_id == "dreamer":
+            info = self._generate_dreamer_info(player, target_players, is_drunk_or_poisoned)
+        elif role_id == "undertaker":
+            info = self._generate_undertaker_info(player, is_drunk_or_poisoned)
+        elif role_id == "ravenkeeper":
+            info = self._generate_ravenkeeper_info(player, target_players, is_drunk_or_poisoned)
+        elif role_id == "oracle":
+            info = self._generate_oracle_info(player, is_drunk_or_poisoned)
+        elif role_id == "flowergirl":
+            info = self._generate_flowergirl_info(player, is_drunk_or_poisoned)
+        elif role_id == "town_crier":
+            info = self._generate_town_crier_info(player, is_drunk_or_poisoned)
+        
+        else:
+            return {"message": f"请根据 {role['name']} 的能力自行提供信息"}
+        
+        # 更新日期: 2026-10-19 - 醉酒/中毒时附上与此前信息一致的错误结果，并记录本次告知的信息
+        if info and info.get("info_type"):
+            if is_drunk_or_poisoned:
+                consistent = self.get_consistent_results(player["id"], [t["id"] for t in target_players])
+                if consistent.get("supported"):
+                    info["consistent_false_results"] = consistent["consistent_false_results"]
+            self._record_info(player, info, target_players)
+        
+        return info
+    
+    # 更新日期: 2026-10-19 - 夜间信息批量生成（一次请求生成所有信息角色的信息）
+    def _build_role_partitions(self):
+        """按角色类型划分玩家，并建立玩家ID和座位索引"""
+        partitions = {
+            "townsfolk": [],
+            "outsider": [],
+            "minion": [],
+            "demon": [],
+            "by_id": {},
+            "seat_index": {}
+        }
+        for i, p in enumerate(self.players):
+            partitions["by_id"][p["id"]] = p
+            partitions["seat_index"][p["id"]] = i
+            if p["role_type"] in ROLE_TYPES:
+                partitions[p["role_type"]].append(p)
+        return partitions
+    
+    def _get_role_partitions(self):
+        """获取角色划分（同一阶段内缓存，随 invalidate_targets 与换角色失效；返回共享对象，不要修改）"""
+        partitions = getattr(self, '_role_partitions', None)
+        if partitions is None:
+            partitions = self._role_partitions = self._build_role_partitions()
+        return partitions
+    
+    @timed("Game.generate_night_info_batch")
+    def generate_night_info_batch(self, overrides=None, deliver=False):
+        """按夜间顺序为所有被唤醒的信息角色批量生成信息
+        
+        overrides: {玩家ID或角色ID: {"targets": [...], "message": "...", "skip": bool}}
+            - targets: 需要选择目标的角色（占卜师等）使用的目标
+            - message: 说书人指定的信息，直接使用而不自动生成
+            - skip: 跳过该角色
+        deliver: 为 True 时直接把信息发送到玩家的消息队列
+        """
+        overrides = overrides or {}
+        
+        # 可批量生成信息的角色
+        info_roles = [
+            "washerwoman", "librarian", "investigator", "chef", "empath",
+            "fortune_teller", "clockmaker", "chambermaid", "seamstress",
+            "dreamer", "undertaker", "oracle", "flowergirl", "town_crier"
+        ]
+        # 需要选择目标的信息角色（未提供目标时使用玩家端提交的选择）
+        target_roles = {"fortune_teller": 2, "chambermaid": 2, "seamstress": 2, "dreamer": 1}
+        
+        player_choices = getattr(self, 'player_night_choices', {})
+        results = []
+        
+        by_id = self._get_role_partitions()["by_id"]
+        for item in self.get_night_order():
+            player = item["player"]
+            role_id = item["role"]["id"]
+            if role_id not in info_roles:
+                continue
+            
+            override = overrides.get(str(player["id"])) or overrides.get(role_id) or {}
+            if override.get("skip"):
+                continue
+            
+            entry = {
+                "player_id": player["id"],
+                "player_name": player["name"],
+                "role_id": role_id,
+                "role_name": item["role"]["name"],
+                "order": item["order"],
+                "needs_targets": False,
+                "delivered": False
+            }
+            
+            if override.get("message"):
+                info = {
+                    "info_type": role_id,
+                    "message": override["message"],
+                    "is_drunk_or_poisoned": player.get("drunk", False) or player.get("poisoned", False),
+                    "overridden": True
+                }
+            else:
+                targets = override.get("targets")
+                if targets is None and role_id in target_roles:
+                    targets = player_choices.get(player["id"], {}).get("targets", [])
+                target_players = [by_id[tid] for tid in (targets or []) if tid in by_id]
+                if role_id in target_roles and len(target_players) < target_roles[role_id]:
+                    entry["needs_targets"] = True
+                info = self._generate_info_for_player(player, target_players)
+            
+            entry["info"] = info
+            
+            if deliver and info and not entry["needs_targets"]:
+                message = self.send_message(
+                    player["id"],
+                    info.get("message", ""),
+                    title=f"🌙 {item['role']['name']}的夜间信息",
+                    message_type="night_result",
+                    extra={"result_type": "info", "result_data": info.get("message", "")}
+                )
+                entry["delivered"] = message is not None
+            
+            results.append(entry)
+        
+        delivered_count = sum(1 for r in results if r["delivered"])
+        self.log_event("info.batch", len(results), delivered_count)
+        return results
+    
+    # 更新日期: 2026-10-19 - 消息投递到玩家信箱（序号编号、环形缓冲、读游标）
+    def send_message(self, player_id, content, title="来自说书人的信息", message_type="info", extra=None):
+        """向玩家的信箱发送一条消息，返回带 id/seq/read 的消息"""
+        mailbox = self.get_mailbox(player_id)
+        if mailbox is None:
+            return None
+        
+        message = {
+            "type": message_type,
+            "title": title,
+            "content": content,
+            "time": datetime.now().isoformat()
+        }
+        if extra:
+            message.update(extra)
+        
+        seq = self._deliver(mailbox, message)
+        view = mailbox._view(seq, message)
+        event_bus.publish(self.game_id, [player_id], {"type": "message", "player_id": player_id, "message": view})
+        return view
+    
+    def _deliver(self, mailbox, message, shared=False):
+        """写入信箱并记账；shared 为 True 时消息体已由群发计入，这里只计引用开销"""
+        seq, evicted = mailbox.append(message)
+        self.message_bytes += MESSAGE_REF_BYTES
+        if not shared:
+            self.message_bytes += _message_size(message)
+        # 信箱只保留最近的消息（环形缓冲区）
+        if evicted is not None:
+            self._release(evicted)
+        return seq
+    
+    def _release(self, message):
+        """信箱挤出一条消息：群发消息体在最后一个引用被挤出时才扣除"""
+        self.message_bytes -= MESSAGE_REF_BYTES
+        refs = getattr(self, 'broadcast_refs', {})
+        broadcast_id = message.get("broadcast_id")
+        if broadcast_id in refs:
+            refs[broadcast_id] -= 1
+            if refs[broadcast_id] > 0:
+                return
+            del refs[broadcast_id]
+        self.message_bytes -= _message_size(message)
+    
+    # 更新日期: 2026-10-19 - 群发：一份共享消息体写入每个接收者的信箱，并一次性推送
+    def broadcast(self, content, group=None, player_ids=None, title="来自说书人的信息", message_type="info", extra=None):
+        """向一组玩家（group 为分组名，或 player_ids 为玩家ID列表）群发消息"""
+        if player_ids is not None:
+            if not isinstance(player_ids, list) or not all(isinstance(pid, int) for pid in player_ids):
+                return {"success": False, "error": "player_ids 必须是玩家ID列表"}
+            # 去重并保持顺序：同一玩家只投递一份、只推送一次
+            recipients = list(dict.fromkeys(player_ids))
+            known = {p["id"] for p in self.players}
+            unknown = [pid for pid in recipients if pid not in known]
+            if unknown:
+                return {"success": False, "error": "玩家不存在", "unknown_player_ids": unknown}
+        elif group in BROADCAST_GROUPS:
+            predicate = BROADCAST_GROUPS[group]
+            recipients = [p["id"] for p in self.players if predicate(p)]
+        else:
+            return {"success": False, "error": "无效的群发对象"}
+        
+        self.broadcast_count = getattr(self, 'broadcast_count', 0) + 1
+        message = {
+            "type": message_type,
+            "title": title,
+            "content": content,
+            "time": datetime.now().isoformat(),
+            "broadcast_id": f"bc_{self.broadcast_count}"
+        }
+        if extra:
+            message.update(extra)
+        
+        # 消息体只存一份，按一份计入；每个接收者只增加一条引用
+        if recipients:
+            refs = getattr(self, 'broadcast_refs', None)
+            if refs is None:
+                refs = self.broadcast_refs = {}
+            refs[message["broadcast_id"]] = len(recipients)
+            self.message_bytes += _message_size(message)
+        seqs = {pid: self._deliver(self.get_mailbox(pid), message, shared=True) for pid in recipients}
+        event_bus.publish(self.game_id, recipients, {
+            "type": "message",
+            "player_ids": recipients,
+            "seqs": seqs,
+            "message": message
+        })
+        return {"success": True, "broadcast_id": message["broadcast_id"], "recipients": recipients, "seqs": seqs}
+    
+    def get_mailbox(self, player_id):
+        """获取（必要时创建）玩家信箱；玩家不存在时返回 None"""
+        mailboxes = getattr(self, 'mailboxes', None)
+        if mailboxes is None:
+            mailboxes = self.mailboxes = {}
+        mailbox = mailboxes.get(player_id)
+        if mailbox is None:
+            if not any(p["id"] == player_id for p in self.players):
+                return None
+            mailbox = mailboxes[player_id] = Mailbox(player_id)
+        return mailbox
+    
+    def _generate_washerwoman_info(self, player, is_drunk_or_poisoned=False):
+        """生成洗衣妇信息"""
+        townsfolk_players = [p for p in self._get_role_partitions()["townsfolk"] if p["id"] != player["id"]]
+        if not townsfolk_players:
+            return {"message": "场上没有其他镇民", "is_drunk_or_poisoned": is_drunk_or_poisoned}
+        
+        target = self.rng.choice(townsfolk_players)
+        other_players = [p for p in self.players if p["id"] not in [player["id"], target["id"]]]
+        decoy = self.rng.choice(other_players) if other_players else None
+        
+        shown = [target]
+        if decoy:
+            shown.append(decoy)
+            self.rng.shuffle(shown)
+        players_shown = [p["name"] for p in shown]
+        ids_shown = [p["id"] for p in shown]
+        
+        return {
+            "info_type": "washerwoman",
+            "players": players_shown,
+            "player_ids": ids_shown,
+            "role": target["role"]["name"],
+            "message": f"在 {' 和 '.join(players_shown)} 中，有一人是 {target['role']['name']}",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_librarian_info(self, player, is_drunk_or_poisoned=False):
+        """生成图书管理员信息"""
+        outsider_players = self._get_role_partitions()["outsider"]
+        if not outsider_players:
+            return {"message": "场上没有外来者（你得知0个玩家是外来者）", "is_drunk_or_poisoned": is_drunk_or_poisoned}
+        
+        target = self.rng.choice(outsider_players)
+        other_players = [p for p in self.players if p["id"] not in [player["id"], target["id"]]]
+        decoy = self.rng.choice(other_players) if other_players else None
+        
+        shown = [target]
+        if decoy:
+            shown.append(decoy)
+            self.rng.shuffle(shown)
+        players_shown = [p["name"] for p in shown]
+        ids_shown = [p["id"] for p in shown]
+        
+        # 获取目标的真实角色名（如果是酒鬼，显示"酒鬼"而不是假身份）
+        if target.get("is_the_drunk") and target.get("true_role"):
+            role_name = target["true_role"]["name"]  # 酒鬼的真实角色名
+        else:
+            role_name = target["role"]["name"]
+        
+        return {
+            "info_type": "librarian",
+            "players": players_shown,
+            "player_ids": ids_shown,
+            "role": role_name,
+            "message": f"在 {' 和 '.join(players_shown)} 中，有一人是 {role_name}",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_investigator_info(self, player, is_drunk_or_poisoned=False):
+        """生成调查员信息"""
+        # 检查陌客（可能被当作爪牙）
+        recluses = [p for p in self.players if p.get("role") and p["role"].get("id") == "recluse"]
+        
+        minion_players = self._get_role_partitions()["minion"]
+        
+        # 更新日期: 2026-10-19 - 由一致性求解器挑选目标，代替随机误判
+        if is_drunk_or_poisoned:
+            # 醉酒/中毒：展示的两名玩家中都不是爪牙
+            candidates = [p for p in self.players if p["id"] != player["id"]
+                          and p["role_type"] != "minion" and p not in recluses]
+        else:
+            # 陌客可以被当作爪牙显示
+            candidates = minion_players + [p for p in recluses if p["id"] != player["id"]]
+        
+        if not candidates:
+            return {"message": "场上没有爪牙", "is_drunk_or_poisoned": is_drunk_or_poisoned}
+        
+        seat_index = self._get_role_partitions()["seat_index"]
+        target = self._pick_consistent(player, [
+            (c, ("minion_in", 1 << seat_index[c["id"]], True)) for c in candidates
+        ])
+        
+        if target["role_type"] == "minion":
+            target_role_name = target["role"]["name"]
+        else:
+            # 随机选择一个爪牙角色来显示
+            minion_roles = self.script["roles"].get("minion", [])
+            fake_minion_role = self.rng.choice(minion_roles) if minion_roles else {"name": "爪牙"}
+            target_role_name = fake_minion_role["name"]
+            if not is_drunk_or_poisoned:
+                self.log_event("info.recluse_investigator", target["id"], fake_minion_role.get("id"))
+        
+        other_players = [p for p in self.players if p["id"] not in [player["id"], target["id"]]]
+        if is_drunk_or_poisoned:
+            other_players = [p for p in other_players if p["role_type"] != "minion"]
+        decoy = self.rng.choice(other_players) if other_players else None
+        
+        shown = [target]
+        if decoy:
+            shown.append(decoy)
+            self.rng.shuffle(shown)
+        players_shown = [p["name"] for p in shown]
+        ids_shown = [p["id"] for p in shown]
+        
+        return {
+            "info_type": "investigator",
+            "players": players_shown,
+            "player_ids": ids_shown,
+            "role": target_role_name,
+            "message": f"在 {' 和 '.join(players_shown)} 中，有一人是 {target_role_name}",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_chef_info(self, player, is_drunk_or_poisoned=False):
+        """生成厨师信息"""
+        # 计算相邻的邪恶玩家对数
+        pairs = 0
+        for i, p in enumerate(self.players):
+            if p["role_type"] in ["minion", "demon"]:
+                next_idx = (i + 1) % len(self.players)
+                if self.players[next_idx]["role_type"] in ["minion", "demon"]:
+                    pairs += 1
+        
+        return {
+            "info_type": "chef",
+            "pairs": pairs,
+            "message": f"有 {pairs} 对邪恶玩家相邻",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_empath_info(self, player, is_drunk_or_poisoned=False):
+        """生成共情者信息"""
+        player_idx = self._get_role_partitions()["seat_index"].get(player["id"], -1)
+        if player_idx == -1:
+            return {"message": "无法确定位置", "is_drunk_or_poisoned": is_drunk_or_poisoned}
+        
+        # 找到存活的邻居
+        neighbors = self._alive_neighbors(player_idx)
+        
+        # 更新日期: 2026-10-19 - 陌客可能被识别为邪恶、间谍可能被识别为善良，由一致性求解器挑选结果
+        evil_low = sum(1 for n in neighbors if n["role_type"] in ["minion", "demon"]
+                       and not (n.get("role") and n["role"].get("id") == "spy"))
+        evil_high = sum(1 for n in neighbors if n["role_type"] in ["minion", "demon"]
+                        or (n.get("role") and n["role"].get("id") == "recluse"))
+        true_values = list(range(evil_low, evil_high + 1))
+        
+        if is_drunk_or_poisoned:
+            # 醉酒/中毒：给出错误的数字
+            candidates = [v for v in range(len(neighbors) + 1) if v not in true_values] or true_values
+        else:
+            candidates = true_values
+        
+        neighbor_mask = seat_mask(self._get_role_partitions()["seat_index"][n["id"]] for n in neighbors)
+        evil_neighbors = self._pick_consistent(player, [
+            (v, ("evil_count", neighbor_mask, v)) for v in candidates
+        ])
+        
+        if not is_drunk_or_poisoned and evil_neighbors != evil_low:
+            for n in neighbors:
+                if n.get("role") and n["role"].get("id") == "recluse":
+                    self.log_event("info.recluse_empath", n["id"])
+        
+        return {
+            "info_type": "empath",
+            "evil_count": evil_neighbors,
+            "neighbor_ids": [n["id"] for n in neighbors],
+            "message": f"你的存活邻居中有 {evil_neighbors} 个是邪恶的",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_fortune_teller_info(self, player, target_players, is_drunk_or_poisoned=False):
+        """生成占卜师信息"""
+        if len(target_players) < 2:
+            return {
+                "info_type": "fortune_teller",
+                "message": "请选择两名玩家进行占卜",
+                "is_drunk_or_poisoned": is_drunk_or_poisoned
+            }
+        
+        target_names = " 和 ".join([t["name"] for t in target_players])
+        
+        # 正常状态：检查目标中是否有恶魔
+        has_demon = any(t["role_type"] == "demon" for t in target_players)
+        
+        # 红鲱鱼玩家会被误判为恶魔
+        red_herring_id = player.get("red_herring_id")
+        if red_herring_id and any(t["id"] == red_herring_id for t in target_players):
+            has_demon = True
+        
+        # 更新日期: 2026-10-19 - 由一致性求解器挑选结果，代替随机结果
+        seat_index = self._get_role_partitions()["seat_index"]
+        targets_mask = seat_mask(seat_index[t["id"]] for t in target_players)
+        
+        if is_drunk_or_poisoned:
+            # 醉酒/中毒时优先给出错误结果；与此前信息矛盾时改给真实结果
+            has_demon = self._pick_consistent(player, [(not has_demon, ("demon_in", targets_mask, not has_demon))],
+                                              fallback=[(has_demon, ("demon_in", targets_mask, has_demon))])
+            self.log_event("info.fortune_teller_affected", player["id"])
+            return {
+                "info_type": "fortune_teller",
+                "has_demon": has_demon,
+                "message": f"在 {target_names} 中，{'有' if has_demon else '没有'}恶魔",
+                "is_drunk_or_poisoned": True
+            }
+        
+        # 陌客可能被识别为恶魔
+        recluses = [t for t in target_players if t.get("role") and t["role"].get("id") == "recluse"]
+        if recluses and not has_demon:
+            has_demon = self._pick_consistent(player, [
+                (v, ("demon_in", targets_mask, v)) for v in (False, True)
+            ])
+            if has_demon:
+                self.log_event("info.recluse_fortune_teller", recluses[0]["id"])
+        
+        return {
+            "info_type": "fortune_teller",
+            "has_demon": has_demon,
+            "message": f"在 {target_names} 中，{'有' if has_demon else '没有'}恶魔",
+            "is_drunk_or_poisoned": False
+        }
+    
+    def _generate_clockmaker_info(self, player, is_drunk_or_poisoned=False):
+        """生成钟表匠信息"""
+        partitions = self._get_role_partitions()
+        demon_player = partitions["demon"][0] if partitions["demon"] else None
+        minion_players = partitions["minion"]
+        
+        if not demon_player or not minion_players:
+            return {"message": "无法生成信息", "is_drunk_or_poisoned": is_drunk_or_poisoned}
+        
+        seat_index = partitions["seat_index"]
+        demon_idx = seat_index[demon_player["id"]]
+        
+        min_distance = len(self.players)
+        for minion in minion_players:
+            minion_idx = seat_index[minion["id"]]
+            # 计算顺时针和逆时针距离
+            clockwise = (minion_idx - demon_idx) % len(self.players)
+            counter_clockwise = (demon_idx - minion_idx) % len(self.players)
+            distance = min(clockwise, counter_clockwise)
+            min_distance = min(min_distance, distance)
+        
+        return {
+            "info_type": "clockmaker",
+            "distance": min_distance,
+            "message": f"恶魔和最近的爪牙之间相隔 {min_distance} 步",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_chambermaid_info(self, player, target_players, is_drunk_or_poisoned=False):
+        """生成侍女信息 - 选择两名玩家，得知他们中有多少人今晚因自己的能力而被唤醒"""
+        if len(target_players) < 2:
+            return {
+                "info_type": "chambermaid",
+                "message": "请选择两名玩家",
+                "is_drunk_or_poisoned": is_drunk_or_poisoned
+            }
+        
+        # 检查目标玩家今晚是否因自己的能力被唤醒
+        # 需要根据夜间行动顺序判断
+        woke_count = 0
+        for target in target_players:
+            role = target.get("role")
+            if not role:
+                continue
+            
+            # 检查角色是否有夜间能力（first_night 或 other_nights）
+            role_has_night_ability = role.get("first_night", True) or role.get("other_nights", True)
+            
+            # 死亡玩家不会被唤醒（除非有特殊能力）
+            if not target["alive"]:
+                continue
+            
+            # 醉酒或中毒的玩家仍然会被唤醒，但能力无效
+            # 这里我们计算的是"被唤醒"的数量
+            if role_has_night_ability:
+                woke_count += 1
+        
+        target_names = " 和 ".join([t["name"] for t in target_players])
+        
+        return {
+            "info_type": "chambermaid",
+            "woke_count": woke_count,
+            "message": f"在 {target_names} 中，有 {woke_count} 人今晚因自己的能力而被唤醒",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_seamstress_info(self, player, target_players, is_drunk_or_poisoned=False):
+        """生成女裁缝信息 - 选择两名玩家（非自己），得知他们是否属于同一阵营"""
+        if len(target_players) < 2:
+            return {
+                "info_type": "seamstress",
+                "message": "请选择两名玩家",
+                "is_drunk_or_poisoned": is_drunk_or_poisoned
+            }
+        
+        # 判断两人是否同一阵营
+        target1_evil = target_players[0]["role_type"] in ["minion", "demon"]
+        target2_evil = target_players[1]["role_type"] in ["minion", "demon"]
+        same_team = target1_evil == target2_evil
+        
+        target_names = " 和 ".join([t["name"] for t in target_players])
+        result_text = "是" if same_team else "不是"
+        
+        return {
+            "info_type": "seamstress",
+            "same_team": same_team,
+            "message": f"{target_names} {result_text}同一阵营",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_dreamer_info(self, player, target_players, is_drunk_or_poisoned=False):
+        """生成筑梦师信息 - 选择一名玩家，得知其角色或虚假角色"""
+        if not target_players:
+            return {
+                "info_type": "dreamer",
+                "message": "请选择一名玩家",
+                "is_drunk_or_poisoned": is_drunk_or_poisoned
+            }
+        
+        target = target_players[0]
+        
+        # 获取目标的真实角色名（如果是酒鬼，显示"酒鬼"而不是假身份）
+        if target.get("is_the_drunk") and target.get("true_role"):
+            real_role = target["true_role"]["name"]
+        else:
+            real_role = target["role"]["name"] if target.get("role") else "未知"
+        
+        # 筑梦师会得知一个正确角色和一个错误角色
+        # 这里随机生成一个不同的角色作为干扰项
+        all_roles = []
+        for role_type in ["townsfolk", "outsider", "minion", "demon"]:
+            all_roles.extend([r["name"] for r in self.script["roles"].get(role_type, [])])
+        
+        fake_roles = [r for r in all_roles if r != real_role]
+        fake_role = self.rng.choice(fake_roles) if fake_roles else "无"
+        
+        # 随机排序两个角色
+        roles_shown = [real_role, fake_role]
+        self.rng.shuffle(roles_shown)
+        
+        return {
+            "info_type": "dreamer",
+            "roles": roles_shown,
+            "message": f"{target['name']} 的角色是 {roles_shown[0]} 或 {roles_shown[1]} 其中之一",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_undertaker_info(self, player, is_drunk_or_poisoned=False):
+        """生成殡仪馆老板信息 - 得知今天白天被处决死亡的玩家的角色"""
+        # 更新日期: 2026-10-19 - 只看刚结束的这一天（更早的处决不算）
+        last_execution = self.history.execution_on(self.day_number)
+        if last_execution is None:
+            return {
+                "info_type": "undertaker",
+                "message": "今天没有人被处决",
+                "is_drunk_or_poisoned": is_drunk_or_poisoned
+            }
+        
+        executed_player = next((p for p in self.players if p["id"] == last_execution.get("executed_id")), None)
+        
+        if executed_player:
+            # 获取目标的真实角色名（如果是酒鬼，显示"酒鬼"而不是假身份）
+            if executed_player.get("is_the_drunk") and executed_player.get("true_role"):
+                role_name = executed_player["true_role"]["name"]
+            else:
+                role_name = executed_player["role"]["name"] if executed_player.get("role") else "未知"
+            return {
+                "info_type": "undertaker",
+                "executed_id": executed_player["id"],
+                "executed_role": role_name,
+                "message": f"今天被处决的玩家 {executed_player['name']} 的角色是 {role_name}",
+                "is_drunk_or_poisoned": is_drunk_or_poisoned
+            }
+        
+        return {
+            "info_type": "undertaker",
+            "message": "无法获取处决信息",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_ravenkeeper_info(self, player, target_players, is_drunk_or_poisoned=False):
+        """生成鸦人保管者信息 - 死亡时选择一名玩家得知其角色"""
+        if not target_players:
+            return {
+                "info_type": "ravenkeeper",
+                "message": "请选择一名玩家查看其角色",
+                "is_drunk_or_poisoned": is_drunk_or_poisoned
+            }
+        
+        target = target_players[0]
+        
+        # 获取目标的真实角色名（如果是酒鬼，显示"酒鬼"而不是假身份）
+        if target.get("is_the_drunk") and target.get("true_role"):
+            role_name = target["true_role"]["name"]
+        else:
+            role_name = target["role"]["name"] if target.get("role") else "未知"
+        
+        return {
+            "info_type": "ravenkeeper",
+            "target_id": target["id"],
+            "target_role": role_name,
+            "message": f"{target['name']} 的角色是 {role_name}",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_oracle_info(self, player, is_drunk_or_poisoned=False):
+        """生成神谕者信息 - 得知死亡玩家中有几个是邪恶的"""
+        by_id = self._get_role_partitions()["by_id"]
+        evil_dead = sum(1 for pid in self.history.dead if by_id[pid]["role_type"] in ["minion", "demon"])
+        
+        return {
+            "info_type": "oracle",
+            "evil_dead_count": evil_dead,
+            "message": f"死亡玩家中有 {evil_dead} 个是邪恶的",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    def _generate_flowergirl_info(self, player, is_drunk_or_poisoned=False):
+        """生成卖花女孩信息 - 得知恶魔今天是否投过票"""
+        # 更新日期: 2026-10-19 - 按能力描述判断投票（举手赞成）而不是提名，查询当天历史
+        demon_voted = self.history.voted_yes(self.day_number, "demon")
+        result = "投了票" if demon_voted else "没有投票"
+        
+        return {
+            "info_type": "flowergirl",
+            "demon_voted": demon_voted,
+            "message": f"恶魔今天{result}",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+    
+    # 更新日期: 2026-10-19 - 城镇公告员
+    def _generate_town_crier_info(self, player, is_drunk_or_poisoned=False):
+        """生成城镇公告员信息 - 得知今天是否有爪牙提名"""
+        minion_nominated = self.history.nominated(self.day_number, "minion")
+        result = "有爪牙提名" if minion_nominated else "没有爪牙提名"
+        
+        return {
+            "info_type": "town_crier",
+            "minion_nominated": minion_nominated,
+            "message": f"今天{result}",
+            "is_drunk_or_poisoned": is_drunk_or_poisoned
+        }
+
+    
+    def _alive_neighbors(self, player_idx):
+        """获取座位左右两侧最近的存活邻居（同一人只计一次）"""
+        neighbors = []
+        total = len(self.players)
+        for direction in (-1, 1):
+            for offset in range(1, total):
+                neighbor = self.players[(player_idx + direction * offset) % total]
+                if neighbor["alive"]:
+                    if neighbor not in neighbors:
+                        neighbors.append(neighbor)
+                    break
+        return neighbors
+    
+    # ==================== 一致性世界求解器 ====================
+    # 更新日期: 2026-10-19 - 为醉酒/中毒与陌客/间谍误判信息挑选与此前信息一致的结果
+    
+    def _role_type_by_name(self, role_name):
+        """根据角色名查找其登记类型（good / minion / demon）"""
+        for role_type in ["townsfolk", "outsider", "minion", "demon"]:
+            for role in self.script["roles"][role_type]:
+                if role["name"] == role_name:
+                    return "good" if role_type in ["townsfolk", "outsider"] else role_type
+        return None
+    
+    def _info_query(self, player, target_players, info=None):
+        """根据角色确定求解器查询 (kind, arg)；提供 info 时同时给出本次信息对应的结果值"""
+        partitions = self._get_role_partitions()
+        seat_index = partitions["seat_index"]
+        role_id = player["role"]["id"]
+        info = info or {}
+        
+        def mask_of(player_ids):
+            return seat_mask(seat_index[pid] for pid in player_ids if pid in seat_index)
+        
+        target_ids = [t["id"] for t in target_players]
+        
+        if role_id == "empath":
+            player_idx = seat_index.get(player["id"], -1)
+            neighbor_ids = info.get("neighbor_ids") or [n["id"] for n in self._alive_neighbors(player_idx)]
+            return ("evil_count", mask_of(neighbor_ids)), info.get("evil_count")
+        if role_id == "oracle":
+            return ("evil_count", mask_of(self.history.dead)), info.get("evil_dead_count")
+        if role_id == "fortune_teller" and len(target_ids) >= 2:
+            return ("demon_in", mask_of(target_ids[:2])), info.get("has_demon")
+        if role_id == "seamstress" and len(target_ids) >= 2:
+            return ("same_team", mask_of(target_ids[:2])), info.get("same_team")
+        if role_id in ["investigator", "washerwoman", "librarian"]:
+            kind = "minion_in" if role_id == "investigator" else "good_in"
+            shown_ids = info.get("player_ids") or target_ids[:2]
+            return (kind, mask_of(shown_ids) if shown_ids else None), (True if shown_ids else None)
+        if role_id == "chef":
+            return ("evil_pairs", None), info.get("pairs")
+        if role_id == "clockmaker":
+            return ("demon_distance", None), info.get("distance")
+        if role_id == "undertaker":
+            execution = self.history.execution_on(self.day_number)
+            executed_id = info.get("executed_id") or (execution.get("executed_id") if execution else None)
+            if executed_id is None:
+                return None, None
+            value = self._role_type_by_name(info["executed_role"]) if info.get("executed_role") else None
+            return ("seat_type", mask_of([executed_id])), frozenset([value]) if value else None
+        if role_id in ["ravenkeeper", "dreamer"] and target_ids:
+            if role_id == "ravenkeeper":
+                names = [info["target_role"]] if info.get("target_role") else []
+            else:
+                names = info.get("roles", [])
+            types = frozenset(t for t in (self._role_type_by_name(n) for n in names) if t)
+            return ("seat_type", mask_of(target_ids[:1])), types or None
+        return None, None
+    
+    def _history_constraints(self, player_id, exclude_current=False):
+        """获取玩家已告知信息的约束列表（可排除本夜的记录，用于重新生成）"""
+        entries = self.info_history.get(player_id, [])
+        if exclude_current:
+            entries = [e for e in entries if e["night"] != self.night_number]
+        return [e["constraint"] for e in entries]
+    
+    def _get_world_solver(self, player, exclude_current=True):
+        """获取（并同步）玩家视角的求解器；世界参数变化时重建"""
+        seat_index = self._get_role_partitions()["seat_index"]
+        recluse_mask = seat_mask(seat_index[p["id"]] for p in self.players
+                                 if p.get("role") and p["role"].get("id") == "recluse")
+        spy_mask = seat_mask(seat_index[p["id"]] for p in self.players
+                             if p.get("role") and p["role"].get("id") == "spy")
+        minion_count = len(self._get_role_partitions()["minion"])
+        key = (len(self.players), minion_count, seat_index.get(player["id"]), recluse_mask, spy_mask)
+        
+        solver = self._world_solvers.get(player["id"])
+        if solver is None or solver.key != key:
+            solver = WorldSolver(len(self.players), minion_count, seat_index.get(player["id"]),
+                                 recluse_mask, spy_mask)
+            self._world_solvers[player["id"]] = solver
+        solver.sync(self._history_constraints(player["id"], exclude_current))
+        return solver
+    
+    def _true_world(self, player):
+        """真实世界（恶魔位、邪恶位集、爪牙位集、红鲱鱼位集），用于判断哪些结果是“真实”的"""
+        seat_index = self._get_role_partitions()["seat_index"]
+        demon_bit = evil = minion = 0
+        for p in self.players:
+            bit = 1 << seat_index[p["id"]]
+            if p["role_type"] == "demon":
+                demon_bit = demon_bit or bit
+                evil |= bit
+            elif p["role_type"] == "minion":
+                minion |= bit
+                evil |= bit
+        red_herring_id = player.get("red_herring_id")
+        red_herring = 1 << seat_index[red_herring_id] if red_herring_id in seat_index else 0
+        return [demon_bit, evil, minion, red_herring]
+    
+    def _pick_consistent(self, player, options, fallback=()):
+        """从 [(结果, 约束)] 中随机挑选一个与该玩家此前信息一致的结果
+        
+        options 都不一致时改从 fallback（次选的合法结果）中挑选，仍都不一致时从 options 中挑选。
+        只有一个合法结果时无需挑选，不构建/同步求解器；清醒玩家的误判（陌客、间谍）同样经过求解器
+        """
+        if len(options) + len(fallback) == 1:
+            return (list(options) + list(fallback))[0][0]
+        solver = self._get_world_solver(player)
+        for tier in (options, fallback):
+            consistent = [result for result, constraint in tier if solver.consistent(constraint)]
+            if consistent:
+                return self.rng.choice(consistent)
+        self.log_event("info.inconsistent", player["id"])
+        return self.rng.choice([result for result, _ in options])
+    
+    def _record_info(self, player, info, target_players):
+        """记录告知玩家的信息约束（同一夜同一角色的重新生成会覆盖之前的记录）"""
+        query, value = self._info_query(player, target_players, info)
+        if not query or value is None or (query[1] is None and query[0] not in ["evil_pairs", "demon_distance"]):
+            return
+        self._store_constraint(player["id"], info.get("info_type"), query + (value,))
+    
+    def _store_constraint(self, player_id, info_type, constraint):
+        entries = self.info_history.setdefault(player_id, [])
+        entries[:] = [e for e in entries if not (e["night"] == self.night_number and e["info_type"] == info_type)]
+        entries.append({
+            "night": self.night_number,
+            "day": self.day_number,
+            "info_type": info_type,
+            "constraint": constraint
+        })
+    
+    def record_told_info(self, player_id, value, targets=None):
+        """记录说书人实际告知玩家的结果（覆盖系统自动生成的记录）"""
+        player = next((p for p in self.players if p["id"] == player_id), None)
+        if not player or not player.get("role"):
+            return {"success": False, "error": "无效的玩家"}
+        
+        target_players = [p for p in self.players if p["id"] in (targets or [])]
+        query, _ = self._info_query(player, target_players)
+        if not query or (query[1] is None and query[0] not in ["evil_pairs", "demon_distance"]):
+            return {"success": False, "error": "该角色的信息暂不支持一致性记录"}
+        
+        if query[0] == "seat_type":
+            names = value if isinstance(value, list) else [value]
+            value = frozenset(self._role_type_by_name(n) or n for n in names)
+        
+        self._store_constraint(player_id, player["role"]["id"], query + (value,))
+        return {"success": True}
+    
+    @timed("Game.get_consistent_results")
+    def get_consistent_results(self, player_id, targets=None):
+        """列出与玩家此前所有信息一致的错误结果（供说书人在醉酒/中毒或误判时选择）"""
+        started = time.perf_counter()
+        player = next((p for p in self.players if p["id"] == player_id), None)
+        if not player or not player.get("role"):
+            return {"supported": False, "error": "无效的玩家"}
+        
+        target_players = [p for p in self.players if p["id"] in (targets or [])]
+        query, _ = self._info_query(player, target_players)
+        if not query:
+            return {"supported": False, "message": f"{player['role']['name']} 的信息暂不支持一致性求解"}
+        
+        kind, arg = query
+        solver = self._get_world_solver(player)
+        true_world = self._true_world(player)
+        result = {
+            "supported": True,
+            "info_type": player["role"]["id"],
+            "world_count": solver.world_count,
+            "constraint_count": len(solver.applied)
+        }
+        
+        if arg is None and kind in ["minion_in", "good_in"]:
+            # 调查员等未指定展示玩家时：逐个座位列出可被声称的玩家
+            seat_index = self._get_role_partitions()["seat_index"]
+            false_results = []
+            for p in self.players:
+                if p["id"] == player_id:
+                    continue
+                bit = 1 << seat_index[p["id"]]
+                if True in solver.values_for(true_world, kind, bit):
+                    continue
+                worlds = solver.support(kind, bit).get(True, 0)
+                if worlds:
+                    false_results.append({"value": p["id"], "player_name": p["name"], "worlds": worlds})
+            result["true_results"] = []
+            result["consistent_false_results"] = false_results
+        else:
+            true_values = solver.values_for(true_world, kind, arg)
+            support = solver.support(kind, arg)
+            result["true_results"] = sorted(true_values, key=str)
+            result["consistent_false_results"] = [
+                {"value": v, "worlds": n} for v, n in sorted(support.items(), key=lambda x: str(x[0]))
+                if v not in true_values
+            ]
+        
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
@@ -1,6 +1,8 @@
 # 血染钟楼游戏数据
 # Blood on the Clocktower Game Data
 
+from .roles import Role
+
 # 角色类型
 ROLE_TYPES = {
     "townsfolk": "镇民",
@@ -644,6 +646,11 @@ SCRIPTS = {
     }
 }
 
+# 更新日期: 2026-10-19 - 角色冻结为不可变的共享对象（附带预编码的 JSON 片段）
+for _script in SCRIPTS.values():
+    for _role_type, _roles in _script["roles"].items():
+        _script["roles"][_role_type] = [Role(role) for role in _roles]
+
 # 根据玩家数量计算角色分布
 def get_role_distribution(player_count):
     """根据玩家数量返回角色分布"""
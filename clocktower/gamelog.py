@@ -0,0 +1,366 @@
+"""
+血染钟楼 - 结构化对局日志
+更新日期: 2026-10-19
+
+写日志时只追加一个紧凑的元组 (单调时间戳, 日志类型, 事件ID, 参数)：参数是玩家ID、角色ID、
+数字等原始值，不在写入时拼接中文文本，也不格式化墙钟时间。
+客户端读取时才按语言渲染为 {"time", "type", "message"}（与原先的日志条目格式一致），
+渲染结果按 (语言, 类型筛选) 缓存；日志只追加，每次读取只需渲染新增的条目。
+结构化条目可直接按事件ID/类型查询，用于统计分析而无需解析文本。
+
+事件ID 为 None 的条目是自由文本（add_log 写入的说书人手写备注等），参数为 (文本,)；
+引擎、接口与流程器产生的日志都使用结构化事件。
+"""
+
+import time
+from datetime import datetime
+
+from .game_data import SCRIPTS
+
+DEFAULT_LOCALE = "zh"
+RAW_ENTRY_OVERHEAD = 16      # 字节估算：自由文本条目在文本之外的开销
+STRUCTURED_ENTRY_BYTES = 48  # 字节估算：结构化条目
+
+# 事件ID -> (日志类型, 参数名)
+# 参数名在 PLAYER_FIELDS 中的保存玩家ID、在 PLAYER_LIST_FIELDS 中的保存玩家ID元组、
+# 在 ROLE_FIELDS 中的保存角色ID，渲染时再换成名字；其余参数原样填入模板
+LOG_EVENTS = {
+    # 开局配置
+    "setup.outsider_modifier": ("setup", ("role", "outsiders", "townsfolk")),
+    "setup.godfather_forced": ("setup", ()),
+    "setup.baron": ("setup", ()),
+    "setup.godfather": ("setup", ()),
+    "setup.random": ("setup", ("count",)),
+    "setup.manual": ("setup", ("count",)),
+    "setup.red_herring_pending": ("setup", ()),
+    "setup.red_herring": ("setup", ("player",)),
+    # 阶段
+    "phase.night": ("phase", ("n",)),
+    "phase.day": ("phase", ("n",)),
+    # 状态
+    "status.drunk_ended": ("status", ("player",)),
+    "status.poison_ended": ("status", ("player",)),
+    "status.updated": ("status", ("player", "status", "value")),
+    # 夜间行动
+    "night.protect": ("night", ("player", "target")),
+    "night.protect_also": ("night", ("player", "target")),
+    "night.innkeeper_drunk": ("night", ("player",)),
+    "night.exorcised": ("night", ("player",)),
+    "night.kill": ("night", ("player", "target")),
+    "night.poison": ("night", ("player", "target")),
+    "night.skip": ("night", ("player",)),
+    "night.info": ("night", ("player",)),
+    "night.info_about": ("night", ("player", "target")),
+    "night.action": ("night", ("player", "action")),
+    "night.action_on": ("night", ("player", "action", "target")),
+    "night.protected": ("night", ("player",)),
+    "night.demon_exorcised": ("night", ("player", "role")),
+    "night.demon_kill": ("night", ("player", "role", "target")),
+    "night.demon_no_kill": ("night", ("player", "role")),
+    "night.po_charge": ("night", ("player",)),
+    "night.shabaloth_revive": ("night", ("player", "target")),
+    "night.pukka_poison": ("night", ("player", "target")),
+    "night.pukka_death": ("night", ("player",)),
+    "night.pukka_protected": ("night", ("player",)),
+    "night.drunk": ("night", ("player", "target", "days")),
+    "night.sailor": ("night", ("player", "target", "drunk_player")),
+    "night.grandchild": ("night", ("player", "target", "role")),
+    "night.butler": ("night", ("player", "target")),
+    "night.exorcist": ("night", ("player", "target")),
+    "night.exorcist_miss": ("night", ("player", "target")),
+    "night.exorcist_affected": ("night", ("player", "target")),
+    "night.devils_advocate": ("night", ("player", "target")),
+    "night.devils_advocate_affected": ("night", ("player", "target")),
+    "night.pit_hag": ("night", ("player", "target", "old_role", "new_role")),
+    "night.pit_hag_demon": ("night", ("player", "target", "old_role", "new_role")),
+    "night.pit_hag_no_role": ("night", ("player",)),
+    "night.pit_hag_affected": ("night", ("player",)),
+    "night.imp_no_minion": ("night", ("player",)),
+    "night.imp_starpass": ("night", ("player", "target", "old_role")),
+    "night.goon_good": ("night", ("player", "target")),
+    "night.goon_evil": ("night", ("player", "target")),
+    "night.goon_affected": ("night", ("player", "target")),
+    "mayor.substitute": ("night", ("player", "target")),
+    "mayor.declined": ("night", ("player",)),
+    "ravenkeeper.triggered": ("night", ("player",)),
+    "ravenkeeper.checked": ("night", ("player", "target", "role")),
+    "pit_hag.no_effect": ("night", ()),
+    "pit_hag.changed": ("night", ("target", "old_role", "new_role")),
+    "pit_hag.changed_demon": ("night", ("target", "old_role", "new_role")),
+    "pit_hag.demon_dies": ("night", ()),
+    "ability.used": ("info", ("player",)),
+    # 信息与系统提示
+    "info.batch": ("info", ("count", "delivered")),
+    "info.fortune_teller_affected": ("info", ("player",)),
+    "info.recluse_investigator": ("info", ("player", "role")),
+    "info.recluse_empath": ("info", ("player",)),
+    "info.recluse_fortune_teller": ("info", ("player",)),
+    "info.inconsistent": ("info", ("player",)),
+    "scarlet_woman.too_few": ("info", ("alive",)),
+    "scarlet_woman.affected": ("info", ("player",)),
+    # 玩家选择与行动请求
+    "player.choice": ("player_action", ("player", "role", "targets")),
+    "player.skip": ("player_action", ("player", "role")),
+    "player.pit_hag": ("player_action", ("target", "role")),
+    "player.pit_hag_in_play": ("player_action", ("target", "role")),
+    "action.waiting": ("info", ("player", "role")),
+    "action.day": ("info", ("player", "role")),
+    # 夜间流程器
+    "sequencer.precollected": ("info", ("count",)),
+    "sequencer.finished": ("info", ("steps", "total")),
+    "sequencer.stopped": ("info", ("steps", "total")),
+    # 白天技能
+    "slayer.affected": ("ability", ("player", "target")),
+    "slayer.miss": ("ability", ("player", "target")),
+    # 死亡结算钩子
+    "attack.soldier": ("night", ("player",)),
+    "attack.tea_lady": ("night", ("player",)),
+    "attack.fool": ("night", ("player",)),
+    "attack.ravenkeeper": ("night", ("player",)),
+    "execution.fool": ("execution", ("player",)),
+    "execution.devils_advocate": ("execution", ("player",)),
+    "execution.zombuul": ("execution", ("player",)),
+    "death.zombuul": ("death", ("player",)),
+    "saint.affected": ("info", ("player",)),
+    "saint.executed": ("game_end", ("player",)),
+    "moonchild.night": ("game_event", ("player",)),
+    "moonchild.execution": ("game_event", ("player",)),
+    "moonchild.declined": ("game_event", ("player",)),
+    "moonchild.evil_target": ("game_event", ("player", "target")),
+    "scarlet_woman.promoted": ("game_event", ("player", "role")),
+    # 白天
+    "nomination": ("nomination", ("nominator", "nominee")),
+    "vote.yes": ("vote", ("voter", "nominee")),
+    "vote.no": ("vote", ("voter", "nominee")),
+    "vote.batch": ("vote", ("voters", "nominee", "count", "required")),
+    "execution.executed": ("execution", ("player", "count", "required")),
+    "execution.failed": ("execution", ("player", "count", "required")),
+    "execution.virgin": ("execution", ("player",)),
+    "execution.pacifist_saved": ("execution", ("player",)),
+    "execution.pacifist_failed": ("execution", ("player",)),
+    # 死亡
+    "death.night": ("death", ("player", "cause")),
+    "death.storyteller": ("death", ("player", "cause")),
+    "death.slayer": ("death", ("player", "target")),
+    "death.moonchild": ("death", ("player", "target")),
+    "revive": ("revive", ("player",)),
+}
+
+PLAYER_FIELDS = frozenset(["player", "target", "nominator", "nominee", "voter", "drunk_player"])
+PLAYER_LIST_FIELDS = frozenset(["voters", "targets"])
+ROLE_FIELDS = frozenset(["role", "old_role", "new_role"])
+BOOL_FIELDS = frozenset(["value"])
+
+# 语言 -> {事件ID: 模板}；"_list" 为玩家列表的 (分隔符, 为空时的文本)，"_unknown" 为找不到玩家/角色时的文本，
+# "_bool" 为布尔参数的 (假, 真) 文本
+LOG_TEMPLATES = {
+    "zh": {
+        "_list": ("、", "无人"),
+        "_unknown": "未知",
+        "_bool": ("否", "是"),
+        "setup.outsider_modifier": "{role}在场：外来者 {outsiders:+d}，镇民 {townsfolk:+d}",
+        "setup.godfather_forced": "教父在场：外来者 +1，镇民 -1（场上无外来者，必须添加）",
+        "setup.baron": "男爵在场：请确保外来者数量比标准多2个",
+        "setup.godfather": "教父在场：请确保外来者数量比标准 +1 或 -1（由说书人决定）",
+        "setup.random": "已随机分配 {count} 名玩家的角色",
+        "setup.manual": "已手动分配 {count} 名玩家的角色",
+        "setup.red_herring_pending": "占卜师的红鲱鱼已设置（需说书人在开局时确认或修改）",
+        "setup.red_herring": "占卜师的红鲱鱼已设置为 {player}",
+        "phase.night": "第 {n} 个夜晚开始",
+        "phase.day": "第 {n} 天开始",
+        "status.drunk_ended": "{player} 的醉酒状态已结束",
+        "status.poison_ended": "{player} 的中毒状态已结束",
+        "status.updated": "更新 {player} 的 {status} 状态为 {value}",
+        "night.protect": "[夜间] {player} 保护了 {target}",
+        "night.protect_also": "[夜间] {player} 也保护了 {target}",
+        "night.innkeeper_drunk": "[夜间] {player} 因旅店老板的能力喝醉了",
+        "night.exorcised": "[夜间] {player} 被驱魔人阻止，无法击杀",
+        "night.kill": "[夜间] {player} 选择击杀 {target}",
+        "night.poison": "[夜间] {player} 对 {target} 下毒（持续到明晚入夜）",
+        "night.skip": "[夜间] {player} 选择不行动",
+        "night.info": "[夜间] {player} 获取了信息",
+        "night.info_about": "[夜间] {player} 获取了关于 {target} 的信息",
+        "night.action": "[夜间] {player} 执行了行动: {action}",
+        "night.action_on": "[夜间] {player} 执行了行动: {action} -> {target}",
+        "night.protected": "{player} 被保护，免疫了恶魔的击杀",
+        "night.demon_exorcised": "[夜间] {player} ({role}) 被驱魔人阻止，无法击杀",
+        "night.demon_kill": "[夜间] {player} ({role}) 选择击杀 {target}",
+        "night.demon_no_kill": "[夜间] {player} ({role}) 选择不击杀任何人",
+        "night.po_charge": "[夜间] {player} (珀) 选择不击杀任何人（下一晚可杀三人）",
+        "night.shabaloth_revive": "[夜间] {player} (沙巴洛斯) 复活了 {target}",
+        "night.pukka_poison": "[夜间] {player} (普卡) 选择 {target} 中毒",
+        "night.pukka_death": "[夜间] {player} 因普卡的毒素死亡",
+        "night.pukka_protected": "[夜间] {player} 被保护，免疫普卡的毒杀",
+        "night.drunk": "[夜间] {player} 使 {target} 醉酒 {days} 天",
+        "night.sailor": "[夜间] {player} (水手) 选择了 {target}，{drunk_player} 喝醉了",
+        "night.grandchild": "[夜间] {player} (祖母) 得知 {target} 是她的孙子，角色是 {role}",
+        "night.butler": "[夜间] {player} (管家) 选择 {target} 作为主人",
+        "night.exorcist": "[夜间] {player} (驱魔人) 选择了 {target}，恶魔今晚无法行动！",
+        "night.exorcist_miss": "[夜间] {player} (驱魔人) 选择了 {target}，但目标不是恶魔",
+        "night.exorcist_affected": "[夜间] {player} (驱魔人) 选择了 {target}（醉酒/中毒，能力无效）",
+        "night.devils_advocate": "[夜间] {player} (恶魔代言人) 选择保护 {target}，明天无法被处决",
+        "night.devils_advocate_affected": "[夜间] {player} (恶魔代言人) 选择了 {target}（醉酒/中毒，能力无效）",
+        "night.pit_hag": "[夜间] {player} (麻脸巫婆) 将 {target} 从 {old_role} 变为 {new_role}",
+        "night.pit_hag_demon": "[夜间] {player} (麻脸巫婆) 将 {target} 从 {old_role} 变为 {new_role}！⚠️ 创造了新恶魔！",
+        "night.pit_hag_no_role": "[夜间] {player} (麻脸巫婆) 选择的角色不存在",
+        "night.pit_hag_affected": "[夜间] {player} (麻脸巫婆) 选择了目标（醉酒/中毒，能力无效）",
+        "night.imp_no_minion": "[夜间] {player} (小恶魔) 自杀，但没有存活的爪牙可以传刀",
+        "night.imp_starpass": "🗡️ {player} (小恶魔) 自杀传刀！{target} (原{old_role}) 成为新的小恶魔！",
+        "night.goon_good": "💪 {player} 选择了莽夫 {target}，{player} 喝醉了，莽夫变为善良阵营",
+        "night.goon_evil": "💪 {player} 选择了莽夫 {target}，{player} 喝醉了，莽夫变为邪恶阵营",
+        "night.goon_affected": "💪 {player} 选择了莽夫 {target}（莽夫醉酒/中毒，能力无效）",
+        "mayor.substitute": "镇长 {player} 的能力触发，{target} 替镇长死亡",
+        "mayor.declined": "镇长 {player} 选择不使用替死能力",
+        "ravenkeeper.triggered": "守鸦人 {player} 在夜间死亡，等待玩家选择查验目标",
+        "ravenkeeper.checked": "[守鸦人] {player} 查验了 {target}，得知角色为 {role}",
+        "pit_hag.no_effect": "[夜间] 麻脸巫婆的能力无效（选择的角色已在场）",
+        "pit_hag.changed": "[夜间] 麻脸巫婆将 {target} 从 {old_role} 变为 {new_role}",
+        "pit_hag.changed_demon": "[夜间] 麻脸巫婆将 {target} 从 {old_role} 变为 {new_role}（新恶魔）",
+        "pit_hag.demon_dies": "[夜间] 说书人决定：新恶魔今晚死亡",
+        "ability.used": "[系统] {player} 的一次性技能已使用",
+        "info.batch": "[系统] 已批量生成 {count} 条夜间信息（已发送 {delivered} 条）",
+        "info.fortune_teller_affected": "[系统] 占卜师 {player} 处于醉酒/中毒状态，系统已自动生成错误结果",
+        "info.recluse_investigator": "[系统提示] 陌客 {player} 被调查员误认为 {role}",
+        "info.recluse_empath": "[系统提示] 陌客 {player} 被共情者误认为邪恶",
+        "info.recluse_fortune_teller": "[系统提示] 陌客 {player} 被占卜师误认为恶魔",
+        "info.inconsistent": "[系统提示] {player} 的候选信息均与其此前信息矛盾，已任选其一",
+        "scarlet_woman.too_few": "[系统] 存活玩家不足5人（当前{alive}人），红唇女郎能力无法触发",
+        "scarlet_woman.affected": "[系统] 红唇女郎 {player} 醉酒/中毒，能力无法触发",
+        "player.choice": "[玩家选择] {player} ({role}) 选择了 {targets}",
+        "player.skip": "[玩家选择] {player} ({role}) 选择跳过行动",
+        "player.pit_hag": "[玩家选择] 麻脸巫婆选择将 {target} 变为 {role}",
+        "player.pit_hag_in_play": "[玩家选择] 麻脸巫婆选择将 {target} 变为 {role}（角色在场，无事发生）",
+        "action.waiting": "[系统] 等待 {player} ({role}) 进行行动选择",
+        "action.day": "[系统] {player} ({role}) 正在进行白天行动",
+        "sequencer.precollected": "[系统] 已同时开放 {count} 个夜间选择",
+        "sequencer.finished": "[系统] 夜间流程结束（{steps}/{total} 步）",
+        "sequencer.stopped": "[系统] 夜间流程已中止（{steps}/{total} 步）",
+        "slayer.affected": "🗡️ {player}（杀手）公开选择了 {target}，但能力无效（醉酒/中毒）",
+        "slayer.miss": "🗡️ {player}（杀手）公开选择了 {target}，{target} 不是恶魔，无事发生",
+        "attack.soldier": "{player} 是士兵，免疫了恶魔的击杀",
+        "attack.tea_lady": "🍵 {player} 被茶艺师保护，无法死亡",
+        "attack.fool": "🃏 {player} (弄臣) 首次死亡被避免！",
+        "attack.ravenkeeper": "守鸦人 {player} 在夜间死亡，需要唤醒选择一名玩家",
+        "execution.fool": "🃏 {player} (弄臣) 首次死亡被避免！",
+        "execution.devils_advocate": "🛡️ {player} 被恶魔代言人保护，免于处决",
+        "execution.zombuul": "💀 {player} 被处决（僵怖假死）",
+        "death.zombuul": "💀 {player} 在夜间死亡（僵怖假死）",
+        "saint.affected": "[系统] 圣徒 {player} 醉酒/中毒，能力失效",
+        "saint.executed": "⚡ 圣徒 {player} 被处决！邪恶阵营获胜！",
+        "moonchild.night": "🌙 月之子 {player} 在夜间死亡，需要选择一名玩家",
+        "moonchild.execution": "🌙 月之子 {player} 被处决，需要选择一名玩家",
+        "moonchild.declined": "🌙 月之子 {player} 选择不使用能力",
+        "moonchild.evil_target": "🌙 月之子 {player} 选择了 {target}（邪恶玩家），目标存活",
+        "scarlet_woman.promoted": "💋 红唇女郎 {player} 继承了恶魔身份！成为 {role}！",
+        "nomination": "{nominator} 提名了 {nominee}",
+        "vote.yes": "{voter} 对 {nominee} 投了赞成票",
+        "vote.no": "{voter} 对 {nominee} 投了反对票",
+        "vote.batch": "对 {nominee} 的投票：{voters}赞成（{count}/{required} 票）",
+        "execution.executed": "{player} 被处决 (获得 {count}/{required} 票)",
+        "execution.failed": "{player} 未被处决 (获得 {count}/{required} 票)",
+        "execution.virgin": "⚡ 贞洁者能力触发！{player} 是镇民，立即被处决！",
+        "execution.pacifist_saved": "☮️ {player} 原本会被处决，但和平主义者的能力使其存活",
+        "execution.pacifist_failed": "{player} 被处决（和平主义者未能阻止）",
+        "death.night": "{player} 在夜间死亡 ({cause})",
+        "death.storyteller": "{player} 死亡 ({cause})",
+        "death.slayer": "🗡️ {player}（杀手）公开选择了 {target}，{target} 是恶魔，立即死亡！",
+        "death.moonchild": "🌙 月之子 {player} 选择了 {target}（善良玩家），{target} 死亡！",
+        "revive": "{player} 复活了",
+    },
+}
+
+# 角色ID -> 角色名（跨剧本，只构建一次）
+_role_names = {
+    role["id"]: role["name"]
+    for script in SCRIPTS.values()
+    for roles in script["roles"].values()
+    for role in roles
+}
+
+
+def _render_entry(entry, templates, names, epoch):
+    ts, log_type, event_id, args = entry
+    if event_id is None:
+        message = args[0]
+    else:
+        unknown = templates["_unknown"]
+        values = {}
+        for field, value in zip(LOG_EVENTS[event_id][1], args):
+            if field in PLAYER_FIELDS:
+                value = names.get(value, unknown)
+            elif field in PLAYER_LIST_FIELDS:
+                separator, empty = templates["_list"]
+                value = separator.join(names.get(pid, unknown) for pid in value) if value else empty
+            elif field in ROLE_FIELDS:
+                value = _role_names.get(value, unknown)
+            elif field in BOOL_FIELDS:
+                value = templates["_bool"][bool(value)]
+            values[field] = value
+        message = templates[event_id].format(**values)
+    return {
+        "time": datetime.fromtimestamp(epoch + ts).strftime("%H:%M:%S"),
+        "type": log_type,
+        "message": message
+    }
+
+
+class GameLog:
+    """只追加的结构化对局日志"""
+
+    def __init__(self):
+        self.entries = []  # (单调时间戳, 日志类型, 事件ID, 参数元组)
+        self._epoch = time.time() - time.monotonic()
+        self._views = {}   # (语言, 类型筛选) -> (已扫描条目数, 已渲染条目)，整体替换不原地修改
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, event_id, args):
+        """追加结构化条目（参数顺序与 LOG_EVENTS 中的参数名一致）"""
+        self.entries.append((time.monotonic(), LOG_EVENTS[event_id][0], event_id, args))
+
+    def append_text(self, message, log_type):
+        """追加自由文本条目"""
+        self.entries.append((time.monotonic(), log_type, None, (message,)))
+
+    def render(self, players, locale=None, types=None):
+        """渲染为 [{"time", "type", "message"}]（返回的列表为共享缓存，不要修改）
+
+        players: 用于把玩家ID换成名字
+        types: 只保留这些类型的条目（frozenset），None 表示全部
+        """
+        if locale not in LOG_TEMPLATES:
+            locale = DEFAULT_LOCALE
+        key = (locale, types)
+        scanned, rendered = self._views.get(key, (0, []))
+        end = len(self.entries)
+        if scanned < end:
+            templates = LOG_TEMPLATES[locale]
+            names = {p["id"]: p["name"] for p in players}
+            new = [
+                _render_entry(entry, templates, names, self._epoch)
+                for entry in self.entries[scanned:end]
+                if types is None or entry[1] in types
+            ]
+            # 发布新的快照而不是原地追加：并发读取时各自得到一致的 (已扫描数, 列表)，
+            # 已返回给其他请求的列表也不会在序列化途中被修改
+            rendered = rendered + new
+            self._views[key] = (end, rendered)
+        return rendered
+
+    def query(self, event_id=None, log_type=None):
+        """按事件ID/日志类型查询结构化条目（参数按名字展开，不渲染文本）"""
+        results = []
+        for ts, entry_type, entry_event, args in self.entries:
+            if event_id is not None and entry_event != event_id:
+                continue
+            if log_type is not None and entry_type != log_type:
+                continue
+            fields = LOG_EVENTS[entry_event][1] if entry_event is not None else ("message",)
+            results.append({
+                "timestamp": round(self._epoch + ts, 3),
+                "type": entry_type,
+                "event": entry_event,
+                "args": dict(zip(fields, args)),
+            })
+        return results
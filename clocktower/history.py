@@ -0,0 +1,122 @@
+"""
+血染钟楼 - 按天的历史记录
+更新日期: 2026-10-19
+
+只追加的对局历史：处决、提名（按提名者/被提名者）、死亡（按死因与天）、投票记录，
+按天与玩家建立索引。game.nominations 会在每个白天开始时清空，依赖"今天/昨天"的
+信息角色（送葬者、卖花女孩、城镇公告员、神谕者）改为从这里 O(1) 查询。
+
+天的编号与 Game.day_number 一致：第 N 个白天及其之后的第 N+1 个夜晚都能查询"第 N 天"；
+夜间死亡在天亮（start_day）时结算，记在新的一天、phase 为 "night"。
+"""
+
+
+class DayRecord:
+    """单日的历史记录"""
+
+    def __init__(self, day):
+        self.day = day
+        self.executions = []
+        self.nominations = []
+        self.by_nominator = {}   # 玩家ID -> 提名
+        self.by_nominee = {}     # 玩家ID -> 提名
+        self.nominator_types = set()  # 提名时提名者的角色类型
+        self.votes = []          # 投票记录 {"nomination_id", "voter_id", "vote", "voter_alive", "voter_role_type"}
+        self.yes_voters = set()
+        self.yes_voter_types = set()  # 投赞成票时投票者的角色类型
+        self.deaths = []         # {"player_id", "cause", "phase"}
+        self.deaths_by_cause = {}
+
+    def to_dict(self):
+        return {
+            "day": self.day,
+            "executions": self.executions,
+            "nominations": [{
+                "id": n["id"],
+                "nominator_id": n["nominator_id"],
+                "nominee_id": n["nominee_id"],
+            } for n in self.nominations],
+            "votes": self.votes,
+            "deaths": self.deaths,
+        }
+
+
+class GameHistory:
+    """整局的只追加历史"""
+
+    def __init__(self):
+        self.days = {}
+        self.deaths_by_player = {}  # 玩家ID -> [{"day", "cause", "phase"}]
+        self.dead = set()           # 当前死亡的玩家ID（复活时移除）
+
+    def day(self, day):
+        record = self.days.get(day)
+        if record is None:
+            record = self.days[day] = DayRecord(day)
+        return record
+
+    def record_nomination(self, day, nomination, nominator):
+        record = self.day(day)
+        record.nominations.append(nomination)
+        record.by_nominator[nomination["nominator_id"]] = nomination
+        record.by_nominee[nomination["nominee_id"]] = nomination
+        record.nominator_types.add(nominator.get("role_type"))
+
+    def record_vote(self, day, nomination, voter, vote_value):
+        record = self.day(day)
+        record.votes.append({
+            "nomination_id": nomination["id"],
+            "voter_id": voter["id"],
+            "vote": vote_value,
+            "voter_alive": voter["alive"],
+            "voter_role_type": voter.get("role_type"),
+        })
+        if vote_value:
+            record.yes_voters.add(voter["id"])
+            record.yes_voter_types.add(voter.get("role_type"))
+
+    def record_execution(self, day, execution):
+        self.day(day).executions.append(execution)
+
+    def record_death(self, day, phase, player_id, cause):
+        record = self.day(day)
+        death = {"player_id": player_id, "cause": cause, "phase": phase}
+        record.deaths.append(death)
+        record.deaths_by_cause.setdefault(cause, []).append(player_id)
+        self.deaths_by_player.setdefault(player_id, []).append({"day": day, "cause": cause, "phase": phase})
+        self.dead.add(player_id)
+
+    def record_revive(self, player_id):
+        self.dead.discard(player_id)
+
+    # ==================== 查询 ====================
+
+    def execution_on(self, day):
+        """当天最后一次处决（没有则返回 None）"""
+        record = self.days.get(day)
+        return record.executions[-1] if record and record.executions else None
+
+    def voted_yes(self, day, role_type):
+        """当天是否有该角色类型的玩家投过赞成票（按投票时的角色）"""
+        record = self.days.get(day)
+        return record is not None and role_type in record.yes_voter_types
+
+    def nominated(self, day, role_type):
+        """当天是否有该角色类型的玩家提名过（按提名时的角色）"""
+        record = self.days.get(day)
+        return record is not None and role_type in record.nominator_types
+
+    def deaths_on(self, day, cause=None):
+        record = self.days.get(day)
+        if record is None:
+            return []
+        if cause is None:
+            return [d["player_id"] for d in record.deaths]
+        return list(record.deaths_by_cause.get(cause, ()))
+
+    def to_dict(self):
+        """完整历史（按天排序，用于复盘）"""
+        return {
+            "days": [self.days[day].to_dict() for day in sorted(self.days)],
+            "dead": sorted(self.dead),
+        }
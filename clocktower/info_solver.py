@@ -0,0 +1,223 @@
+"""
+血染钟楼 - 一致性世界求解器
+更新日期: 2026-10-19
+
+为醉酒/中毒玩家或陌客/间谍可能误判时生成信息提供依据：
+枚举该玩家视角下所有可能的“世界”（恶魔座位 + 爪牙座位组合，以座位位集表示），
+并给出与该玩家此前得到的所有信息都保持一致的结果。
+
+约束格式 (kind, arg, value)：
+- ("evil_count", 座位位集, 数量)       共情者、神谕者：位集内登记为邪恶的人数
+- ("demon_in", 座位位集, 是/否)        占卜师：位集内是否有恶魔（考虑红鲱鱼）
+- ("minion_in", 座位位集, 是/否)       调查员：位集内是否有爪牙
+- ("good_in", 座位位集, 是/否)         洗衣妇、图书管理员：位集内是否有善良玩家
+- ("seat_type", 座位位集, 类型集合)    殡仪馆老板、守鸦人、筑梦师：该座位登记的角色类型
+- ("same_team", 座位位集, 是/否)       女裁缝：两名玩家是否同一阵营
+- ("evil_pairs", None, 对数)           厨师：相邻的邪恶玩家对数
+- ("demon_distance", None, 步数)       钟表匠：恶魔与最近爪牙的距离
+"""
+
+from itertools import combinations
+
+
+def popcount(mask):
+    """位集中的座位数量"""
+    return bin(mask).count("1")
+
+
+def seat_mask(seats):
+    """座位索引列表转位集"""
+    mask = 0
+    for seat in seats:
+        mask |= 1 << seat
+    return mask
+
+
+def _subsets(mask):
+    """枚举位集的所有子集"""
+    subsets = [0]
+    bit = 1
+    while bit <= mask:
+        if mask & bit:
+            subsets += [s | bit for s in subsets]
+        bit <<= 1
+    return subsets
+
+
+class WorldSolver:
+    """单个玩家视角下的可能世界集合
+
+    世界表示为 [恶魔位, 邪恶位集, 爪牙位集, 红鲱鱼候选位集]。
+    已应用的约束与幸存世界会被缓存，后续夜晚只需在幸存世界上应用新增约束。
+    """
+
+    def __init__(self, seat_count, minion_count, observer_seat=None, recluse_mask=0, spy_mask=0):
+        self.seat_count = seat_count
+        self.minion_count = minion_count
+        self.observer_seat = observer_seat
+        self.recluse_mask = recluse_mask  # 可能被登记为邪恶/爪牙/恶魔的座位（陌客）
+        self.spy_mask = spy_mask  # 可能被登记为善良的座位（间谍）
+        self.all_mask = (1 << seat_count) - 1
+        self.key = (seat_count, minion_count, observer_seat, recluse_mask, spy_mask)
+
+        # 误判组合：(登记为邪恶的陌客子集, 登记为善良的间谍子集)
+        self._flex = [(a, b) for a in _subsets(recluse_mask) for b in _subsets(spy_mask)]
+
+        self.applied = []
+        self.worlds = self._enumerate_worlds()
+
+    def _enumerate_worlds(self):
+        """枚举所有恶魔/爪牙座位组合（观察者本人视自己为善良）"""
+        seats = [s for s in range(self.seat_count) if s != self.observer_seat]
+        worlds = []
+        for demon in seats:
+            demon_bit = 1 << demon
+            others = [s for s in seats if s != demon]
+            for minions in combinations(others, self.minion_count):
+                minion_mask = seat_mask(minions)
+                evil = demon_bit | minion_mask
+                worlds.append([demon_bit, evil, minion_mask, self.all_mask & ~evil])
+        return worlds
+
+    @property
+    def world_count(self):
+        return len(self.worlds)
+
+    # ==================== 约束应用 ====================
+
+    def sync(self, constraints):
+        """同步约束列表：前缀不变时只应用新增约束，否则重新枚举"""
+        applied_count = len(self.applied)
+        if constraints[:applied_count] != self.applied:
+            self.applied = []
+            self.worlds = self._enumerate_worlds()
+            applied_count = 0
+        for constraint in constraints[applied_count:]:
+            self.apply(constraint)
+
+    def apply(self, constraint):
+        """应用一条约束，过滤掉不一致的世界"""
+        survivors = []
+        for world in self.worlds:
+            red_herring = self._check(world, constraint)
+            if red_herring is not None:
+                if red_herring != world[3]:
+                    world = [world[0], world[1], world[2], red_herring]
+                survivors.append(world)
+        self.worlds = survivors
+        self.applied.append(constraint)
+
+    def _check(self, world, constraint):
+        """检查世界是否满足约束；满足时返回（可能收窄的）红鲱鱼候选位集，否则返回 None"""
+        kind, arg, value = constraint
+        demon_bit, evil, minion, red_herring = world
+
+        if kind == "demon_in":
+            # 占卜师：恶魔或陌客在目标中可直接解释“是”，否则需要红鲱鱼在目标中
+            if value:
+                if (demon_bit | self.recluse_mask) & arg:
+                    return red_herring
+                red_herring &= arg
+            else:
+                if demon_bit & arg:
+                    return None
+                red_herring &= ~arg
+            return red_herring or None
+
+        if kind == "seat_type":
+            return red_herring if self._values(world, kind, arg) & value else None
+
+        return red_herring if value in self._values(world, kind, arg) else None
+
+    # ==================== 结果取值 ====================
+
+    def _values(self, world, kind, arg):
+        """该世界下（考虑误判）可能登记出的所有结果"""
+        demon_bit, evil, minion, red_herring = world
+        rec, spy = self.recluse_mask, self.spy_mask
+
+        if kind == "evil_count":
+            low = popcount(evil & arg & ~spy)
+            high = popcount((evil | rec) & arg)
+            return set(range(low, high + 1))
+
+        if kind == "minion_in":
+            return {bool(minion & arg & ~spy), bool((minion | rec) & arg)}
+
+        if kind == "good_in":
+            good = self.all_mask & ~evil
+            return {bool(good & arg & ~rec), bool((good | spy) & arg)}
+
+        if kind == "demon_in":
+            values = set()
+            if (demon_bit | rec) & arg or red_herring & arg:
+                values.add(True)
+            if not demon_bit & arg and red_herring & ~arg:
+                values.add(False)
+            return values
+
+        if kind == "seat_type":
+            if demon_bit & arg:
+                return {"demon"}
+            if minion & arg:
+                return {"minion", "good"} if spy & arg else {"minion"}
+            return {"good", "minion", "demon"} if rec & arg else {"good"}
+
+        if kind == "same_team":
+            seats = [bit for bit in (1 << s for s in range(self.seat_count)) if bit & arg]
+            registrations = []
+            for bit in seats:
+                options = {bool(evil & bit)}
+                if rec & bit:
+                    options.add(True)
+                if spy & bit:
+                    options.add(False)
+                registrations.append(options)
+            if len(registrations) < 2:
+                return set()
+            return {a == b for a in registrations[0] for b in registrations[1]}
+
+        if kind == "evil_pairs":
+            values = set()
+            for extra_evil, extra_good in self._flex:
+                registered = (evil | extra_evil) & ~extra_good
+                values.add(popcount(registered & self._rotate(registered)))
+            return values
+
+        if kind == "demon_distance":
+            values = set()
+            demon = demon_bit.bit_length() - 1
+            for extra_minion, extra_good in self._flex:
+                registered = (minion | extra_minion) & ~extra_good & ~demon_bit
+                distances = []
+                for seat in range(self.seat_count):
+                    if registered & (1 << seat):
+                        clockwise = (seat - demon) % self.seat_count
+                        distances.append(min(clockwise, self.seat_count - clockwise))
+                if distances:
+                    values.add(min(distances))
+            return values
+
+        return set()
+
+    def _rotate(self, mask):
+        """座位位集整体左移一位（第 i 位对应原第 i+1 位，环形）"""
+        return (mask >> 1) | ((mask & 1) << (self.seat_count - 1))
+
+    # ==================== 查询 ====================
+
+    def support(self, kind, arg):
+        """统计幸存世界中每个结果被多少个世界支持"""
+        counts = {}
+        for world in self.worlds:
+            for value in self._values(world, kind, arg):
+                counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def consistent(self, constraint):
+        """是否存在满足历史约束且满足该约束的世界"""
+        return any(self._check(world, constraint) is not None for world in self.worlds)
+
+    def values_for(self, world, kind, arg):
+        """指定世界（例如真实世界）下可能登记出的结果"""
+        return self._values(world, kind, arg)
@@ -0,0 +1,83 @@
+"""
+血染钟楼 - 引擎计时埋点
+更新日期: 2026-10-19
+
+为引擎中较重的调用（夜间顺序、胜负判定、序列化、玩家视角构建等）记录耗时直方图。
+不依赖 Flask；Web 层的 /api/server/metrics 会把这里的数据一并导出为 Prometheus 文本格式。
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+
+# 直方图桶上界（秒）
+DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """累计直方图（线程安全，记录一次只需一次二分查找）"""
+
+    __slots__ = ("buckets", "counts", "count", "total", "_lock")
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一格为 +Inf
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self):
+        """返回 ([(上界, 累计次数)], 总次数, 总和)，最后一个上界为 "+Inf" """
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.total
+        cumulative = []
+        running = 0
+        for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+            running += n
+            cumulative.append((bound, running))
+        return cumulative, count, total
+
+
+_engine_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def _histogram_for(name):
+    histogram = _engine_histograms.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _engine_histograms.setdefault(name, Histogram())
+    return histogram
+
+
+def timed(name):
+    """装饰器：记录被装饰函数每次调用的耗时"""
+    def decorator(func):
+        histogram = _histogram_for(name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def engine_metrics():
+    """所有引擎调用的直方图快照 {调用名: (累计桶, 次数, 总耗时)}"""
+    with _registry_lock:
+        items = list(_engine_histograms.items())
+    return {name: histogram.snapshot() for name, histogram in sorted(items)}
@@ -0,0 +1,132 @@
+"""
+血染钟楼 - 玩家信箱
+更新日期: 2026-10-19
+
+每名玩家一个 Mailbox：消息按单调递增的序号编号（同一信箱内不会重复），保存在容量固定的
+环形缓冲区中；已读状态用读游标（序号 <= read_seq 的消息均已读）加少量"超前已读"序号表示，
+未读数为 O(1)，没有新消息时轮询不产生任何遍历。
+
+持久化钩子：add_persistence_hook(hook) 注册的回调会在每次投递与已读游标变化时收到
+hook(event, mailbox, payload)，event 为 "append" 或 "read"；to_dict / from_dict 用于快照与恢复。
+"""
+
+from collections import deque
+
+MAILBOX_CAPACITY = 50
+
+_persistence_hooks = []
+
+
+def add_persistence_hook(hook):
+    """注册持久化回调 hook(event, mailbox, payload)"""
+    _persistence_hooks.append(hook)
+
+
+def remove_persistence_hook(hook):
+    if hook in _persistence_hooks:
+        _persistence_hooks.remove(hook)
+
+
+def _emit(event, mailbox, payload):
+    for hook in _persistence_hooks:
+        hook(event, mailbox, payload)
+
+
+class Mailbox:
+    """单个玩家的消息信箱"""
+
+    def __init__(self, owner_id, capacity=MAILBOX_CAPACITY):
+        self.owner_id = owner_id
+        self._ring = deque(maxlen=capacity)  # (序号, 消息)
+        self.last_seq = 0
+        self.read_seq = 0
+        self._read_ahead = set()  # 大于 read_seq 但已单独标记为已读的序号
+
+    def __len__(self):
+        return len(self._ring)
+
+    @property
+    def unread_count(self):
+        return self.last_seq - self.read_seq - len(self._read_ahead)
+
+    def append(self, message):
+        """投递一条消息，返回 (序号, 被挤出环形缓冲区的消息或 None)"""
+        evicted = None
+        if len(self._ring) == self._ring.maxlen:
+            old_seq, evicted = self._ring[0]
+            # 被挤出的未读消息不再计入未读数
+            if old_seq > self.read_seq:
+                self._read_ahead.discard(old_seq)
+                self.read_seq = old_seq
+                self._advance()
+        self.last_seq += 1
+        self._ring.append((self.last_seq, message))
+        _emit("append", self, {"seq": self.last_seq, "message": message})
+        return self.last_seq, evicted
+
+    def mark_read(self, seqs=None, up_to=None):
+        """标记已读：seqs 为序号列表，up_to 为读到的最大序号；都不指定时全部标记已读"""
+        before = (self.read_seq, len(self._read_ahead))
+        if seqs is None and up_to is None:
+            up_to = self.last_seq
+        if up_to is not None and up_to > self.read_seq:
+            self.read_seq = min(up_to, self.last_seq)
+            self._read_ahead = {s for s in self._read_ahead if s > self.read_seq}
+        for seq in seqs or ():
+            if self.read_seq < seq <= self.last_seq:
+                self._read_ahead.add(seq)
+        self._advance()
+        if (self.read_seq, len(self._read_ahead)) != before:
+            _emit("read", self, {"read_seq": self.read_seq, "read_ahead": sorted(self._read_ahead)})
+
+    def _advance(self):
+        while self.read_seq + 1 in self._read_ahead:
+            self.read_seq += 1
+            self._read_ahead.discard(self.read_seq)
+
+    def is_read(self, seq):
+        return seq <= self.read_seq or seq in self._read_ahead
+
+    def _view(self, seq, message):
+        return dict(message, id=f"msg_{seq}", seq=seq, read=self.is_read(seq))
+
+    def fetch(self, after=0):
+        """返回序号大于 after 的消息（按序号递增）"""
+        if after >= self.last_seq:
+            return []
+        return [self._view(seq, message) for seq, message in self._ring if seq > after]
+
+    def unread(self):
+        """返回全部未读消息；没有未读时为 O(1)"""
+        if not self.unread_count:
+            return []
+        return [self._view(seq, message) for seq, message in self._ring
+                if seq > self.read_seq and seq not in self._read_ahead]
+
+    @staticmethod
+    def parse_id(message_id):
+        """把 "msg_<序号>" 解析为序号（格式不符返回 None）"""
+        if isinstance(message_id, int):
+            return message_id
+        if isinstance(message_id, str) and message_id.startswith("msg_") and message_id[4:].isdigit():
+            return int(message_id[4:])
+        return None
+
+    def to_dict(self):
+        return {
+            "owner_id": self.owner_id,
+            "capacity": self._ring.maxlen,
+            "last_seq": self.last_seq,
+            "read_seq": self.read_seq,
+            "read_ahead": sorted(self._read_ahead),
+            "messages": [[seq, message] for seq, message in self._ring],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        mailbox = cls(data["owner_id"], data.get("capacity", MAILBOX_CAPACITY))
+        mailbox._ring.extend((seq, message) for seq, message in data.get("messages", []))
+        mailbox.last_seq = data.get("last_seq", 0)
+        mailbox.read_seq = data.get("read_seq", 0)
+        mailbox._read_ahead = set(data.get("read_ahead", []))
+        return mailbox
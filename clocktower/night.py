@@ -0,0 +1,273 @@
+"""
+血染钟楼 - 夜间行动配置
+更新日期: 2026-10-19
+
+说书人端的行动类型与玩家端的夜间行动配置，原先分别定义在 main.py 与 player_api.py 中。
+"""
+
+
+def get_action_type(role_id, role_type):
+    """说书人端夜间行动类型（决定说书人面板展示的操作控件）"""
+    # 更新日期: 2026-01-05 - 添加僵怖、沙巴洛斯、珀的特殊行动类型
+    # 僵怖 - 特殊击杀（需要判断是否有人死亡）
+    if role_id == "zombuul":
+        return "zombuul_kill"
+    
+    # 沙巴洛斯 - 每晚杀两人 + 可复活
+    if role_id == "shabaloth":
+        return "shabaloth_kill"
+    
+    # 珀 - 上晚不杀则本晚杀三人
+    if role_id == "po":
+        return "po_kill"
+    
+    # 普通恶魔类 - 击杀
+    demon_roles = ["imp", "fang_gu", "vigormortis", "no_dashii", "vortox"]
+    if role_id in demon_roles:
+        return "kill"
+    
+    # 普卡 - 特殊投毒恶魔（选择目标中毒，前一晚目标死亡）
+    if role_id == "pukka":
+        return "pukka_poison"
+    
+    # 保护类
+    protect_roles = ["monk", "innkeeper", "tea_lady"]
+    if role_id in protect_roles:
+        return "protect"
+    
+    # 爪牙击杀类
+    minion_kill_roles = ["godfather", "assassin"]
+    if role_id in minion_kill_roles:
+        return "kill"
+    
+    # 投毒类
+    poison_roles = ["poisoner"]
+    if role_id in poison_roles:
+        return "poison"
+    
+    # 醉酒类（使目标醉酒）
+    drunk_roles = ["courtier"]  # 侍臣
+    if role_id in drunk_roles:
+        return "drunk"
+    
+    # 水手 - 特殊醉酒（自己或目标醉酒）
+    if role_id == "sailor":
+        return "sailor_drunk"
+    
+    # 选择目标获取信息类
+    info_select_roles = ["fortune_teller", "empath", "undertaker", "ravenkeeper", 
+                        "dreamer", "chambermaid", "seamstress", "oracle", "flowergirl", "town_crier"]
+    if role_id in info_select_roles:
+        return "info_select"
+    
+    # 祖母 - 选择孙子
+    if role_id == "grandmother":
+        return "grandchild_select"
+    
+    # 管家 - 选择主人
+    if role_id == "butler":
+        return "butler_master"
+    
+    # 更新日期: 2026-01-05 - 驱魔人行动类型
+    # 驱魔人 - 选择目标（不能选之前选过的）
+    if role_id == "exorcist":
+        return "exorcist"
+    
+    # 更新日期: 2026-01-05 - 恶魔代言人行动类型
+    # 恶魔代言人 - 选择目标（不能选之前选过的），保护其免于处决
+    if role_id == "devils_advocate":
+        return "devils_advocate"
+    
+    # 首夜信息类
+    first_night_info = ["washerwoman", "librarian", "investigator", "chef", "clockmaker"]
+    if role_id in first_night_info:
+        return "info_first_night"
+    
+    # 麻脸巫婆 - 选择玩家和角色，改变其角色
+    if role_id == "pit_hag":
+        return "pit_hag"
+    
+    # 选择角色/能力类
+    ability_select_roles = ["philosopher", "cerenovus", "witch"]
+    if role_id in ability_select_roles:
+        return "ability_select"
+    
+    return "other"
+
+
+def get_night_action_config(role_id, role_type, game, player_id):
+    """获取夜间行动配置（每个阶段每名玩家只构建一次，死亡/复活时随可选目标缓存一起失效）
+    
+    返回的配置为共享对象，调用方不要修改
+    """
+    # 更新日期: 2026-10-19 - 从 Game 的阶段缓存读取
+    cache = getattr(game, '_action_configs', None)
+    key = (player_id, role_id, role_type)
+    if cache is not None and key in cache:
+        return cache[key]
+    config = _build_night_action_config(role_id, role_type, game, player_id)
+    if cache is not None:
+        cache[key] = config
+    return config
+
+
+def _build_night_action_config(role_id, role_type, game, player_id):
+    alive_players = game.target_list("alive", player_id)
+    all_players = game.target_list("all", player_id)
+    
+    # 基础配置
+    config = {
+        "type": "other",
+        "role_id": role_id,
+        "can_select": False,
+        "targets": [],
+        "target_kind": None,  # 可选目标来源："alive" 存活玩家、"all" 全部玩家
+        "max_targets": 1,
+        "description": ""
+    }
+    
+    # 根据角色类型配置
+    if role_type == "demon":
+        config["type"] = "kill"
+        config["can_select"] = True
+        config["targets"] = alive_players
+        config["target_kind"] = "alive"
+        config["description"] = "选择一名玩家击杀"
+    
+    elif role_id == "monk":
+        config["type"] = "protect"
+        config["can_select"] = True
+        config["targets"] = alive_players
+        config["target_kind"] = "alive"
+        config["description"] = "选择一名玩家保护"
+    
+    elif role_id == "poisoner":
+        config["type"] = "poison"
+        config["can_select"] = True
+        config["targets"] = alive_players
+        config["target_kind"] = "alive"
+        config["description"] = "选择一名玩家下毒"
+    
+    elif role_id == "fortune_teller":
+        config["type"] = "fortune_tell"
+        config["can_select"] = True
+        config["targets"] = all_players
+        config["target_kind"] = "all"
+        config["max_targets"] = 2
+        config["description"] = "选择两名玩家查验是否有恶魔"
+    
+    elif role_id == "empath":
+        config["type"] = "info"
+        config["can_select"] = False
+        config["description"] = "等待说书人告知你邻座的邪恶玩家数量"
+    
+    elif role_id == "undertaker":
+        config["type"] = "info"
+        config["can_select"] = False
+        config["description"] = "等待说书人告知昨天被处决玩家的角色"
+    
+    elif role_id == "ravenkeeper":
+        config["type"] = "investigate"
+        config["can_select"] = True
+        config["targets"] = all_players
+        config["target_kind"] = "all"
+        config["description"] = "选择一名玩家查验其角色"
+    
+    elif role_id == "slayer":
+        config["type"] = "day_ability"
+        config["can_select"] = False
+        config["description"] = "你的能力在白天使用"
+    
+    elif role_id == "butler":
+        config["type"] = "choose_master"
+        config["can_select"] = True
+        config["targets"] = alive_players
+        config["target_kind"] = "alive"
+        config["description"] = "选择你的主人（只能跟随主人投票）"
+    
+    elif role_id == "spy":
+        config["type"] = "info"
+        config["can_select"] = False
+        config["description"] = "你可以查看魔典（说书人会告知信息）"
+    
+    elif role_id in ["washerwoman", "librarian", "investigator", "chef", "clockmaker"]:
+        config["type"] = "info"
+        config["can_select"] = False
+        config["description"] = "等待说书人提供首夜信息"
+    
+    else:
+        config["type"] = "no_action"
+        config["description"] = "你今晚没有行动"
+    
+    return config
+
+
+# 更新日期: 2026-10-19 - 夜间行动的数据依赖（用于并行预收集玩家选择）
+# 可由引擎直接生成信息的角色
+INFO_ROLES = {
+    "washerwoman", "librarian", "investigator", "chef", "empath", "fortune_teller",
+    "clockmaker", "chambermaid", "seamstress", "dreamer", "undertaker", "oracle", "flowergirl", "town_crier",
+}
+
+
+def _action_writes(item, action_type):
+    """结算该行动可能改变、且会影响之后玩家选择的状态
+    
+    ("role", 玩家ID | "minion" | "any")：某些玩家的角色；"alive"：存活名单（可选目标）
+    恶魔击杀在天亮时才结算、复活只会增加可选目标，都不会使已做出的选择失效
+    """
+    role_id = item["role"]["id"]
+    if action_type == "pit_hag":
+        return {("role", "any")}  # 改变任意玩家的角色（可能造出新恶魔）
+    if role_id == "imp":
+        return {("role", "minion")}  # 自杀传刀：爪牙变为小恶魔
+    if role_id == "philosopher":
+        return {("role", item["player"]["id"])}  # 获得其他角色的能力
+    if action_type == "other":
+        return {("role", "any"), "alive"}  # 说书人手动处理（可能当场杀死玩家），保守假定
+    return set()
+
+
+def _conflicts(writes, player, reads_alive):
+    for key in writes:
+        if key == "alive":
+            if reads_alive:
+                return True
+        elif key[1] == "any" or key[1] == player["id"] or (key[1] == "minion" and player.get("role_type") == "minion"):
+            return True
+    return False
+
+
+def classify_night_order(game, order):
+    """按数据依赖对夜间顺序分类，返回与 order 对齐的列表
+    
+    kind: "choice"（玩家选择目标）、"info"（引擎生成信息）、"storyteller"（需说书人处理）
+    depends_on: 会使该玩家的选择失效的更早步骤下标；为空的选择步骤可在入夜时同时开放
+    """
+    entries = []
+    writes = []
+    for index, item in enumerate(order):
+        player = item["player"]
+        role_id = item["role"]["id"]
+        role_type = game._get_role_type(item["role"])
+        action_type = get_action_type(role_id, role_type)
+        config = get_night_action_config(role_id, role_type, game, player["id"])
+        if config["can_select"]:
+            kind = "choice"
+        elif role_id in INFO_ROLES:
+            kind = "info"
+        else:
+            kind = "storyteller"
+        depends_on = []
+        if kind == "choice":
+            # 可选目标按存活筛选时，选择依赖存活名单
+            reads_alive = config["target_kind"] == "alive"
+            depends_on = [i for i, w in enumerate(writes) if _conflicts(w, player, reads_alive)]
+        entries.append({
+            "index": index,
+            "kind": kind,
+            "action_type": action_type,
+            "depends_on": depends_on,
+        })
+        writes.append(_action_writes(item, action_type))
+    return entries
@@ -0,0 +1,191 @@
+"""
+血染钟楼 - 剧本角色表
+更新日期: 2026-10-19
+
+每个剧本构建一次 RoleTable：按 镇民/外来者/爪牙/恶魔 的顺序为角色编号（位下标），
+提供 O(1) 的角色与角色类型查找，并预先生成角色选择器（麻脸巫婆等）所需的条目。
+对局用一个整数位集记录在场角色（Game.roles_in_play），选择器载荷按 (剧本, 位集) 缓存，
+版本号 "<剧本版本>-<位集>" 可作为 ETag 供客户端缓存。
+
+剧本中的角色是不可变的共享对象 Role（只读映射），附带预编码的 JSON 片段：
+encode_json 序列化时直接拼接这些片段，整份魔典的序列化主要是字符串拼接。
+"""
+
+import json
+import re
+import secrets
+import zlib
+from collections.abc import Mapping
+
+ROLE_TYPE_ORDER = ["townsfolk", "outsider", "minion", "demon"]
+PICKER_CACHE_SIZE = 64  # 每个剧本缓存的选择器载荷数（不同的在场组合）
+
+_FRAGMENT_SEPARATORS = (",", ":")
+# 占位字符串编码后的形式 "\u0000role:<本次随机数>:<序号>\u0000"
+_MARKER = re.compile(r'"\\u0000role:([0-9a-f]+):(\d+)\\u0000"')
+
+
+class Role(Mapping):
+    """不可变的剧本角色（所有对局、玩家共享同一个对象）
+    
+    用法与只读字典相同（role["id"]、role.get("name")、dict(role)），任何修改都会抛出异常，
+    不会误改共享的剧本数据；深拷贝/序列化时返回或重建同一份内容。
+    """
+
+    __slots__ = ("_data", "_fragments", "get")
+
+    def __init__(self, data):
+        data = dict(data)
+        object.__setattr__(self, "_data", data)
+        # 直接使用字典的 get（角色查找在热点路径上）
+        object.__setattr__(self, "get", data.get)
+        # 预编码的 JSON 片段：(ensure_ascii=True, ensure_ascii=False)，键排序与 jsonify 一致
+        object.__setattr__(self, "_fragments", (
+            json.dumps(data, sort_keys=True, separators=_FRAGMENT_SEPARATORS),
+            json.dumps(data, ensure_ascii=False, sort_keys=True, separators=_FRAGMENT_SEPARATORS),
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Role 是不可变对象")
+
+    def __delattr__(self, name):
+        raise AttributeError("Role 是不可变对象")
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def keys(self):
+        return self._data.keys()
+
+    def items(self):
+        return self._data.items()
+
+    def values(self):
+        return self._data.values()
+
+    def __repr__(self):
+        return f"Role({self._data!r})"
+
+    def __reduce__(self):
+        return (Role, (self._data,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def fragment(self, ensure_ascii=True):
+        """预编码的 JSON 文本"""
+        return self._fragments[0 if ensure_ascii else 1]
+
+
+def encode_json(obj, dumps=json.dumps, **kwargs):
+    """序列化为 JSON：Role 直接拼接预编码片段，其余交给 dumps（可传入 default 处理其他类型）"""
+    fallback = kwargs.pop("default", None)
+    ensure_ascii = kwargs.get("ensure_ascii", True)
+    roles = []
+    # 每次调用使用不可预测的随机数：载荷中的用户文本即使与占位格式相同也不会被替换
+    nonce = secrets.token_hex(8)
+
+    def default(o):
+        if isinstance(o, Role):
+            roles.append(o)
+            # 占位字符串，编码后整体替换为片段
+            return f"\x00role:{nonce}:{len(roles) - 1}\x00"
+        if fallback is not None:
+            return fallback(o)
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    text = dumps(obj, default=default, **kwargs)
+    if not roles:
+        return text
+
+    def splice(match):
+        index = int(match.group(2))
+        if match.group(1) != nonce or index >= len(roles):
+            return match.group(0)
+        return roles[index].fragment(ensure_ascii)
+
+    return _MARKER.sub(splice, text)
+
+
+class RoleTable:
+    """单个剧本的角色索引与预生成的选择器条目"""
+
+    def __init__(self, script_id, script):
+        self.script_id = script_id
+        self.roles = []        # 按位下标排列的角色字典
+        self.types = []        # 与 roles 对齐的角色类型
+        self.bit = {}          # 角色ID -> 位下标
+        self.entries = []      # 选择器条目 {"id", "name", "type", "ability"}
+        for role_type in ROLE_TYPE_ORDER:
+            for role in script["roles"].get(role_type, []):
+                self.bit[role["id"]] = len(self.roles)
+                self.roles.append(role)
+                self.types.append(role_type)
+                self.entries.append({
+                    "id": role["id"],
+                    "name": role["name"],
+                    "type": role_type,
+                    "ability": role.get("ability", ""),
+                })
+        # 剧本内容变化时版本随之变化
+        self.version = f"{script_id}.{zlib.crc32(json.dumps(self.entries, ensure_ascii=False).encode('utf-8')):08x}"
+        self._pickers = {}
+
+    def find(self, role_id):
+        """角色ID -> 角色字典（不在剧本中返回 None）"""
+        index = self.bit.get(role_id)
+        return self.roles[index] if index is not None else None
+
+    def role_type(self, role_id):
+        index = self.bit.get(role_id)
+        return self.types[index] if index is not None else None
+
+    def mask_of(self, role_ids):
+        mask = 0
+        for role_id in role_ids:
+            index = self.bit.get(role_id)
+            if index is not None:
+                mask |= 1 << index
+        return mask
+
+    def picker(self, in_play):
+        """在场位集对应的选择器载荷（同一位集只生成一次）"""
+        payload = self._pickers.get(in_play)
+        if payload is not None:
+            return payload
+        current = [e["id"] for i, e in enumerate(self.entries) if in_play >> i & 1]
+        payload = {
+            "version": f"{self.version}-{in_play:x}",
+            "current_role_ids": current,
+            "available_roles": [e for i, e in enumerate(self.entries) if not in_play >> i & 1],
+            "roles": [dict(e, in_play=bool(in_play >> i & 1)) for i, e in enumerate(self.entries)],
+        }
+        if len(self._pickers) >= PICKER_CACHE_SIZE:
+            self._pickers.clear()
+        self._pickers[in_play] = payload
+        return payload
+
+
+_tables = {}
+
+
+def get_role_table(script_id):
+    """剧本的角色表（进程内每个剧本只构建一次）"""
+    table = _tables.get(script_id)
+    if table is None:
+        # game_data 在加载时用 Role 冻结角色，这里延迟导入以避免循环导入
+        from .game_data import SCRIPTS
+        table = _tables[script_id] = RoleTable(script_id, SCRIPTS[script_id])
+    return table
@@ -0,0 +1,450 @@
+"""
+血染钟楼 - 服务器端夜间流程器
+更新日期: 2026-10-19
+
+说书人开启后，NightSequencer 在后台线程中按入夜时固定下来的夜间顺序逐个唤醒玩家：
+为需要选择的角色下发 PendingAction（玩家端通过原有 submit_action 接口提交），
+等待提交或超时后按 record_night_action 的语义结算，信息类角色自动生成并发送信息，
+然后推进 game.current_night_index 并通过事件总线推送轮次变化。
+
+确认点可配置：confirm 为行动类型或角色ID的集合（"all" 表示每一步都确认），
+命中的步骤在结算前暂停，等待说书人确认（可改写选择，或声明已手动处理）。
+流程器不保存在 Game 上（线程与事件对象无法深拷贝），按对局登记在本模块中。
+
+加锁：流程线程对对局的每次读写（推进轮次、下发行动、构建可选目标、结算）都持有对局锁 game.lock，
+与说书人/玩家的请求线程互斥（请求期间由 Web 层持有同一把锁），手动行动不会与自动结算交错。
+等锁时轮询中止标记：请求线程可能持锁调用 stop() 并等待本线程退出。
+
+中止：线程持锁后先检查中止标记再写对局，stop() 持同一把锁置位并完成收尾，
+因此 stop() 返回后线程不会再修改对局；stop_night_sequencer 随后再限时等待线程退出，
+调用方即可安全地进入白天或删除对局。
+
+并行预收集（parallel=True）：入夜时按 classify_night_order 的数据依赖，把不依赖更早步骤的
+玩家选择同时开放，玩家可以同时作答；结算仍严格按夜间顺序进行。轮到某一步时重新校验
+预收集的选择（玩家仍存活、角色未变、目标仍可选），只有被更早的结算结果作废时才重新询问。
+"""
+
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+
+from .actions import PendingAction
+from .events import bus as event_bus
+from .night import get_action_type, get_night_action_config, classify_night_order, INFO_ROLES
+
+DEFAULT_STEP_TIMEOUT = 60  # 秒
+STOP_JOIN_TIMEOUT = 5      # 秒，中止后等待流程线程退出的上限
+LOCK_POLL_INTERVAL = 0.05  # 秒，流程线程等待对局锁时检查中止标记的间隔
+# 引擎无法自动结算、默认需要说书人确认的行动类型
+DEFAULT_CONFIRM = ("pit_hag", "ability_select", "other")
+
+ACTION_LABELS = {
+    "kill": "击杀",
+    "zombuul_kill": "击杀",
+    "shabaloth_kill": "击杀",
+    "po_kill": "击杀",
+    "pukka_poison": "投毒",
+    "poison": "投毒",
+    "protect": "保护",
+    "exorcist": "驱魔",
+}
+
+_sequencers = weakref.WeakKeyDictionary()  # Game -> NightSequencer
+
+
+class NightSequencer:
+    """单个夜晚的自动流程"""
+
+    def __init__(self, game, confirm=DEFAULT_CONFIRM, step_timeout=DEFAULT_STEP_TIMEOUT, parallel=True):
+        # 只弱引用对局（登记表的值若强引用键，对局被淘汰后无法释放）；运行中由线程持有
+        self._game_ref = weakref.ref(game)
+        self.confirm = {confirm} if isinstance(confirm, str) else set(confirm or ())
+        self.step_timeout = step_timeout
+        self.night_number = game.night_number
+        self.order = game.get_night_order()  # 本夜顺序快照，流程中不再重新计算
+        self.parallel = parallel
+        self.dependencies = classify_night_order(game, self.order)
+        self._collected = {}  # 步骤下标 -> 预收集的 PendingAction
+        self.index = 0
+        self.status = "idle"  # idle, running, awaiting_confirmation, finished, stopped
+        self.steps = []
+        self.current_action = None
+        self._confirmed = threading.Event()
+        self._confirmation = None
+        self._stopped = threading.Event()
+        self._lock = game.lock  # 对局锁：线程读写对局与请求线程、stop() 互斥
+        self._thread = None
+
+    @property
+    def game(self):
+        return self._game_ref()
+
+    # ==================== 控制 ====================
+
+    def start(self):
+        self.game.current_night_order = self.order
+        self.game.current_night_index = 0
+        self.status = "running"
+        self._thread = threading.Thread(target=self._run, name=f"night-{self.game.game_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """中止流程（当前行动被取消，已结算的步骤保留）
+
+        持锁置位：正在进行的结算先完成，此后线程不再写对局；收尾也在此完成
+        """
+        with self._lock:
+            if self._stopped.is_set():
+                return
+            self._stopped.set()
+            if self.current_action is not None:
+                self.current_action.cancel("stopped")
+            self._finish()
+        self._confirmed.set()
+
+    def confirm_step(self, choice=None, apply=True):
+        """说书人确认当前步骤：choice 可改写玩家的选择；apply=False 表示说书人已手动处理"""
+        if self.status != "awaiting_confirmation":
+            return False
+        self._confirmation = {"choice": choice, "apply": apply}
+        self._confirmed.set()
+        return True
+
+    def is_running(self):
+        return self.status in ("running", "awaiting_confirmation")
+
+    def join(self, timeout=None):
+        """等待流程线程退出，返回线程是否已退出"""
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        return self._thread is None or not self._thread.is_alive()
+
+    @contextmanager
+    def _hold(self):
+        """流程线程持有对局锁，产出是否仍可写对局（已中止时为 False）
+
+        等锁期间被中止则不再等待：stop() 的调用方可能正持锁等待本线程退出
+        """
+        while not self._lock.acquire(timeout=LOCK_POLL_INTERVAL):
+            if self._stopped.is_set():
+                yield False
+                return
+        try:
+            yield not self._stopped.is_set()
+        finally:
+            self._lock.release()
+
+    # ==================== 流程 ====================
+
+    def _run(self):
+        game = self.game  # 流程运行期间保持对局存活
+        if self.parallel:
+            self._precollect()
+        for index, item in enumerate(self.order):
+            with self._hold() as active:
+                if not active:
+                    break
+                self.index = index
+                game.current_night_index = index
+                self._publish_turn(item)
+            self.steps.append(self._run_step(index, item, self._collected.pop(index, None)))
+        with self._hold() as active:
+            # 被中止时 stop() 已完成收尾
+            if active:
+                self._finish()
+
+    def _finish(self):
+        """收尾：取消未用的预收集行动并推送结束（调用方持有锁）"""
+        game = self.game
+        for action in self._collected.values():
+            action.cancel("stopped")
+        self._collected.clear()
+        self.current_action = None
+        self.index = len(self.order)
+        self.status = "stopped" if self._stopped.is_set() else "finished"
+        if game is None:
+            return
+        game.current_night_index = len(self.order)
+        self._publish_turn(None)
+        game.log_event("sequencer.stopped" if self._stopped.is_set() else "sequencer.finished", len(self.steps), len(self.order))
+
+    def _precollect(self):
+        """同时开放所有不依赖更早步骤的玩家选择（不设超时，轮到该步时再按步骤超时等待）"""
+        with self._hold() as active:
+            if not active:
+                return
+            for index, item in enumerate(self.order):
+                dependency = self.dependencies[index]
+                if dependency["kind"] != "choice" or dependency["depends_on"] or not item["player"]["alive"]:
+                    continue
+                player = item["player"]
+                role = item["role"]
+                config = get_night_action_config(role["id"], self.game._get_role_type(role), self.game, player["id"])
+                self._collected[index] = self._issue(player, role, config, expires=False)
+            if self._collected:
+                self.game.log_event("sequencer.precollected", len(self._collected))
+
+    def _invalid_reason(self, choice, config):
+        """预收集的选择在轮到该步时是否仍然有效（无效时返回原因）"""
+        if choice.get("skipped"):
+            return None
+        valid_ids = {t["id"] for t in config["targets"]}
+        if any(t not in valid_ids for t in choice.get("targets") or []):
+            return "所选目标已不可选"
+        return None
+
+    def _run_step(self, index, item, action=None):
+        game = self.game
+        player = item["player"]
+        role = item["role"]
+        role_type = game._get_role_type(role)
+        action_type = get_action_type(role["id"], role_type)
+        step = {
+            "index": index,
+            "player_id": player["id"],
+            "player_name": player["name"],
+            "role_id": role["id"],
+            "role_name": role["name"],
+            "action_type": action_type,
+            "status": "pending",
+            "choice": None,
+        }
+        with self._hold() as active:
+            # 本夜早些时候死亡的玩家不再被唤醒；角色被改变（麻脸巫婆、传刀）后原角色不再行动
+            skip = "stopped" if not active else "skipped_dead" if not player["alive"] \
+                else "skipped_role_changed" if player["role"] is not role else None
+            if skip:
+                if action is not None:
+                    action.cancel(skip)
+                step["status"] = skip
+                return step
+            config = get_night_action_config(role["id"], role_type, game, player["id"])
+            if config["can_select"]:
+                if action is None:
+                    action = self._issue(player, role, config)
+                else:
+                    step["precollected"] = True
+                self.current_action = action
+
+        choice = None
+        if config["can_select"]:
+            action.wait(self.step_timeout)  # 预收集的选择通常早已提交，立即返回
+            if step.get("precollected") and action["status"] == "submitted":
+                # 按当前状态重新校验预收集的选择，被更早的结算作废时重新询问
+                with self._hold() as active:
+                    if active:
+                        config = get_night_action_config(role["id"], role_type, game, player["id"])
+                        reason = self._invalid_reason(action["choice"], config)
+                        if reason:
+                            step["reprompted"] = reason
+                            action = self.current_action = self._issue(player, role, config, reprompt=reason)
+                if step.get("reprompted"):
+                    action.wait(self.step_timeout)
+            step["action_id"] = action.action_id
+            if action["status"] == "submitted":
+                choice = action["choice"]
+            elif action.is_open():
+                action.cancel("timeout")
+            step["action_status"] = action["status"]
+
+        apply = True
+        # 玩家无法选择、引擎也无法生成信息的步骤只能由说书人处理，总是等待确认
+        storyteller_step = self.dependencies[index]["kind"] == "storyteller"
+        if storyteller_step or "all" in self.confirm or action_type in self.confirm or role["id"] in self.confirm:
+            confirmation = self._await_confirmation(step, choice)
+            if confirmation is None:
+                step["status"] = "stopped"
+                return step
+            if confirmation["choice"] is not None:
+                choice = confirmation["choice"]
+            apply = confirmation["apply"]
+
+        step["choice"] = choice
+        with self._hold() as active:
+            if not active:
+                step["status"] = "stopped"
+                return step
+            if apply:
+                step["result"] = self._apply(player, role, action_type, choice)
+                step["status"] = "applied"
+            else:
+                step["status"] = "manual"
+            if action is not None and action["status"] == "submitted":
+                action.confirm()
+                if player["id"] in getattr(game, 'player_night_choices', {}):
+                    game.player_night_choices[player["id"]]["confirmed"] = True
+            self.current_action = None
+        return step
+
+    def _issue(self, player, role, config, expires=True, reprompt=None):
+        """下发待处理行动（与说书人手动通知生成的结构一致）；reprompt 为重新询问的原因
+
+        调用方持有对局锁；已中止时不再登记到对局，直接返回已取消的行动
+        """
+        game = self.game
+        action = PendingAction({
+            "player_id": player["id"],
+            "player_name": player["name"],
+            "role_id": role["id"],
+            "role_name": role["name"],
+            "action_type": "night_action",
+            "phase": game.current_phase,
+            "config": config,
+            "targets": config["targets"],
+            "max_targets": config["max_targets"],
+            "can_skip": True,
+            "description": config["description"],
+            "created_at": datetime.now().isoformat(),
+            "status": "pending",
+            "choice": None,
+            "sequenced": True,
+            "reprompt_reason": reprompt,
+        }, timeout=self.step_timeout if expires else None)
+        if self._stopped.is_set():
+            action.cancel("stopped")
+            return action
+        if not hasattr(game, 'pending_actions'):
+            game.pending_actions = {}
+        previous = game.pending_actions.get(player["id"])
+        if previous is not None:
+            previous.cancel("superseded")
+        game.pending_actions[player["id"]] = action
+        if player["id"] in getattr(game, 'player_night_choices', {}):
+            del game.player_night_choices[player["id"]]
+        event_bus.publish(game.game_id, [player["id"]], {"type": "night_action", "player_id": player["id"], "action": action})
+        return action
+
+    def _await_confirmation(self, step, choice):
+        # 持锁清除并检查中止标记：stop() 在此之后置位也会重新唤醒等待，且不会被本处覆盖状态
+        with self._hold() as active:
+            if not active:
+                return None
+            self._confirmation = None
+            self._confirmed.clear()
+            self.status = "awaiting_confirmation"
+            event_bus.publish(self.game.game_id, [None], {
+                "type": "night_confirm",
+                "step": dict(step, choice=choice),
+            })
+        self._confirmed.wait()
+        with self._hold() as active:
+            if not active:
+                return None
+            self.status = "running"
+            return self._confirmation
+
+    def _apply(self, player, role, action_type, choice):
+        """按 record_night_action 的语义结算一步，返回信息类角色生成的信息"""
+        game = self.game
+        choice = choice or {}
+        targets = list(choice.get("targets") or [])
+        extra = dict(choice.get("extra_data") or {})
+
+        if role["id"] in INFO_ROLES:
+            info = game.generate_info(player["id"], role["id"], targets=targets)
+            message = info.get("message", "") if info else ""
+            if message:
+                game.send_message(
+                    player["id"],
+                    message,
+                    title=f"🌙 {role['name']}的夜间信息",
+                    message_type="night_result",
+                    extra={"result_type": "info", "result_data": message}
+                )
+            game.record_night_action(player["id"], role["name"], targets[0] if targets else None,
+                                     message or None, action_type="info")
+            return info
+
+        if action_type == "po_kill" and not choice.get("skipped"):
+            # 珀不选择目标即为"不击杀"，交给 record_night_action 处理
+            if len(targets) > 1:
+                extra.setdefault("targets", targets)
+            game.record_night_action(player["id"], ACTION_LABELS[action_type], targets[0] if targets else None,
+                                     action_type=action_type, extra_data=extra or None)
+            return None
+
+        if choice.get("skipped") or not targets:
+            if action_type != "other":
+                game.record_night_action(player["id"], "跳过", None, action_type="skip")
+            return None
+
+        if action_type == "shabaloth_kill" and len(targets) > 1:
+            extra.setdefault("second_target", targets[1])
+        game.record_night_action(player["id"], ACTION_LABELS.get(action_type, "选择"), targets[0],
+                                 action_type=action_type, extra_data=extra or None)
+        return None
+
+    # ==================== 推送与状态 ====================
+
+    def _publish_turn(self, item):
+        game = self.game
+        # 玩家端只收到轮次序号（谁被唤醒由各自的 game_state 判断），说书人端收到完整信息
+        event_bus.publish(game.game_id, None, {
+            "type": "night_turn",
+            "night_number": self.night_number,
+            "index": self.index,
+            "total": len(self.order),
+            "finished": item is None,
+        })
+        if item is not None:
+            event_bus.publish(game.game_id, [None], {
+                "type": "night_step",
+                "index": self.index,
+                "player_id": item["player"]["id"],
+                "player_name": item["player"]["name"],
+                "role_id": item["role"]["id"],
+                "role_name": item["role"]["name"],
+            })
+
+    def to_dict(self):
+        current = self.order[self.index] if self.index < len(self.order) else None
+        return {
+            "status": self.status,
+            "night_number": self.night_number,
+            "index": self.index,
+            "total": len(self.order),
+            "confirm": sorted(self.confirm),
+            "step_timeout": self.step_timeout,
+            "parallel": self.parallel,
+            "collecting": [{
+                "index": index,
+                "player_id": action["player_id"],
+                "status": action["status"],
+            } for index, action in sorted(self._collected.items())],
+            "current": {
+                "player_id": current["player"]["id"],
+                "player_name": current["player"]["name"],
+                "role_id": current["role"]["id"],
+                "role_name": current["role"]["name"],
+                "action_id": self.current_action.action_id if self.current_action is not None else None,
+            } if current else None,
+            "steps": self.steps,
+        }
+
+
+def start_night_sequencer(game, confirm=DEFAULT_CONFIRM, step_timeout=DEFAULT_STEP_TIMEOUT, parallel=True):
+    """为当前夜晚启动流程器（同一对局已有运行中的流程器时返回 None）"""
+    existing = _sequencers.get(game)
+    if existing is not None and existing.is_running():
+        return None
+    sequencer = NightSequencer(game, confirm=confirm, step_timeout=step_timeout, parallel=parallel)
+    _sequencers[game] = sequencer
+    sequencer.start()
+    return sequencer
+
+
+def get_night_sequencer(game):
+    return _sequencers.get(game)
+
+
+def stop_night_sequencer(game, timeout=STOP_JOIN_TIMEOUT):
+    """中止对局的流程器并限时等待线程退出（没有运行中的流程器时不做任何事）
+
+    返回后流程线程不会再修改对局，调用方可以直接进入白天或删除对局
+    """
+    sequencer = _sequencers.get(game)
+    if sequencer is not None and sequencer.is_running():
+        sequencer.stop()
+        sequencer.join(timeout)
+    return sequencer
@@ -0,0 +1,373 @@
+"""
+血染钟楼 - 蒙特卡洛对局模拟器
+更新日期: 2026-10-19
+
+通过 Game 引擎无界面地完整跑完整局游戏（夜间行动、信息生成、提名、投票、处决），
+并按剧本 / 人数 / 角色组合汇总胜率。用于活动前检查配置是否平衡，
+同时也是引擎热路径的吞吐量压力测试。
+
+命令行用法：
+    python -m clocktower.simulator --scripts trouble_brewing --players 7 10 15 --games 1000 --workers 4
+
+每个任务块（chunk）拥有独立的随机数生成器，块种子由总种子派生，
+因此结果与进程调度顺序无关，相同参数可完全复现。
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .game import Game
+from .game_data import SCRIPTS
+from .night import get_action_type
+
+
+DEFAULT_SCRIPTS = ["trouble_brewing", "bad_moon_rising", "sects_and_violets"]
+POLICIES = ["random", "heuristic"]
+
+# 需要选择目标的信息类角色及目标数量
+INFO_TARGET_COUNTS = {
+    "fortune_teller": 2,
+    "chambermaid": 2,
+    "seamstress": 2,
+    "dreamer": 1,
+    "ravenkeeper": 1,
+}
+
+# 无需目标、说书人直接给出信息的角色
+INFO_ROLES = {
+    "washerwoman", "librarian", "investigator", "chef", "empath", "clockmaker",
+    "undertaker", "oracle", "flowergirl", "town_crier",
+}
+
+
+def _is_evil(player):
+    return player.get("role_type") in ("demon", "minion")
+
+
+def _alive_others(game, player):
+    return [p for p in game.players if p["alive"] and p["id"] != player["id"]]
+
+
+class GamePlayer:
+    """模拟中的玩家与说书人决策（random：完全随机；heuristic：邪恶阵营协同、善良阵营带少量信息优势）"""
+
+    def __init__(self, game, rng, policy="random"):
+        self.game = game
+        self.rng = rng
+        self.policy = policy
+
+    # ==================== 夜间 ====================
+
+    def pick_target(self, player, prefer_good=False):
+        candidates = _alive_others(self.game, player)
+        if prefer_good and self.policy == "heuristic":
+            good = [p for p in candidates if not _is_evil(p)]
+            candidates = good or candidates
+        return self.rng.choice(candidates)["id"] if candidates else None
+
+    def play_night(self):
+        game = self.game
+        rng = self.rng
+        game.start_night()
+        for item in game.get_night_order():
+            player = item["player"]
+            if not player["alive"]:
+                continue
+            role_id = item["role"]["id"]
+            action_type = get_action_type(role_id, game._get_role_type(item["role"]))
+
+            if action_type == "kill":
+                target = self.pick_target(player, prefer_good=True)
+                # 小恶魔偶尔自杀传刀
+                if role_id == "imp" and game.night_number > 1 and rng.random() < 0.05:
+                    target = player["id"]
+                game.record_night_action(player["id"], "击杀", target, action_type="kill")
+            elif action_type in ("zombuul_kill", "pukka_poison"):
+                target = self.pick_target(player, prefer_good=True)
+                game.record_night_action(player["id"], "击杀", target, action_type=action_type)
+            elif action_type == "shabaloth_kill":
+                extra = {"second_target": self.pick_target(player, prefer_good=True)}
+                game.record_night_action(player["id"], "击杀", self.pick_target(player, prefer_good=True),
+                                         action_type=action_type, extra_data=extra)
+            elif action_type == "po_kill":
+                if not getattr(game, 'po_skipped_last_night', False) and rng.random() < 0.3:
+                    game.record_night_action(player["id"], "不击杀", None, action_type=action_type)
+                else:
+                    targets = [self.pick_target(player, prefer_good=True) for _ in range(3)]
+                    game.record_night_action(player["id"], "击杀", targets[0], action_type=action_type,
+                                             extra_data={"targets": targets})
+            elif action_type in ("protect", "grandchild_select", "butler_master", "devils_advocate"):
+                game.record_night_action(player["id"], "选择", self.pick_target(player), action_type=action_type)
+            elif action_type in ("poison", "drunk", "sailor_drunk"):
+                extra = {"drunk_choice": rng.choice(["target", "self"])} if action_type == "sailor_drunk" else None
+                game.record_night_action(player["id"], "选择", self.pick_target(player, prefer_good=True),
+                                         action_type=action_type, extra_data=extra)
+            elif action_type == "exorcist":
+                candidates = [t["id"] for t in game.target_list("exorcist", player["id"])]
+                if candidates:
+                    game.record_night_action(player["id"], "驱魔", rng.choice(candidates), action_type=action_type)
+            elif role_id in INFO_TARGET_COUNTS:
+                others = [p["id"] for p in game.players if p["id"] != player["id"]]
+                targets = rng.sample(others, min(INFO_TARGET_COUNTS[role_id], len(others)))
+                game.generate_info(player["id"], role_id, targets=targets)
+            elif role_id in INFO_ROLES:
+                game.generate_info(player["id"], role_id)
+
+        # 守鸦人被唤醒时选择查验目标
+        trigger = game.check_ravenkeeper_trigger()
+        if trigger.get("triggered"):
+            others = [p["id"] for p in game.players if p["id"] != trigger["player_id"]]
+            if others:
+                game.generate_info(trigger["player_id"], "ravenkeeper", targets=[rng.choice(others)])
+
+    # ==================== 白天 ====================
+
+    def vote_probability(self, voter, nominee):
+        if self.policy != "heuristic":
+            return 0.5
+        if _is_evil(voter):
+            return 0.1 if _is_evil(nominee) else 0.8
+        # 善良玩家根据白天讨论对邪恶玩家略有察觉
+        return 0.7 if _is_evil(nominee) else 0.4
+
+    def choose_nominee(self, nominator, candidates):
+        if self.policy == "heuristic":
+            if _is_evil(nominator):
+                good = [p for p in candidates if not _is_evil(p)]
+                candidates = good or candidates
+            elif self.rng.random() < 0.35:
+                evil = [p for p in candidates if _is_evil(p)]
+                candidates = evil or candidates
+        return self.rng.choice(candidates)
+
+    def play_day(self):
+        """进行一个白天；返回游戏结束结果（未结束则返回 None）"""
+        game = self.game
+        rng = self.rng
+        game.start_day()
+        end = game.check_game_end()
+        if end.get("ended"):
+            return end
+
+        alive = [p for p in game.players if p["alive"]]
+        nominators = [p for p in alive if rng.random() < 0.5]
+        rng.shuffle(nominators)
+        nominated = set()
+        virgin_triggered = False
+
+        for nominator in nominators[:3]:
+            if not nominator["alive"]:
+                continue
+            candidates = [p for p in game.players if p["alive"] and p["id"] not in nominated]
+            if not candidates:
+                break
+            nominee = self.choose_nominee(nominator, candidates)
+            result = game.nominate(nominator["id"], nominee["id"])
+            if not result.get("success"):
+                continue
+            nominated.add(nominee["id"])
+            if result.get("virgin_triggered"):
+                # 贞洁者触发：提名者被立即处决，白天结束
+                virgin_triggered = True
+                break
+
+            nomination = result["nomination"]
+            for voter in game.players:
+                if not voter["alive"] and not voter["vote_token"]:
+                    continue
+                game.vote(nomination["id"], voter["id"], rng.random() < self.vote_probability(voter, nominee))
+
+        leader = game.nomination_leader()
+        if leader and not leader["tied"] and not virgin_triggered:
+            result = game.execute(leader["nomination_id"])
+            if result.get("pacifist_intervention") and rng.random() < 0.5:
+                nominee = next(p for p in game.players if p["id"] == result["nominee_id"])
+                game.resolve_death(nominee, "处决", "storyteller")
+            if result.get("game_end", {}).get("ended"):
+                return result["game_end"]
+
+        end = game.check_game_end()
+        return end if end.get("ended") else None
+
+
+def simulate_game(script_id, player_count, seed, policy="random", max_days=20, board=None):
+    """完整模拟一局游戏，返回结果摘要（board 为固定的角色ID配置，不指定时随机抽取）"""
+    rng = random.Random(seed)
+    game = Game(f"sim_{seed}", script_id, player_count, seed=rng.randrange(2 ** 32))
+    game.assign_roles_randomly([f"玩家{i + 1}" for i in range(player_count)], board=board)
+
+    roles = []
+    for p in game.players:
+        true_role = p.get("true_role") or p.get("role")
+        if not true_role:
+            # 剧本角色数量不足以满足该人数的配置
+            return {"script_id": script_id, "player_count": player_count, "winner": None,
+                    "reason": "invalid_setup", "days": 0, "roles": []}
+        roles.append(true_role["id"])
+
+    sim = GamePlayer(game, rng, policy)
+    end = None
+    while game.day_number < max_days and not end:
+        sim.play_night()
+        end = sim.play_day()
+
+    return {
+        "script_id": script_id,
+        "player_count": player_count,
+        "winner": end["winner"] if end else None,
+        "reason": end["reason"] if end else "timeout",
+        "days": game.day_number,
+        "roles": sorted(roles),
+    }
+
+
+def _run_chunk(task):
+    """在工作进程中运行一个任务块；块内所有对局由块种子派生"""
+    script_id, player_count, chunk_seed, count, policy, max_days = task
+    rng = random.Random(chunk_seed)
+    return [simulate_game(script_id, player_count, rng.randrange(2 ** 32), policy, max_days)
+            for _ in range(count)]
+
+
+def _new_bucket():
+    return {"games": 0, "good_wins": 0, "evil_wins": 0, "timeouts": 0, "total_days": 0}
+
+
+def _add(bucket, result):
+    bucket["games"] += 1
+    bucket["total_days"] += result["days"]
+    if result["winner"] == "good":
+        bucket["good_wins"] += 1
+    elif result["winner"] == "evil":
+        bucket["evil_wins"] += 1
+    else:
+        bucket["timeouts"] += 1
+
+
+def _finish(bucket):
+    games = bucket["games"]
+    return {
+        "games": games,
+        "good_wins": bucket["good_wins"],
+        "evil_wins": bucket["evil_wins"],
+        "timeouts": bucket["timeouts"],
+        "good_win_rate": round(bucket["good_wins"] / games, 4) if games else 0.0,
+        "avg_days": round(bucket["total_days"] / games, 2) if games else 0.0,
+    }
+
+
+def aggregate_results(results, min_composition_games=1):
+    """按 剧本/人数、角色、完整角色组合 汇总胜率"""
+    by_config = {}
+    by_role = {}
+    by_composition = {}
+    invalid = 0
+
+    for result in results:
+        if result["reason"] == "invalid_setup":
+            invalid += 1
+            continue
+        config_key = f"{result['script_id']}/{result['player_count']}"
+        _add(by_config.setdefault(config_key, _new_bucket()), result)
+        for role_id in set(result["roles"]):
+            _add(by_role.setdefault(f"{config_key}/{role_id}", _new_bucket()), result)
+        _add(by_composition.setdefault(f"{config_key}/{','.join(result['roles'])}", _new_bucket()), result)
+
+    return {
+        "invalid_setups": invalid,
+        "by_config": {k: _finish(v) for k, v in sorted(by_config.items())},
+        "by_role": {k: _finish(v) for k, v in sorted(by_role.items())},
+        "by_composition": {k: _finish(v) for k, v in sorted(by_composition.items())
+                           if v["games"] >= min_composition_games},
+    }
+
+
+def run_simulations(script_ids=None, player_counts=(7, 10, 15), games_per_config=100,
+                    workers=None, seed=0, policy="random", chunk_size=50, max_days=20,
+                    min_composition_games=1, executor=None):
+    """批量模拟并汇总；workers=1 时在当前进程内运行，传入 executor 时使用调用方的进程池（不会关闭）"""
+    script_ids = script_ids or DEFAULT_SCRIPTS
+    for script_id in script_ids:
+        if script_id not in SCRIPTS:
+            raise ValueError(f"无效的剧本: {script_id}")
+    if policy not in POLICIES:
+        raise ValueError(f"无效的策略: {policy}")
+
+    master = random.Random(seed)
+    tasks = []
+    for script_id in script_ids:
+        for player_count in player_counts:
+            remaining = games_per_config
+            while remaining > 0:
+                count = min(chunk_size, remaining)
+                tasks.append((script_id, player_count, master.randrange(2 ** 32), count, policy, max_days))
+                remaining -= count
+
+    started = time.perf_counter()
+    results = []
+    workers = workers or os.cpu_count() or 1
+    if executor is not None:
+        for chunk in executor.map(_run_chunk, tasks):
+            results.extend(chunk)
+    elif workers == 1:
+        for task in tasks:
+            results.extend(_run_chunk(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(_run_chunk, tasks):
+                results.extend(chunk)
+    elapsed = time.perf_counter() - started
+
+    summary = aggregate_results(results, min_composition_games)
+    summary["meta"] = {
+        "seed": seed,
+        "policy": policy,
+        "workers": workers,
+        "games": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "games_per_minute": round(len(results) / elapsed * 60, 1) if elapsed else None,
+    }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="血染钟楼蒙特卡洛对局模拟器")
+    parser.add_argument("--scripts", nargs="+", default=DEFAULT_SCRIPTS, help="剧本ID列表")
+    parser.add_argument("--players", nargs="+", type=int, default=[7, 10, 15], help="玩家人数列表")
+    parser.add_argument("--games", type=int, default=100, help="每个 剧本/人数 组合模拟的局数")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument("--seed", type=int, default=0, help="总随机种子")
+    parser.add_argument("--policy", choices=POLICIES, default="random", help="玩家决策策略")
+    parser.add_argument("--chunk-size", type=int, default=50, help="每个任务块的局数")
+    parser.add_argument("--max-days", type=int, default=20, help="单局最多天数")
+    parser.add_argument("--min-composition-games", type=int, default=1, help="角色组合至少出现的局数才输出")
+    parser.add_argument("--output", help="输出 JSON 文件路径（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    summary = run_simulations(
+        script_ids=args.scripts,
+        player_counts=args.players,
+        games_per_config=args.games,
+        workers=args.workers,
+        seed=args.seed,
+        policy=args.policy,
+        chunk_size=args.chunk_size,
+        max_days=args.max_days,
+        min_composition_games=args.min_composition_games,
+    )
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
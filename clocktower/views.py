@@ -0,0 +1,120 @@
+"""
+血染钟楼 - 玩家视角视图
+更新日期: 2026-10-19
+
+根据游戏状态构建玩家端看到的内容（只包含该玩家可见的信息）。
+"""
+
+from .instrumentation import timed
+from .night import get_night_action_config
+
+# 玩家端可见的公开日志类型
+PUBLIC_LOG_TYPES = frozenset(["phase", "death", "execution", "game_end", "game_event", "vote"])
+
+
+@timed("build_player_view")
+def build_player_view(game, player, locale=None):
+    """构建玩家视角的游戏状态（玩家端轮询 /api/player/game_state 的返回内容）"""
+    player_id = player["id"]
+    
+    # 公开的玩家信息
+    players_public = [{
+        "id": p["id"],
+        "name": p["name"],
+        "alive": p.get("alive", True) and not p.get("appears_dead", False),
+        "connected": p.get("connected", False)
+    } for p in game.players]
+    
+    # 公开日志（按语言渲染并缓存，只渲染新增条目）
+    public_log = game.game_log.render(game.players, locale, PUBLIC_LOG_TYPES)
+    
+    # 当前活跃的提名：白天最近一个尚未结算（等待投票或投票中）的提名
+    active_nomination = None
+    for nom in reversed(game.nominations if game.current_phase == "day" else []):
+        if nom.get("status") in ("pending", "voting"):
+            active_nomination = {
+                "id": nom["id"],
+                "nominator_id": nom.get("nominator_id"),
+                "nominator_name": nom["nominator_name"],
+                "nominee_id": nom.get("nominee_id"),
+                "nominee_name": nom["nominee_name"],
+                "vote_count": nom.get("vote_count", 0),
+                "voters": nom.get("voters", []),
+                "votes_detail": nom.get("votes_detail", {}),  # 每个玩家的投票详情
+                # 更新日期: 2026-10-19 - 实时票数（含版本号与顺时针下一位投票者）
+                "tally": game.get_vote_ledger(nom).summary(game.required_votes())
+            }
+            break
+    
+    # 获取玩家的未读消息（来自说书人的信息；没有未读时不遍历信箱）
+    mailbox = game.get_mailbox(player_id)
+    unread_messages = mailbox.unread()
+    
+    # 检查夜间行动
+    my_turn = False
+    night_action = None
+    waiting_for_action = False
+    
+    if game.current_phase == "night":
+        # 夜间流程器运行时使用其固定的本夜顺序，避免夜里有人死亡后序号错位
+        night_order = getattr(game, 'current_night_order', None) or game.get_night_order()
+        current_index = getattr(game, 'current_night_index', 0)
+        
+        # 检查是否在夜间行动序列中
+        for i, action in enumerate(night_order):
+            if action["player"]["id"] == player_id:
+                if i == current_index:
+                    my_turn = True
+                elif i > current_index:
+                    waiting_for_action = True
+                break
+        
+        if my_turn:
+            role_id = player.get("role", {}).get("id", "")
+            role_type = player.get("role_type", "")
+            
+            # 确定行动类型和可选目标
+            action_config = get_night_action_config(role_id, role_type, game, player_id)
+            night_action = action_config
+    
+    # 检查玩家是否已提交夜间选择
+    player_choice = None
+    if hasattr(game, 'player_night_choices') and player_id in game.player_night_choices:
+        player_choice = game.player_night_choices[player_id]
+    
+    # 检查游戏结束
+    game_end = game.check_game_end() if hasattr(game, 'check_game_end') else None
+    
+    return {
+        "players": players_public,
+        "current_phase": game.current_phase,
+        "day_number": game.day_number,
+        "night_number": game.night_number,
+        "nominations": [{
+            "id": n["id"],
+            "nominator_name": n["nominator_name"],
+            "nominee_name": n["nominee_name"],
+            "nominee_id": n.get("nominee_id"),
+            "status": n.get("status", "pending"),
+            "vote_count": n.get("vote_count", 0),
+            "voters": n.get("voters", [])
+        } for n in game.nominations],
+        "active_nomination": active_nomination,
+        "nomination_leader": game.nomination_leader(),  # 更新日期: 2026-10-19 - 当前领先提名（是否将被处决）
+        "my_status": {
+            "alive": player.get("alive", True),
+            "vote_token": player.get("vote_token", True),
+            "role": player.get("role"),
+            "role_type": player.get("role_type"),
+            "drunk": player.get("drunk", False),
+            "poisoned": player.get("poisoned", False)
+        },
+        "my_turn": my_turn,
+        "waiting_for_action": waiting_for_action,
+        "night_action": night_action,
+        "player_choice": player_choice,
+        "messages": unread_messages,
+        "last_message_seq": mailbox.last_seq,
+        "public_log": public_log[-30:],  # 最近30条
+        "game_end": game_end
+    }
@@ -0,0 +1,181 @@
+"""
+血染钟楼 - 投票账本
+更新日期: 2026-10-19
+
+每次提名对应一个 VoteLedger：按座位（game.players 的下标，即顺时针顺序）用位集记录
+已投票/赞成，重复投票与管家主人检查均为 O(1)；维护实时票数和顺时针投票游标
+（从被提名者的下一位开始，最后轮到被提名者本人）。
+
+说书人端 Game.vote 与玩家端 /api/player/vote 都通过这里记票，并同步维护提名字典上
+原有的公开字段：votes（列表）、voters、votes_detail、vote_count。
+
+DayNominations 是当天全部提名的索引（按ID、提名者、被提名者），并随投票实时维护
+当前票数最高的提名与是否平票，"谁将被处决"无需再遍历提名列表计算。
+"""
+
+from datetime import datetime
+
+
+class VoteLedger:
+    """单次提名的投票账本"""
+
+    def __init__(self, nomination, players, on_yes=None):
+        self.nomination = nomination
+        self.on_yes = on_yes  # 每记录一张赞成票后回调 on_yes(nomination)
+        self.players = players
+        self.seat_of = {p["id"]: seat for seat, p in enumerate(players)}
+        self.voted = 0      # 已投票座位位集
+        self.yes = 0        # 投赞成票座位位集
+        self.tally = 0      # 赞成票数
+        self.version = 0    # 每记录一票加一，客户端据此判断是否需要刷新
+        nominee_seat = self.seat_of.get(nomination["nominee_id"], len(players) - 1)
+        # 顺时针投票顺序：被提名者的下一位 ... 被提名者
+        self._order = [(nominee_seat + 1 + i) % len(players) for i in range(len(players))]
+        self._cursor = 0
+        nomination.setdefault("votes", [])
+        nomination.setdefault("voters", [])
+        nomination.setdefault("votes_detail", {})
+        nomination["vote_count"] = 0
+
+    def has_voted(self, player_id):
+        seat = self.seat_of.get(player_id)
+        return seat is not None and bool(self.voted >> seat & 1)
+
+    def voted_yes(self, player_id):
+        seat = self.seat_of.get(player_id)
+        return seat is not None and bool(self.yes >> seat & 1)
+
+    def check(self, voter, vote_value, master_votes_yes=None):
+        """检查投票是否有效，返回错误信息或 None
+
+        master_votes_yes 不为 None 时表示管家的主人在同一批投票中是否赞成（批量记票预先
+        算好），此时主人尚未记入账本也视为已赞成。
+        """
+        if self.has_voted(voter["id"]):
+            return "该玩家已经投过票"
+        # 死亡玩家只有一次投票机会（弃票令牌）
+        if not voter["alive"] and not voter.get("vote_token", False):
+            return "该死亡玩家已经使用过投票令牌"
+        # 管家投票限制：只有当主人投了赞成票时才能投赞成票
+        master_id = voter.get("butler_master_id")
+        if master_id and vote_value and not (master_votes_yes or self.voted_yes(master_id)):
+            master_name = voter.get("butler_master_name", "主人")
+            return f"管家只能在主人（{master_name}）投赞成票后才能投赞成票"
+        return None
+
+    def record(self, voter, vote_value):
+        """记录一票（调用前应已通过 check），返回当前票数"""
+        seat = self.seat_of[voter["id"]]
+        bit = 1 << seat
+        self.voted |= bit
+        if vote_value:
+            self.yes |= bit
+            self.tally += 1
+            # 死亡玩家投赞成票后消耗令牌
+            if not voter["alive"]:
+                voter["vote_token"] = False
+        self.version += 1
+
+        nomination = self.nomination
+        nomination["votes"].append({
+            "voter_id": voter["id"],
+            "voter_name": voter["name"],
+            "vote": vote_value,  # True = 赞成, False = 反对
+            "voter_alive": voter["alive"]
+        })
+        nomination["voters"].append(voter["id"])
+        nomination["votes_detail"][voter["id"]] = {
+            "player_name": voter["name"],
+            "vote": vote_value,
+            "is_alive": voter["alive"],
+            "time": datetime.now().isoformat()
+        }
+        nomination["vote_count"] = self.tally
+        if vote_value and self.on_yes:
+            self.on_yes(nomination)
+        return self.tally
+
+    def clockwise_seats(self):
+        """本次提名的顺时针投票顺序（座位下标列表）"""
+        return list(self._order)
+
+    def next_voter(self):
+        """顺时针下一位尚未投票且仍可投票的玩家（没有则返回 None）"""
+        while self._cursor < len(self._order):
+            player = self.players[self._order[self._cursor]]
+            if not (self.voted >> self._order[self._cursor] & 1) and (player["alive"] or player.get("vote_token", False)):
+                return player
+            self._cursor += 1
+        return None
+
+    def summary(self, required_votes=None):
+        """实时票数（可直接推送给客户端）"""
+        next_player = self.next_voter()
+        voted = bin(self.voted).count("1")
+        return {
+            "nomination_id": self.nomination["id"],
+            "version": self.version,
+            "yes": self.tally,
+            "no": voted - self.tally,
+            "voted": voted,
+            "required_votes": required_votes,
+            "next_voter_id": next_player["id"] if next_player else None,
+        }
+
+
+class DayNominations:
+    """当天的提名索引与领先提名追踪"""
+
+    def __init__(self, day, nominations):
+        self.day = day
+        self.nominations = nominations  # 与 game.nominations 为同一个列表
+        self.by_id = {}
+        self.by_nominator = {}
+        self.by_nominee = {}
+        self.ledgers = {}
+        self.leader_id = None   # 票数最高的提名ID
+        self.leader_votes = 0
+        self.tied = False       # 是否有其他提名与最高票数持平
+
+    def add(self, nomination, players):
+        self.nominations.append(nomination)
+        self.by_id[nomination["id"]] = nomination
+        self.by_nominator[nomination["nominator_id"]] = nomination
+        self.by_nominee[nomination["nominee_id"]] = nomination
+        return self.ledger(nomination, players)
+
+    def get(self, nomination_id):
+        return self.by_id.get(nomination_id)
+
+    def ledger(self, nomination, players):
+        """获取（必要时创建）提名对应的投票账本"""
+        ledger = self.ledgers.get(nomination["id"])
+        if ledger is None:
+            ledger = self.ledgers[nomination["id"]] = VoteLedger(nomination, players, on_yes=self._on_yes)
+        return ledger
+
+    def _on_yes(self, nomination):
+        # 票数只增不减：领先者得票即独自领先；其他提名追平则平票，超过则成为新的领先者
+        votes = nomination["vote_count"]
+        if nomination["id"] == self.leader_id:
+            self.leader_votes = votes
+            self.tied = False
+        elif votes > self.leader_votes:
+            self.leader_id, self.leader_votes, self.tied = nomination["id"], votes, False
+        elif votes == self.leader_votes:
+            self.tied = True
+
+    def leader(self, required_votes=None):
+        """当前领先的提名；on_the_block 表示票数达到要求且没有平票（即将被处决）"""
+        nomination = self.by_id.get(self.leader_id)
+        if nomination is None:
+            return None
+        return {
+            "nomination_id": nomination["id"],
+            "nominee_id": nomination["nominee_id"],
+            "nominee_name": nomination["nominee_name"],
+            "vote_count": self.leader_votes,
+            "tied": self.tied,
+            "required_votes": required_votes,
+            "on_the_block": not self.tied and required_votes is not None and self.leader_votes >= required_votes,
+        }
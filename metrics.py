@@ -0,0 +1,173 @@
+"""
+血染钟楼 - 请求指标
+更新日期: 2026-10-19
+
+为 Flask 应用（含玩家端蓝图）的每个路由模板记录：延迟直方图、响应字节数、状态码计数、
+当前处理中的请求数；并与引擎计时埋点一起以 Prometheus 文本格式导出到 /api/server/metrics。
+"""
+
+import threading
+import time
+
+from flask import Blueprint, Response, g, request
+from flask.json.provider import DefaultJSONProvider
+
+from clocktower.instrumentation import DURATION_BUCKETS, Histogram, engine_metrics, timed
+from clocktower.roles import encode_json
+
+metrics_bp = Blueprint('metrics', __name__)
+
+PREFIX = "clocktower"
+
+
+class RouteMetrics:
+    """单个 (方法, 路由模板) 的指标"""
+
+    __slots__ = ("latency", "bytes_total", "statuses", "in_flight")
+
+    def __init__(self):
+        self.latency = Histogram(DURATION_BUCKETS)
+        self.bytes_total = 0
+        self.statuses = {}
+        self.in_flight = 0
+
+
+_routes = {}
+_lock = threading.Lock()
+
+
+def _route_key():
+    rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+    return request.method, rule
+
+
+def _metrics_for(key):
+    metrics = _routes.get(key)
+    if metrics is None:
+        with _lock:
+            metrics = _routes.setdefault(key, RouteMetrics())
+    return metrics
+
+
+def _before_request():
+    key = _route_key()
+    metrics = _metrics_for(key)
+    with _lock:
+        metrics.in_flight += 1
+    g._metrics_key = key
+    g._metrics_started = time.perf_counter()
+
+
+def _after_request(response):
+    key = getattr(g, '_metrics_key', None)
+    if key is not None:
+        _finish(key, response.status_code, response.content_length or 0)
+        g._metrics_key = None
+    return response
+
+
+def _teardown_request(exc):
+    # 请求中抛出未处理异常时 after_request 不会执行，这里补记为 500
+    key = getattr(g, '_metrics_key', None)
+    if key is not None:
+        _finish(key, 500, 0)
+
+
+def _finish(key, status, size):
+    metrics = _routes[key]
+    metrics.latency.observe(time.perf_counter() - g._metrics_started)
+    with _lock:
+        metrics.in_flight -= 1
+        metrics.bytes_total += size
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """记录 jsonify 序列化耗时的 JSON 提供者（角色直接拼接预编码的 JSON 片段）"""
+
+    @timed("json.dumps")
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        return encode_json(obj, super().dumps, **kwargs)
+
+
+def init_metrics(app):
+    """在应用上注册请求钩子（对所有蓝图生效）、序列化计时和指标路由"""
+    app.json = TimedJSONProvider(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.register_blueprint(metrics_bp)
+
+
+# ==================== Prometheus 文本格式 ====================
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(name, labels, snapshot):
+    buckets, count, total = snapshot
+    lines = []
+    for bound, cumulative in buckets:
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {total:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {count}")
+    return lines
+
+
+def render_prometheus():
+    """导出全部指标为 Prometheus 文本格式"""
+    with _lock:
+        routes = sorted(_routes.items())
+        rows = [(key, m, dict(m.statuses), m.bytes_total, m.in_flight) for key, m in routes]
+
+    lines = [
+        f"# HELP {PREFIX}_http_requests_total 按路由模板与状态码统计的请求数",
+        f"# TYPE {PREFIX}_http_requests_total counter",
+    ]
+    for (method, route), _, statuses, _, _ in rows:
+        for status, count in sorted(statuses.items()):
+            lines.append(f"{PREFIX}_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += [
+        f"# HELP {PREFIX}_http_response_bytes_total 按路由模板统计的响应字节数",
+        f"# TYPE {PREFIX}_http_response_bytes_total counter",
+    ]
+    for (method, route), _, _, size, _ in rows:
+        lines.append(f"{PREFIX}_http_response_bytes_total{_labels(method=method, route=route)} {size}")
+
+    lines += [
+        f"# HELP {PREFIX}_http_requests_in_flight 正在处理中的请求数",
+        f"# TYPE {PREFIX}_http_requests_in_flight gauge",
+    ]
+    for (method, route), _, _, _, in_flight in rows:
+        lines.append(f"{PREFIX}_http_requests_in_flight{_labels(method=method, route=route)} {in_flight}")
+
+    lines += [
+        f"# HELP {PREFIX}_http_request_duration_seconds 请求处理耗时",
+        f"# TYPE {PREFIX}_http_request_duration_seconds histogram",
+    ]
+    for (method, route), m, _, _, _ in rows:
+        lines += _histogram_lines(f"{PREFIX}_http_request_duration_seconds",
+                                  {"method": method, "route": route}, m.latency.snapshot())
+
+    lines += [
+        f"# HELP {PREFIX}_engine_call_duration_seconds 引擎调用耗时",
+        f"# TYPE {PREFIX}_engine_call_duration_seconds histogram",
+    ]
+    for call, snapshot in engine_metrics().items():
+        lines += _histogram_lines(f"{PREFIX}_engine_call_duration_seconds", {"call": call}, snapshot)
+
+    return "\n".join(lines) + "\n"
+
+
+@metrics_bp.route('/api/server/metrics', methods=['GET'])
+def server_metrics():
+    """Prometheus 格式的服务器指标"""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4; charset=utf-8")
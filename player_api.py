@@ -5,19 +5,27 @@
 此模块包含所有玩家端相关的API端点，实现玩家与说书人的双向通信。
 """
 
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, Response, request, jsonify, render_template
 from datetime import datetime
+from clocktower import build_player_view, Mailbox
+from clocktower.events import bus as event_bus
+from clocktower.actions import PendingAction, DEFAULT_TIMEOUT as DEFAULT_ACTION_TIMEOUT
+from clocktower.roles import encode_json
+from server_stats import game_memory_estimate
 
 # 创建蓝图
 player_bp = Blueprint('player', __name__)
 
 # games 字典将从主应用传入
 games = None
+# 更新日期: 2026-10-19 - 服务器容量统计（在线状态、玩家数），由主应用传入
+stats = None
 
-def init_player_api(games_dict):
-    """初始化玩家API，传入games字典"""
-    global games
+def init_player_api(games_dict, server_stats):
+    """初始化玩家API，传入games字典与服务器统计对象"""
+    global games, stats
     games = games_dict
+    stats = server_stats
 
 
 # ==================== 页面路由 ====================
@@ -34,14 +42,15 @@ def player_page():
 def find_game_by_code(game_code):
     """通过游戏代码查找游戏"""
     game_code = game_code.strip()
-    
     # 尝试直接匹配
     if game_code in games:
         game = games[game_code]
+        # 更新日期: 2026-10-19 - 座位占用按心跳在线状态判断（读取时按玩家ID解析）
+        online = stats.online_ids(game_code)
         players = [{
             "id": p["id"],
             "name": p["name"],
-            "connected": p.get("connected", False)
+            "connected": p["id"] in online
         } for p in game.players]
         
         return jsonify({
@@ -55,10 +64,11 @@ def find_game_by_code(game_code):
     # 尝试部分匹配（游戏ID的后半部分）
     for gid, game in games.items():
         if game_code in gid or gid.endswith(game_code):
+            online = stats.online_ids(gid)
             players = [{
                 "id": p["id"],
                 "name": p["name"],
-                "connected": p.get("connected", False)
+                "connected": p["id"] in online
             } for p in game.players]
             
             return jsonify({
@@ -88,16 +98,12 @@ def player_join_game():
     if not player:
         return jsonify({"error": "无效的玩家"}), 400
     
-    if player.get("connected"):
+    # 更新日期: 2026-10-19 - 按心跳是否过期判断座位占用（connected 标记会在过期后清除）
+    if stats.is_online(game_id, player_id):
         return jsonify({"error": "该座位已被占用"}), 400
     
     # 标记玩家已连接
-    player["connected"] = True
-    player["last_seen"] = datetime.now().isoformat()
-    
-    # 初始化玩家消息队列
-    if "messages" not in player:
-        player["messages"] = []
+    _mark_seen(game_id, player)
     
     return jsonify({
         "success": True,
@@ -125,8 +131,7 @@ def player_reconnect():
         return jsonify({"error": "无效的玩家", "success": False}), 400
     
     # 重新标记连接
-    player["connected"] = True
-    player["last_seen"] = datetime.now().isoformat()
+    _mark_seen(game_id, player)
     
     # 返回完整游戏状态
     players_public = [{
@@ -149,6 +154,12 @@ def player_reconnect():
     })
 
 
+def _mark_seen(game_id, player):
+    """记录玩家的心跳/轮询（在线状态由 ServerStats 按心跳过期维护）"""
+    player["last_seen"] = datetime.now().isoformat()
+    stats.touch(game_id, player)
+
+
 # ==================== 游戏状态 API ====================
 
 @player_bp.route('/api/player/game_state/<game_id>/<int:player_id>', methods=['GET'])
@@ -164,192 +175,51 @@ def get_player_game_state(game_id, player_id):
         return jsonify({"error": "无效的玩家"}), 400
     
     # 更新最后在线时间
-    player["last_seen"] = datetime.now().isoformat()
-    
-    # 公开的玩家信息
-    players_public = [{
-        "id": p["id"],
-        "name": p["name"],
-        "alive": p.get("alive", True) and not p.get("appears_dead", False),
-        "connected": p.get("connected", False)
-    } for p in game.players]
+    _mark_seen(game_id, player)
     
-    # 公开日志
-    public_log = [
-        log for log in game.game_log 
-        if log["type"] in ["phase", "death", "execution", "game_end", "game_event", "vote"]
-    ]
-    
-    # 当前活跃的提名
-    active_nomination = None
-    for nom in game.nominations:
-        if nom.get("status") == "voting":
-            active_nomination = {
-                "id": nom["id"],
-                "nominator_id": nom.get("nominator_id"),
-                "nominator_name": nom["nominator_name"],
-                "nominee_id": nom.get("nominee_id"),
-                "nominee_name": nom["nominee_name"],
-                "vote_count": nom.get("vote_count", 0),
-                "voters": nom.get("voters", []),
-                "votes_detail": nom.get("votes_detail", {})  # 每个玩家的投票详情
-            }
-            break
-    
-    # 获取玩家的未读消息（来自说书人的信息）
-    messages = player.get("messages", [])
-    unread_messages = [m for m in messages if not m.get("read")]
-    
-    # 检查夜间行动
-    my_turn = False
-    night_action = None
-    waiting_for_action = False
-    
-    if game.current_phase == "night":
-        night_order = game.get_night_order()
-        current_index = getattr(game, 'current_night_index', 0)
-        
-        # 检查是否在夜间行动序列中
-        for i, action in enumerate(night_order):
-            if action["player"]["id"] == player_id:
-                if i == current_index:
-                    my_turn = True
-                elif i > current_index:
-                    waiting_for_action = True
-                break
-        
-        if my_turn:
-            role_id = player.get("role", {}).get("id", "")
-            role_type = player.get("role_type", "")
-            
-            # 确定行动类型和可选目标
-            action_config = get_night_action_config(role_id, role_type, game, player_id)
-            night_action = action_config
-    
-    # 检查玩家是否已提交夜间选择
-    player_choice = None
-    if hasattr(game, 'player_night_choices') and player_id in game.player_night_choices:
-        player_choice = game.player_night_choices[player_id]
-    
-    # 检查游戏结束
-    game_end = game.check_game_end() if hasattr(game, 'check_game_end') else None
-    
-    return jsonify({
-        "players": players_public,
-        "current_phase": game.current_phase,
-        "day_number": game.day_number,
-        "night_number": game.night_number,
-        "nominations": [{
-            "id": n["id"],
-            "nominator_name": n["nominator_name"],
-            "nominee_name": n["nominee_name"],
-            "nominee_id": n.get("nominee_id"),
-            "status": n.get("status", "pending"),
-            "vote_count": n.get("vote_count", 0),
-            "voters": n.get("voters", [])
-        } for n in game.nominations],
-        "active_nomination": active_nomination,
-        "my_status": {
-            "alive": player.get("alive", True),
-            "vote_token": player.get("vote_token", True),
-            "role": player.get("role"),
-            "role_type": player.get("role_type"),
-            "drunk": player.get("drunk", False),
-            "poisoned": player.get("poisoned", False)
-        },
-        "my_turn": my_turn,
-        "waiting_for_action": waiting_for_action,
-        "night_action": night_action,
-        "player_choice": player_choice,
-        "messages": unread_messages,
-        "public_log": public_log[-30:],  # 最近30条
-        "game_end": game_end
-    })
+    return jsonify(build_player_view(game, player, request.args.get('locale')))
 
 
-def get_night_action_config(role_id, role_type, game, player_id):
-    """获取夜间行动配置"""
-    alive_players = [p for p in game.players if p.get("alive", True) and p["id"] != player_id]
-    all_players = [p for p in game.players if p["id"] != player_id]
+# 更新日期: 2026-10-19 - 推送通道（Server-Sent Events），事件格式与 handleWebSocketMessage 一致
+@player_bp.route('/api/player/events/<game_id>/<int:player_id>', methods=['GET'])
+def player_events(game_id, player_id):
+    """玩家端事件流"""
+    if game_id not in games:
+        return jsonify({"error": "游戏不存在"}), 404
     
-    # 基础配置
-    config = {
-        "type": "other",
-        "role_id": role_id,
-        "can_select": False,
-        "targets": [],
-        "max_targets": 1,
-        "description": ""
-    }
+    game = games[game_id]
+    if not any(p["id"] == player_id for p in game.players):
+        return jsonify({"error": "无效的玩家"}), 400
     
-    # 根据角色类型配置
-    if role_type == "demon":
-        config["type"] = "kill"
-        config["can_select"] = True
-        config["targets"] = [{"id": p["id"], "name": p["name"]} for p in alive_players]
-        config["description"] = "选择一名玩家击杀"
-    
-    elif role_id == "monk":
-        config["type"] = "protect"
-        config["can_select"] = True
-        config["targets"] = [{"id": p["id"], "name": p["name"]} for p in alive_players]
-        config["description"] = "选择一名玩家保护"
-    
-    elif role_id == "poisoner":
-        config["type"] = "poison"
-        config["can_select"] = True
-        config["targets"] = [{"id": p["id"], "name": p["name"]} for p in alive_players]
-        config["description"] = "选择一名玩家下毒"
-    
-    elif role_id == "fortune_teller":
-        config["type"] = "fortune_tell"
-        config["can_select"] = True
-        config["targets"] = [{"id": p["id"], "name": p["name"]} for p in all_players]
-        config["max_targets"] = 2
-        config["description"] = "选择两名玩家查验是否有恶魔"
-    
-    elif role_id == "empath":
-        config["type"] = "info"
-        config["can_select"] = False
-        config["description"] = "等待说书人告知你邻座的邪恶玩家数量"
-    
-    elif role_id == "undertaker":
-        config["type"] = "info"
-        config["can_select"] = False
-        config["description"] = "等待说书人告知昨天被处决玩家的角色"
-    
-    elif role_id == "ravenkeeper":
-        config["type"] = "investigate"
-        config["can_select"] = True
-        config["targets"] = [{"id": p["id"], "name": p["name"]} for p in all_players]
-        config["description"] = "选择一名玩家查验其角色"
-    
-    elif role_id == "slayer":
-        config["type"] = "day_ability"
-        config["can_select"] = False
-        config["description"] = "你的能力在白天使用"
-    
-    elif role_id == "butler":
-        config["type"] = "choose_master"
-        config["can_select"] = True
-        config["targets"] = [{"id": p["id"], "name": p["name"]} for p in alive_players]
-        config["description"] = "选择你的主人（只能跟随主人投票）"
-    
-    elif role_id == "spy":
-        config["type"] = "info"
-        config["can_select"] = False
-        config["description"] = "你可以查看魔典（说书人会告知信息）"
-    
-    elif role_id in ["washerwoman", "librarian", "investigator", "chef", "clockmaker"]:
-        config["type"] = "info"
-        config["can_select"] = False
-        config["description"] = "等待说书人提供首夜信息"
+    return _event_stream(event_bus.subscribe(game_id, player_id))
+
+
+# 更新日期: 2026-10-19 - 说书人端事件流（夜间流程的步骤与确认请求）
+@player_bp.route('/api/storyteller/events/<game_id>', methods=['GET'])
+def storyteller_events(game_id):
+    """说书人端事件流"""
+    if game_id not in games:
+        return jsonify({"error": "游戏不存在"}), 404
     
-    else:
-        config["type"] = "no_action"
-        config["description"] = "你今晚没有行动"
+    return _event_stream(event_bus.subscribe(game_id, None))
+
+
+def _event_stream(subscription):
+    """把订阅转为 text/event-stream 响应（空闲时每 15 秒发送一次注释保持连接）"""
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=15)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {encode_json(event, ensure_ascii=False)}\n\n"
+        finally:
+            subscription.close()
     
-    return config
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 # ==================== 玩家行动 API ====================
@@ -392,17 +262,19 @@ def player_night_action():
     
     # 添加目标名称
     target_names = []
+    target_ids = []
     for tid in targets:
         target_player = next((p for p in game.players if p["id"] == tid), None)
         if target_player:
             target_names.append(target_player["name"])
+            target_ids.append(tid)
     choice["target_names"] = target_names
     
     game.player_night_choices[player_id] = choice
     
     # 添加日志（仅对说书人可见）
     if targets:
-        game.add_log(f"[玩家选择] {player['name']} ({choice['role_name']}) 选择了 {', '.join(target_names)}", "player_action")
+        game.log_event("player.choice", player_id, choice["role_id"], tuple(target_ids))
     
     return jsonify({
         "success": True,
@@ -429,49 +301,12 @@ def player_vote():
     if not player:
         return jsonify({"error": "无效的玩家"}), 400
     
-    # 检查是否可以投票
-    if not player.get("alive", True) and not player.get("vote_token", False):
-        return jsonify({"error": "你已死亡且没有投票令牌"}), 400
-    
-    # 找到提名
-    nomination = next((n for n in game.nominations if n["id"] == nomination_id), None)
-    if not nomination:
-        return jsonify({"error": "无效的提名"}), 400
+    # 更新日期: 2026-10-19 - 与说书人端共用 Game.vote（投票账本），不再单独维护 voters 列表与票数
+    result = game.vote(nomination_id, player_id, vote_value)
+    if not result["success"]:
+        return jsonify({"error": result["error"]}), 400
     
-    # 初始化投票记录
-    if "voters" not in nomination:
-        nomination["voters"] = []
-    if "votes_detail" not in nomination:
-        nomination["votes_detail"] = {}
-    
-    # 检查是否已投票
-    if player_id in nomination["voters"]:
-        return jsonify({"error": "你已经投过票了"}), 400
-    
-    # 记录投票
-    nomination["voters"].append(player_id)
-    nomination["votes_detail"][player_id] = {
-        "player_name": player["name"],
-        "vote": vote_value,
-        "is_alive": player.get("alive", True),
-        "time": datetime.now().isoformat()
-    }
-    
-    if vote_value:
-        nomination["vote_count"] = nomination.get("vote_count", 0) + 1
-    
-    # 如果死亡玩家投赞成票，消耗令牌
-    if not player.get("alive", True) and vote_value:
-        player["vote_token"] = False
-    
-    vote_text = "赞成" if vote_value else "反对"
-    game.add_log(f"{player['name']} 投了{vote_text}票", "vote")
-    
-    return jsonify({
-        "success": True,
-        "vote_count": nomination.get("vote_count", 0),
-        "total_voters": len(nomination["voters"])
-    })
+    return jsonify(result)
 
 
 # ==================== 消息同步 API ====================
@@ -488,19 +323,23 @@ def get_player_messages(game_id, player_id):
     if not player:
         return jsonify({"error": "无效的玩家"}), 400
     
-    messages = player.get("messages", [])
+    # 更新日期: 2026-10-19 - 支持 ?after=<序号> 只取新消息
+    after = request.args.get('after', 0, type=int)
+    mailbox = game.get_mailbox(player_id)
     
     return jsonify({
-        "messages": messages,
-        "unread_count": len([m for m in messages if not m.get("read")])
+        "messages": mailbox.fetch(after),
+        "unread_count": mailbox.unread_count,
+        "last_seq": mailbox.last_seq
     })
 
 
 @player_bp.route('/api/player/messages/<game_id>/<int:player_id>/read', methods=['POST'])
 def mark_messages_read(game_id, player_id):
     """标记消息为已读"""
-    data = request.json
+    data = request.json or {}
     message_ids = data.get('message_ids', [])
+    up_to = data.get('up_to_seq')
     
     if game_id not in games:
         return jsonify({"error": "游戏不存在"}), 404
@@ -511,12 +350,14 @@ def mark_messages_read(game_id, player_id):
     if not player:
         return jsonify({"error": "无效的玩家"}), 400
     
-    messages = player.get("messages", [])
-    for msg in messages:
-        if msg.get("id") in message_ids or not message_ids:
-            msg["read"] = True
+    # 更新日期: 2026-10-19 - 移动读游标（up_to_seq）或按ID标记；都不传时全部标记已读
+    mailbox = game.get_mailbox(player_id)
+    if message_ids:
+        mailbox.mark_read(seqs=[seq for seq in map(Mailbox.parse_id, message_ids) if seq is not None], up_to=up_to)
+    else:
+        mailbox.mark_read(up_to=up_to)
     
-    return jsonify({"success": True})
+    return jsonify({"success": True, "unread_count": mailbox.unread_count})
 
 
 # ==================== 说书人发送消息 API ====================
@@ -540,25 +381,8 @@ def send_message_to_player():
     if not player:
         return jsonify({"error": "无效的玩家"}), 400
     
-    # 初始化消息队列
-    if "messages" not in player:
-        player["messages"] = []
-    
     # 创建消息
-    message = {
-        "id": f"msg_{datetime.now().timestamp()}",
-        "type": message_type,
-        "title": title,
-        "content": content,
-        "time": datetime.now().isoformat(),
-        "read": False
-    }
-    
-    player["messages"].append(message)
-    
-    # 保留最近50条消息
-    if len(player["messages"]) > 50:
-        player["messages"] = player["messages"][-50:]
+    message = game.send_message(player_id, content, title=title, message_type=message_type)
     
     return jsonify({
         "success": True,
@@ -566,6 +390,30 @@ def send_message_to_player():
     })
 
 
+# 更新日期: 2026-10-19 - 群发（邪恶阵营互认、恶魔伪装身份、天亮死讯等），一份消息体一次推送
+@player_bp.route('/api/storyteller/broadcast', methods=['POST'])
+def broadcast_message():
+    """说书人向一组玩家群发信息（group: all/alive/dead/evil/good/minions/demon，或 player_ids）"""
+    data = request.json or {}
+    game_id = data.get('game_id')
+    
+    if game_id not in games:
+        return jsonify({"error": "游戏不存在"}), 404
+    
+    game = games[game_id]
+    result = game.broadcast(
+        data.get('content', ''),
+        group=data.get('group'),
+        player_ids=data.get('player_ids'),
+        title=data.get('title', '来自说书人的信息'),
+        message_type=data.get('type', 'info')
+    )
+    if not result["success"]:
+        return jsonify(result), 400
+    
+    return jsonify(result)
+
+
 @player_bp.route('/api/storyteller/send_night_result', methods=['POST'])
 def send_night_result():
     """说书人发送夜间行动结果"""
@@ -585,10 +433,6 @@ def send_night_result():
     if not player:
         return jsonify({"error": "无效的玩家"}), 400
     
-    # 初始化消息队列
-    if "messages" not in player:
-        player["messages"] = []
-    
     # 根据结果类型生成描述
     role_name = player.get("role", {}).get("name", "你的角色")
     
@@ -609,18 +453,13 @@ def send_night_result():
     else:
         content = str(result_data)
     
-    message = {
-        "id": f"result_{datetime.now().timestamp()}",
-        "type": "night_result",
-        "title": f"🌙 {role_name}的夜间信息",
-        "content": content,
-        "result_type": result_type,
-        "result_data": result_data,
-        "time": datetime.now().isoformat(),
-        "read": False
-    }
-    
-    player["messages"].append(message)
+    message = game.send_message(
+        player_id,
+        content,
+        title=f"🌙 {role_name}的夜间信息",
+        message_type="night_result",
+        extra={"result_type": result_type, "result_data": result_data}
+    )
     
     # 清除玩家的夜间选择（已处理）
     if hasattr(game, 'player_night_choices') and player_id in game.player_night_choices:
@@ -628,7 +467,7 @@ def send_night_result():
     
     # 同时清除待处理行动，防止玩家端轮询时重新显示等待面板覆盖消息
     if hasattr(game, 'pending_actions') and player_id in game.pending_actions:
-        game.pending_actions[player_id]["status"] = "confirmed"
+        game.pending_actions[player_id].confirm()
     
     return jsonify({
         "success": True,
@@ -689,8 +528,29 @@ def player_heartbeat():
     if not player:
         return jsonify({"error": "无效的玩家"}), 400
     
-    player["connected"] = True
-    player["last_seen"] = datetime.now().isoformat()
+    _mark_seen(game_id, player)
+    
+    return jsonify({"success": True})
+
+
+# 更新日期: 2026-10-19 - 玩家主动离开（关闭页面时调用），立即释放座位
+@player_bp.route('/api/player/leave', methods=['POST'])
+def player_leave():
+    """玩家主动断开连接"""
+    data = request.json
+    game_id = data.get('game_id')
+    player_id = data.get('player_id')
+    
+    if game_id not in games:
+        return jsonify({"error": "游戏不存在"}), 404
+    
+    game = games[game_id]
+    player = next((p for p in game.players if p["id"] == player_id), None)
+    
+    if not player:
+        return jsonify({"error": "无效的玩家"}), 400
+    
+    stats.disconnect(game_id, player_id)
     
     return jsonify({"success": True})
 
@@ -702,6 +562,7 @@ def get_players_connection_status(game_id):
         return jsonify({"error": "游戏不存在"}), 404
     
     game = games[game_id]
+    online = stats.online_ids(game_id)
     
     players_status = []
     for p in game.players:
@@ -719,7 +580,7 @@ def get_players_connection_status(game_id):
         players_status.append({
             "id": p["id"],
             "name": p["name"],
-            "connected": p.get("connected", False),
+            "connected": p["id"] in online,
             "online": is_online,
             "last_seen": last_seen
         })
@@ -754,24 +615,12 @@ def notify_player_action():
     if not hasattr(game, 'pending_actions'):
         game.pending_actions = {}
     
-    # 获取存活玩家列表作为可选目标
-    alive_players = [
-        {"id": p["id"], "name": p["name"]} 
-        for p in game.players 
-        if p.get("alive", True) and p["id"] != player_id
-    ]
-    
-    all_players = [
-        {"id": p["id"], "name": p["name"]} 
-        for p in game.players 
-        if p["id"] != player_id
-    ]
+    # 获取存活玩家列表作为可选目标（更新日期: 2026-10-19 - 使用按阶段缓存的目标列表）
+    alive_players = game.target_list("alive", player_id)
+    all_players = game.target_list("all", player_id)
     
     # 占卜师等角色可以选择包括自己在内的所有玩家
-    all_players_with_self = [
-        {"id": p["id"], "name": p["name"]} 
-        for p in game.players
-    ]
+    all_players_with_self = game.target_list("all")
     
     # 构建行动请求
     role = player.get("role", {})
@@ -800,17 +649,22 @@ def notify_player_action():
         "can_skip": action_config.get("can_skip", True),
         "description": action_config.get("description", role.get("ability", "")),
         "created_at": datetime.now().isoformat(),
-        "status": "pending",  # pending, submitted, confirmed
+        "status": "pending",  # pending, submitted, confirmed（或 cancelled / expired）
         "choice": None
     }
+    # 更新日期: 2026-10-19 - 可等待的行动（带 action_id 与超时），说书人通过 wait 接口即时得知提交
+    pending_action = PendingAction(pending_action, timeout=action_config.get("timeout", DEFAULT_ACTION_TIMEOUT))
     
+    previous = game.pending_actions.get(player_id)
+    if previous is not None:
+        previous.cancel("superseded")
     game.pending_actions[player_id] = pending_action
     
     # 清除之前的选择
     if hasattr(game, 'player_night_choices') and player_id in game.player_night_choices:
         del game.player_night_choices[player_id]
     
-    game.add_log(f"[系统] 等待 {player['name']} ({role_name}) 进行行动选择", "info")
+    game.log_event("action.waiting", player_id, role_id)
     
     return jsonify({
         "success": True,
@@ -833,7 +687,7 @@ def get_pending_action(game_id, player_id):
     pending_actions = getattr(game, 'pending_actions', {})
     pending = pending_actions.get(player_id)
     
-    if pending and pending.get("status") == "pending":
+    if pending and pending.is_open():
         return jsonify({
             "has_pending": True,
             "action": pending
@@ -870,25 +724,17 @@ def submit_player_action():
     pending_actions = getattr(game, 'pending_actions', {})
     pending = pending_actions.get(player_id)
     
-    if not pending or pending.get("status") != "pending":
+    if not pending or not pending.is_open():
         return jsonify({"error": "没有待处理的行动"}), 400
     
     # 获取目标名称
     target_names = []
+    target_ids = []
     for tid in targets:
         target_player = next((p for p in game.players if p["id"] == tid), None)
         if target_player:
             target_names.append(target_player["name"])
-    
-    # 更新行动状态
-    pending["status"] = "submitted"
-    pending["choice"] = {
-        "targets": targets,
-        "target_names": target_names,
-        "extra_data": extra_data,
-        "skipped": skipped,
-        "submitted_at": datetime.now().isoformat()
-    }
+            target_ids.append(tid)
     
     # 同时存储到player_night_choices供说书人查看
     if not hasattr(game, 'player_night_choices'):
@@ -907,10 +753,19 @@ def submit_player_action():
         "confirmed": False
     }
     
+    # 更新行动状态（唤醒正在等待的说书人端）
+    pending.submit({
+        "targets": targets,
+        "target_names": target_names,
+        "extra_data": extra_data,
+        "skipped": skipped,
+        "submitted_at": datetime.now().isoformat()
+    })
+    
     if skipped:
-        game.add_log(f"[玩家选择] {player['name']} ({pending['role_name']}) 选择跳过行动", "player_action")
+        game.log_event("player.skip", player_id, pending["role_id"])
     else:
-        game.add_log(f"[玩家选择] {player['name']} ({pending['role_name']}) 选择了 {', '.join(target_names)}", "player_action")
+        game.log_event("player.choice", player_id, pending["role_id"], tuple(target_ids))
     
     return jsonify({
         "success": True,
@@ -989,23 +844,22 @@ def ravenkeeper_choose():
     # 获取目标真实角色
     if is_drunk_or_poisoned:
         # 醉酒/中毒时给假信息：随机选一个不同的角色
-        import random
         all_roles = []
         for role_type in ["townsfolk", "outsider", "minion", "demon"]:
             all_roles.extend(game.script["roles"].get(role_type, []))
         real_role_id = target["role"]["id"] if target.get("role") else None
         fake_roles = [r for r in all_roles if r["id"] != real_role_id]
         if fake_roles:
-            fake_role = random.choice(fake_roles)
-            role_name = fake_role["name"]
+            shown_role = game.rng.choice(fake_roles)
         else:
-            role_name = target["role"]["name"] if target.get("role") else "未知"
+            shown_role = target.get("role")
     else:
         # 正常情况：显示真实角色（酒鬼显示"酒鬼"）
         if target.get("is_the_drunk") and target.get("true_role"):
-            role_name = target["true_role"]["name"]
+            shown_role = target["true_role"]
         else:
-            role_name = target["role"]["name"] if target.get("role") else "未知"
+            shown_role = target.get("role")
+    role_name = shown_role["name"] if shown_role else "未知"
 
     result_data = {
         "target_id": target_id,
@@ -1018,10 +872,7 @@ def ravenkeeper_choose():
     player["ravenkeeper_choice_made"] = True
     player["ravenkeeper_result"] = result_data
 
-    game.add_log(
-        f"[守鸦人] {player['name']} 查验了 {target['name']}，得知角色为 {role_name}",
-        "night"
-    )
+    game.log_event("ravenkeeper.checked", player_id, target_id, shown_role["id"] if shown_role else None)
 
     return jsonify({
         "success": True,
@@ -1042,11 +893,49 @@ def clear_pending_action():
     game = games[game_id]
     
     if hasattr(game, 'pending_actions') and player_id in game.pending_actions:
-        del game.pending_actions[player_id]
+        game.pending_actions.pop(player_id).cancel()
     
     return jsonify({"success": True})
 
 
+def _find_pending_action(game, action_id):
+    """在对局的待处理行动中按 action_id 查找（行动ID跨对局递增，必须校验归属）"""
+    for action in getattr(game, 'pending_actions', {}).values():
+        if action.get("action_id") == action_id:
+            return action
+    return None
+
+
+# 更新日期: 2026-10-19 - 等待玩家提交（长轮询）：玩家提交、行动被取消或超时时立即返回
+@player_bp.route('/api/storyteller/<game_id>/actions/<action_id>/wait', methods=['GET'])
+def wait_for_action(game_id, action_id):
+    """等待待处理行动结束（?timeout= 秒，最长 30 秒；未结束时返回 done=false，客户端重新发起即可）"""
+    if game_id not in games:
+        return jsonify({"error": "游戏不存在"}), 404
+    
+    action = _find_pending_action(games[game_id], action_id)
+    if action is None:
+        return jsonify({"error": "行动不存在"}), 404
+    
+    timeout = min(max(request.args.get('timeout', 25, type=float), 0), 30)
+    done = action.wait(timeout)
+    return jsonify({"done": done, "status": action["status"], "action": action})
+
+
+@player_bp.route('/api/storyteller/<game_id>/actions/<action_id>/cancel', methods=['POST'])
+def cancel_action(game_id, action_id):
+    """取消待处理行动（等待中的请求会立即返回）"""
+    if game_id not in games:
+        return jsonify({"error": "游戏不存在"}), 404
+    
+    action = _find_pending_action(games[game_id], action_id)
+    if action is None:
+        return jsonify({"error": "行动不存在"}), 404
+    
+    action.cancel()
+    return jsonify({"success": True, "status": action["status"]})
+
+
 @player_bp.route('/api/storyteller/night_progress/<game_id>', methods=['GET'])
 def get_night_progress(game_id):
     """获取夜间行动进度（说书人用，包含所有玩家提交状态）"""
@@ -1110,12 +999,8 @@ def notify_day_action():
     if not hasattr(game, 'pending_actions'):
         game.pending_actions = {}
     
-    # 获取存活玩家列表
-    alive_players = [
-        {"id": p["id"], "name": p["name"]} 
-        for p in game.players 
-        if p.get("alive", True) and p["id"] != player_id
-    ]
+    # 获取存活玩家列表（按阶段缓存）
+    alive_players = game.target_list("alive", player_id)
     
     role = player.get("role", {})
     role_id = role.get("id", "")
@@ -1137,10 +1022,14 @@ def notify_day_action():
         "status": "pending",
         "choice": None
     }
+    pending_action = PendingAction(pending_action, timeout=action_config.get("timeout", DEFAULT_ACTION_TIMEOUT))
     
+    previous = game.pending_actions.get(player_id)
+    if previous is not None:
+        previous.cancel("superseded")
     game.pending_actions[player_id] = pending_action
     
-    game.add_log(f"[系统] {player['name']} ({role_name}) 正在进行白天行动", "info")
+    game.log_event("action.day", player_id, role_id)
     
     return jsonify({
         "success": True,
@@ -1163,7 +1052,7 @@ def get_day_action(game_id, player_id):
     pending_actions = getattr(game, 'pending_actions', {})
     pending = pending_actions.get(player_id)
     
-    if pending and pending.get("status") == "pending" and pending.get("action_type") == "day_action":
+    if pending and pending.is_open() and pending.get("action_type") == "day_action":
         return jsonify({
             "has_pending": True,
             "action": pending
@@ -1174,35 +1063,26 @@ def get_day_action(game_id, player_id):
 
 # ==================== 麻脸巫婆特殊处理 API ====================
 
+def role_picker_response(picker, payload):
+    """角色选择器响应：以载荷版本号作为 ETag，客户端缓存未过期时返回 304"""
+    response = jsonify(payload)
+    response.set_etag(picker["version"])
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
 @player_bp.route('/api/player/pit_hag_roles/<game_id>', methods=['GET'])
 def get_pit_hag_all_roles(game_id):
     """获取麻脸巫婆可选的所有角色（玩家端用，不过滤）"""
     if game_id not in games:
         return jsonify({"error": "游戏不存在"}), 404
     
-    game = games[game_id]
-    
-    # 获取当前场上的角色
-    current_role_ids = set()
-    for p in game.players:
-        if p.get("role"):
-            current_role_ids.add(p["role"].get("id"))
-    
-    # 获取剧本中所有角色
-    all_roles = []
-    for role_type in ["townsfolk", "outsider", "minion", "demon"]:
-        for role in game.script["roles"].get(role_type, []):
-            all_roles.append({
-                "id": role["id"],
-                "name": role["name"],
-                "type": role_type,
-                "ability": role.get("ability", ""),
-                "in_play": role["id"] in current_role_ids  # 标记是否在场
-            })
-    
-    return jsonify({
-        "roles": all_roles,
-        "current_role_ids": list(current_role_ids)
+    # 更新日期: 2026-10-19 - 按剧本与在场角色位集预生成的载荷（带版本号，未变化时返回 304）
+    picker = games[game_id].role_picker()
+    return role_picker_response(picker, {
+        "roles": picker["roles"],
+        "current_role_ids": picker["current_role_ids"],
+        "version": picker["version"]
     })
 
 
@@ -1225,25 +1105,12 @@ def submit_pit_hag_action():
     if not player or not target:
         return jsonify({"error": "无效的玩家"}), 400
     
-    # 检查角色是否在场
-    current_role_ids = set()
-    for p in game.players:
-        if p.get("role"):
-            current_role_ids.add(p["role"].get("id"))
-    
-    role_in_play = new_role_id in current_role_ids
+    # 检查角色是否在场（在场角色位集）
+    role_in_play = game.role_in_play(new_role_id)
     
     # 获取角色信息
-    new_role = None
-    new_role_type = None
-    for role_type in ["townsfolk", "outsider", "minion", "demon"]:
-        for role in game.script["roles"].get(role_type, []):
-            if role["id"] == new_role_id:
-                new_role = role
-                new_role_type = role_type
-                break
-        if new_role:
-            break
+    new_role = game.role_table.find(new_role_id)
+    new_role_type = game.role_table.role_type(new_role_id)
     
     # 存储选择
     if not hasattr(game, 'player_night_choices'):
@@ -1271,13 +1138,12 @@ def submit_pit_hag_action():
     
     # 更新pending_actions状态
     if hasattr(game, 'pending_actions') and player_id in game.pending_actions:
-        game.pending_actions[player_id]["status"] = "submitted"
-        game.pending_actions[player_id]["choice"] = game.player_night_choices[player_id]
+        game.pending_actions[player_id].submit(game.player_night_choices[player_id])
     
     if role_in_play:
-        game.add_log(f"[玩家选择] 麻脸巫婆选择将 {target['name']} 变为 {new_role['name']}（角色在场，无事发生）", "player_action")
+        game.log_event("player.pit_hag_in_play", target_player_id, new_role_id)
     else:
-        game.add_log(f"[玩家选择] 麻脸巫婆选择将 {target['name']} 变为 {new_role['name']}", "player_action")
+        game.log_event("player.pit_hag", target_player_id, new_role_id)
     
     return jsonify({
         "success": True,
@@ -1485,27 +1351,26 @@ def pull_game_state_from_server():
 
 @player_bp.route('/api/server/health', methods=['GET'])
 def server_health():
-    """服务器健康检查"""
-    active_games = len(games) if games else 0
-    total_players = 0
-    online_players = 0
+    """服务器健康检查
 
-    if games:
-        for game in games.values():
-            total_players += len(game.players)
-            for p in game.players:
-                if p.get("connected"):
-                    online_players += 1
-
-    return jsonify({
-        "status": "healthy",
+    更新日期: 2026-10-19 - 聚合值由 ServerStats 增量维护，开销为 O(1)；
+    ?detail=1 时额外返回每局游戏的内存估算与日志/消息大小（遍历对局）。
+    """
+    active_games = len(games) if games else 0
+    health = stats.snapshot(active_games)
+    health.update({
+        "status": "near_capacity" if health["capacity"]["near_capacity"] else "healthy",
         "mode": _server_config["mode"],
-        "active_games": active_games,
-        "total_players": total_players,
-        "online_players": online_players,
         "version": "1.0.0"
     })
 
+    if request.args.get('detail') in ('1', 'true'):
+        per_game = [game_memory_estimate(game) for game in games.values()]
+        health["games"] = per_game
+        health["estimated_bytes"] = sum(g["estimated_bytes"] for g in per_game)
+
+    return jsonify(health)
+
 
 @player_bp.route('/api/storyteller/confirm_pit_hag', methods=['POST'])
 def confirm_pit_hag_action():
@@ -1529,7 +1394,7 @@ def confirm_pit_hag_action():
     if extra.get("role_in_play"):
         # 角色在场，无事发生
         choice["confirmed"] = True
-        game.add_log(f"[夜间] 麻脸巫婆的能力无效（选择的角色已在场）", "night")
+        game.log_event("pit_hag.no_effect")
         return jsonify({
             "success": True,
             "effect": "no_effect",
@@ -1541,34 +1406,25 @@ def confirm_pit_hag_action():
     target = next((p for p in game.players if p["id"] == target_id), None)
     
     if target:
-        old_role_name = target.get("role", {}).get("name", "未知")
+        old_role_id = target.get("role", {}).get("id")
         new_role_id = extra.get("new_role_id")
-        new_role_name = extra.get("new_role_name")
         new_role_type = extra.get("new_role_type")
         
         # 获取完整角色信息
-        new_role = None
-        for role_type in ["townsfolk", "outsider", "minion", "demon"]:
-            for role in game.script["roles"].get(role_type, []):
-                if role["id"] == new_role_id:
-                    new_role = role
-                    break
-            if new_role:
-                break
+        new_role = game.role_table.find(new_role_id)
         
         if new_role:
-            target["role"] = new_role
-            target["role_type"] = new_role_type
+            game.set_player_role(target, new_role, new_role_type)
             
             if extra.get("is_demon"):
-                game.add_log(f"[夜间] 麻脸巫婆将 {target['name']} 从 {old_role_name} 变为 {new_role_name}（新恶魔）", "night")
+                game.log_event("pit_hag.changed_demon", target_id, old_role_id, new_role_id)
                 if not allow_demon_survive:
                     # 说书人选择让新恶魔死亡
                     # 这里不直接杀死，而是标记需要处理
                     choice["demon_killed"] = True
-                    game.add_log(f"[夜间] 说书人决定：新恶魔今晚死亡", "night")
+                    game.log_event("pit_hag.demon_dies")
             else:
-                game.add_log(f"[夜间] 麻脸巫婆将 {target['name']} 从 {old_role_name} 变为 {new_role_name}", "night")
+                game.log_event("pit_hag.changed", target_id, old_role_id, new_role_id)
     
     choice["confirmed"] = True
     
@@ -0,0 +1,222 @@
+"""
+血染钟楼 - 慢请求采样分析
+更新日期: 2026-10-19
+
+可在运行时开启（无需重启）的采样分析器：开启后由一个后台采样线程按固定间隔读取
+sys._current_frames()，为正在处理中的请求累计调用栈样本；请求结束时若耗时超过阈值，
+就把折叠后的调用栈连同路由、game_id 等信息存入环形缓冲区，否则丢弃。
+
+折叠栈（folded stacks）格式可直接用于 flamegraph.pl 或 speedscope 生成火焰图。
+
+接口：
+- GET  /api/server/profiling                         当前配置与慢请求记录列表（可按 route / game_id 过滤）
+- POST /api/server/profiling                         修改配置 {enabled, threshold_ms, interval_ms, buffer_size}
+- GET  /api/server/profiling/<record_id>.folded      下载单条记录的折叠栈
+- GET  /api/server/profiling/folded                  合并下载（可按 route / game_id 过滤）
+"""
+
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import Blueprint, Response, g, jsonify, request
+
+profiling_bp = Blueprint('profiling', __name__)
+
+_config = {
+    "enabled": False,
+    "threshold_ms": 200,
+    "interval_ms": 5,
+    "buffer_size": 50,
+}
+
+_active = {}            # 线程ID -> 正在处理的请求
+_records = deque(maxlen=_config["buffer_size"])
+_lock = threading.Lock()
+_sampler = None
+_next_record_id = 1
+
+
+class _ActiveRequest:
+    __slots__ = ("started", "stacks", "samples")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+
+
+def _fold(frame):
+    """把调用栈折叠为 "根;...;叶" 字符串"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+def _sample_loop():
+    """采样线程：开启期间按间隔为所有处理中的请求记录调用栈"""
+    global _sampler
+    while True:
+        with _lock:
+            if not _config["enabled"]:
+                _sampler = None
+                return
+            interval = _config["interval_ms"] / 1000.0
+            targets = dict(_active)
+        if targets:
+            frames = sys._current_frames()
+            for thread_id, active in targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    active.stacks[_fold(frame)] += 1
+                    active.samples += 1
+            del frames
+        time.sleep(interval)
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is None:
+        _sampler = threading.Thread(target=_sample_loop, name="slow-request-sampler", daemon=True)
+        _sampler.start()
+
+
+# ==================== 请求钩子 ====================
+
+def _before_request():
+    if not _config["enabled"]:
+        return
+    active = _ActiveRequest()
+    g._profiling_active = active
+    with _lock:
+        _active[threading.get_ident()] = active
+
+
+def _teardown_request(exc):
+    global _next_record_id
+    active = getattr(g, '_profiling_active', None)
+    if active is None:
+        return
+    g._profiling_active = None
+    duration_ms = (time.perf_counter() - active.started) * 1000
+    with _lock:
+        _active.pop(threading.get_ident(), None)
+        if duration_ms < _config["threshold_ms"] or not active.samples:
+            return
+        record_id = _next_record_id
+        _next_record_id += 1
+
+    game_id = (request.view_args or {}).get("game_id")
+    if game_id is None and request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            game_id = body.get("game_id")
+
+    record = {
+        "id": record_id,
+        "time": datetime.now().isoformat(),
+        "method": request.method,
+        "route": request.url_rule.rule if request.url_rule else "<unmatched>",
+        "path": request.path,
+        "game_id": game_id,
+        "duration_ms": round(duration_ms, 2),
+        "samples": active.samples,
+        "error": type(exc).__name__ if exc else None,
+        "stacks": active.stacks,
+    }
+    with _lock:
+        _records.append(record)
+
+
+def init_profiling(app):
+    """注册请求钩子与分析接口（默认关闭，通过接口随时开启）"""
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
+    app.register_blueprint(profiling_bp)
+
+
+def configure(enabled=None, threshold_ms=None, interval_ms=None, buffer_size=None):
+    """运行时修改配置，返回新配置"""
+    global _records
+    with _lock:
+        if threshold_ms is not None:
+            _config["threshold_ms"] = max(0, float(threshold_ms))
+        if interval_ms is not None:
+            _config["interval_ms"] = min(1000, max(1, float(interval_ms)))
+        if buffer_size is not None:
+            _config["buffer_size"] = min(1000, max(1, int(buffer_size)))
+            _records = deque(_records, maxlen=_config["buffer_size"])
+        if enabled is not None:
+            _config["enabled"] = bool(enabled)
+            if not _config["enabled"]:
+                _active.clear()
+        if _config["enabled"]:
+            _ensure_sampler()
+        return dict(_config)
+
+
+def _matching_records():
+    route = request.args.get("route")
+    game_id = request.args.get("game_id")
+    with _lock:
+        records = list(_records)
+    return [r for r in records
+            if (not route or r["route"] == route) and (not game_id or r["game_id"] == game_id)]
+
+
+def _folded_response(stacks, filename):
+    text = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    return Response(text, mimetype="text/plain; charset=utf-8",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+# ==================== 接口 ====================
+
+@profiling_bp.route('/api/server/profiling', methods=['GET'])
+def get_profiling():
+    """当前配置与慢请求记录（不含调用栈）"""
+    records = [{k: v for k, v in r.items() if k != "stacks"} for r in _matching_records()]
+    with _lock:
+        config = dict(_config)
+    return jsonify({"config": config, "records": records})
+
+
+@profiling_bp.route('/api/server/profiling', methods=['POST'])
+def update_profiling():
+    """修改采样分析配置（立即生效，无需重启）"""
+    data = request.json or {}
+    try:
+        config = configure(
+            enabled=data.get('enabled'),
+            threshold_ms=data.get('threshold_ms'),
+            interval_ms=data.get('interval_ms'),
+            buffer_size=data.get('buffer_size')
+        )
+    except (TypeError, ValueError):
+        return jsonify({"error": "参数格式错误"}), 400
+    return jsonify({"success": True, "config": config})
+
+
+@profiling_bp.route('/api/server/profiling/folded', methods=['GET'])
+def download_folded():
+    """合并下载匹配记录的折叠栈"""
+    merged = Counter()
+    for record in _matching_records():
+        merged.update(record["stacks"])
+    return _folded_response(merged, "slow_requests.folded")
+
+
+@profiling_bp.route('/api/server/profiling/<int:record_id>.folded', methods=['GET'])
+def download_record(record_id):
+    """下载单条慢请求记录的折叠栈"""
+    with _lock:
+        record = next((r for r in _records if r["id"] == record_id), None)
+    if not record:
+        return jsonify({"error": "记录不存在"}), 404
+    return _folded_response(record["stacks"], f"slow_request_{record_id}.folded")
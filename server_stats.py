@@ -0,0 +1,187 @@
+"""
+血染钟楼 - 服务器容量统计
+更新日期: 2026-10-19
+
+增量维护健康检查所需的聚合数据，使 /api/server/health 的开销与对局数、玩家数无关：
+- 玩家总数：分配角色与淘汰对局时增减
+- 在线玩家：按心跳过期判断（而不是从不清除的 connected 标记），过期时清除 connected
+- 请求速率：最近 60 秒按秒分桶计数
+- 最早对局的存活时间：按创建顺序记录
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 超过该时间（秒）没有心跳或轮询即视为离线（客户端每 5 秒心跳一次）
+PRESENCE_TIMEOUT = 15.0
+# 请求速率统计窗口（秒）
+RATE_WINDOW = 60
+# 对局数达到上限的该比例时报告接近容量
+NEAR_CAPACITY_RATIO = 0.8
+
+
+class ServerStats:
+    """服务器级聚合计数（线程安全）"""
+
+    def __init__(self, max_games, games=None):
+        self.max_games = max_games
+        self._games = games if games is not None else {}  # 游戏ID -> Game，读取时按ID解析玩家
+        self.total_players = 0
+        self._lock = threading.Lock()
+        self._game_players = {}          # 游戏ID -> 已分配的玩家数
+        self._game_created = OrderedDict()  # 游戏ID -> 创建时刻（按创建顺序）
+        # 在线状态：(游戏ID, 玩家ID) -> 过期时刻；过期队列按时间递增
+        # 只保存ID，不持有玩家字典（重新分配角色会换掉玩家字典），清除标记时再按ID查找
+        self._online = {}
+        self._online_by_game = {}
+        self._expiry = deque()
+        # 请求速率：按秒分桶的环形计数
+        self._rate_seconds = [0] * RATE_WINDOW
+        self._rate_counts = [0] * RATE_WINDOW
+
+    # ==================== 对局 ====================
+
+    def game_created(self, game_id):
+        with self._lock:
+            self._game_created[game_id] = time.monotonic()
+            self._game_players.setdefault(game_id, 0)
+
+    def players_assigned(self, game_id, player_count):
+        """分配（或重新分配）角色后更新玩家数"""
+        with self._lock:
+            self.total_players += player_count - self._game_players.get(game_id, 0)
+            self._game_players[game_id] = player_count
+
+    def game_evicted(self, game_id):
+        """对局被淘汰：移除其玩家数与在线记录"""
+        with self._lock:
+            self.total_players -= self._game_players.pop(game_id, 0)
+            self._game_created.pop(game_id, None)
+            for player_id in self._online_by_game.pop(game_id, ()):
+                self._online.pop((game_id, player_id), None)
+
+    # ==================== 在线状态 ====================
+
+    def touch(self, game_id, player):
+        """记录一次心跳/轮询，玩家在 PRESENCE_TIMEOUT 内视为在线"""
+        now = time.monotonic()
+        key = (game_id, player["id"])
+        expires = now + PRESENCE_TIMEOUT
+        with self._lock:
+            self._sweep(now)
+            if key not in self._online:
+                self._online_by_game.setdefault(game_id, set()).add(player["id"])
+            self._online[key] = expires
+            self._expiry.append((expires, key))
+        player["connected"] = True
+
+    def disconnect(self, game_id, player_id):
+        """玩家主动离开"""
+        with self._lock:
+            self._drop((game_id, player_id))
+
+    def is_online(self, game_id, player_id):
+        with self._lock:
+            self._sweep(time.monotonic())
+            return (game_id, player_id) in self._online
+
+    def online_ids(self, game_id):
+        """该局当前在线的玩家ID集合"""
+        with self._lock:
+            self._sweep(time.monotonic())
+            return set(self._online_by_game.get(game_id, ()))
+
+    def sweep(self):
+        """清除已过期的在线记录（摊还 O(1)）"""
+        with self._lock:
+            self._sweep(time.monotonic())
+
+    def _sweep(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, key = self._expiry.popleft()
+            # 之后又有心跳的记录会在队列更靠后的位置，这里跳过
+            if self._online.get(key) == expires:
+                self._drop(key)
+
+    def _player(self, key):
+        """按 (游戏ID, 玩家ID) 解析当前的玩家字典（对局或玩家已不存在时返回 None）"""
+        game = self._games.get(key[0])
+        if game is None:
+            return None
+        return next((p for p in game.players if p["id"] == key[1]), None)
+
+    def _drop(self, key):
+        if self._online.pop(key, None) is None:
+            return
+        player = self._player(key)
+        if player is not None:
+            player["connected"] = False
+        players = self._online_by_game.get(key[0])
+        if players is not None:
+            players.discard(key[1])
+            if not players:
+                del self._online_by_game[key[0]]
+
+    # ==================== 请求速率 ====================
+
+    def record_request(self):
+        second = int(time.monotonic())
+        index = second % RATE_WINDOW
+        with self._lock:
+            if self._rate_seconds[index] != second:
+                self._rate_seconds[index] = second
+                self._rate_counts[index] = 0
+            self._rate_counts[index] += 1
+
+    def request_rate(self):
+        """最近 RATE_WINDOW 秒的平均每秒请求数"""
+        oldest = int(time.monotonic()) - RATE_WINDOW
+        with self._lock:
+            total = sum(count for second, count in zip(self._rate_seconds, self._rate_counts) if second > oldest)
+        return total / RATE_WINDOW
+
+    # ==================== 汇总 ====================
+
+    def snapshot(self, active_games):
+        """健康检查所需的全部聚合值（不遍历对局和玩家）"""
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            online_players = len(self._online)
+            total_players = self.total_players
+            oldest = next(iter(self._game_created.values()), None)
+        return {
+            "active_games": active_games,
+            "total_players": total_players,
+            "online_players": online_players,
+            "oldest_game_age_seconds": round(now - oldest, 1) if oldest is not None else None,
+            "requests_per_second": round(self.request_rate(), 2),
+            "capacity": {
+                "max_games": self.max_games,
+                "free_slots": max(0, self.max_games - active_games),
+                "near_capacity": active_games >= self.max_games * NEAR_CAPACITY_RATIO,
+            },
+        }
+
+
+def game_memory_estimate(game):
+    """单局游戏的内存占用估算（日志与消息按已记录的字节数，玩家与提名按固定开销）"""
+    log_bytes = getattr(game, 'log_bytes', 0)
+    message_bytes = getattr(game, 'message_bytes', 0)
+    return {
+        "game_id": game.game_id,
+        "players": len(game.players),
+        "log_entries": len(game.game_log),
+        "log_bytes": log_bytes,
+        "message_bytes": message_bytes,
+        "estimated_bytes": log_bytes + message_bytes + len(game.players) * 2048 + len(game.nominations) * 512,
+    }
+
+
+def init_server_stats(app, max_games, games=None):
+    """创建统计对象并注册请求计数钩子（games 为对局字典，用于按ID解析在线玩家）"""
+    stats = ServerStats(max_games, games)
+    app.before_request(stats.record_request)
+    app.extensions["server_stats"] = stats
+    return stats
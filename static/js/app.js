@@ -1461,7 +1461,7 @@ async function handleNightAction(index) {
         // 更新日期: 2026-01-12 - 需要玩家选择的角色，由玩家端选择后同步过来
         const needsTwoTargets = ['fortune_teller', 'seamstress', 'chambermaid'].includes(item.role_id);
         const needsOneTarget = ['ravenkeeper', 'dreamer'].includes(item.role_id);
-        const noTargetNeeded = ['empath', 'undertaker', 'oracle', 'flowergirl'].includes(item.role_id);
+        const noTargetNeeded = ['empath', 'undertaker', 'oracle', 'flowergirl', 'town_crier'].includes(item.role_id);
         
         // 检查该玩家是否处于醉酒/中毒状态
         const actionPlayer = gameState.players.find(p => p.id === item.player_id);
@@ -1825,7 +1825,7 @@ async function handleNightAction(index) {
     const isFirstNightInfo = item.action_type === 'info_first_night';
     
     // 不需要选择目标的其他信息角色
-    const noTargetInfoRoles = ['empath', 'undertaker', 'oracle', 'flowergirl'];
+    const noTargetInfoRoles = ['empath', 'undertaker', 'oracle', 'flowergirl', 'town_crier'];
     const isNoTargetInfoRole = item.action_type === 'info_select' && noTargetInfoRoles.includes(item.role_id);
     
     // 检查玩家是否在线
@@ -1869,6 +1869,50 @@ async function handleNightAction(index) {
     startModalChoicePolling(item.player_id, index);
 }
 
+// 更新日期: 2026-10-19 - 等待玩家提交：已通知的行动用长轮询等待（玩家提交后立即返回），
+// 没有行动ID或行动已结束时才退回到每 2 秒轮询
+const pendingActionIds = {};   // 玩家ID -> 行动ID（通知玩家时记录）
+const actionWaiters = {};      // 等待通道 -> 令牌
+
+function rememberPendingAction(playerId, result) {
+    if (result && result.pending_action && result.pending_action.action_id) {
+        pendingActionIds[playerId] = result.pending_action.action_id;
+    }
+}
+
+function startActionWait(channel, playerId, onSubmitted, onFallback) {
+    const actionId = pendingActionIds[playerId];
+    if (!actionId) return false;
+    const token = {};
+    actionWaiters[channel] = token;
+    (async () => {
+        while (actionWaiters[channel] === token) {
+            let result;
+            try {
+                result = await apiCall(`/api/storyteller/${gameState.gameId}/actions/${actionId}/wait?timeout=25`);
+            } catch (e) {
+                await new Promise(resolve => setTimeout(resolve, 2000));
+                continue;
+            }
+            if (actionWaiters[channel] !== token) return;
+            if (result && result.done === false) continue;
+            delete actionWaiters[channel];
+            if (pendingActionIds[playerId] === actionId) delete pendingActionIds[playerId];
+            if (result && result.status === 'submitted') {
+                await onSubmitted();
+            } else if (onFallback) {
+                onFallback();
+            }
+            return;
+        }
+    })();
+    return true;
+}
+
+function cancelActionWait(channel) {
+    delete actionWaiters[channel];
+}
+
 // 模态框内实时轮询玩家选择
 let modalChoicePollingTimer = null;
 
@@ -1944,10 +1988,13 @@ function startModalChoicePolling(playerId, nightIndex) {
         }
     };
     
-    modalChoicePollingTimer = setInterval(poll, 2000);
+    const fallback = () => { modalChoicePollingTimer = setInterval(poll, 2000); };
+    if (startActionWait('modal', playerId, poll, fallback)) return;
+    fallback();
 }
 
 function stopModalChoicePolling() {
+    cancelActionWait('modal');
     if (modalChoicePollingTimer) {
         clearInterval(modalChoicePollingTimer);
         modalChoicePollingTimer = null;
@@ -2472,7 +2519,7 @@ async function notifyNextPlayerAction(nextIndex) {
     } else if (actionType === 'pit_hag') {
         actionConfig.special = 'pit_hag';
         actionConfig.description = '选择一名玩家和一个角色，该玩家将变成那个角色';
-    } else if (['empath', 'undertaker', 'oracle', 'flowergirl'].includes(roleId)) {
+    } else if (['empath', 'undertaker', 'oracle', 'flowergirl', 'town_crier'].includes(roleId)) {
         actionConfig.is_info = true;
         actionConfig.can_select = false;
     } else if (['washerwoman', 'librarian', 'investigator', 'chef', 'clockmaker'].includes(roleId)) {
@@ -2481,12 +2528,13 @@ async function notifyNextPlayerAction(nextIndex) {
     }
     
     // 即使玩家离线也发送通知（玩家上线后会收到）
-    await apiCall('/api/storyteller/notify_action', 'POST', {
+    const notifyResult = await apiCall('/api/storyteller/notify_action', 'POST', {
         game_id: gameState.gameId,
         player_id: nextItem.player_id,
         action_type: actionType,
         action_config: actionConfig
     });
+    rememberPendingAction(nextItem.player_id, notifyResult);
     
     const onlineStatus = nextPlayer?.online ? '' : ' (离线，等待上线)';
     addLogEntry(`📱 已通知 ${nextPlayer?.name || '玩家'} 进行行动${onlineStatus}`, 'info');
@@ -2526,10 +2574,13 @@ function startNightChoicePolling(playerId, nightIndex) {
     };
     
     poll();
-    nightChoicePollingTimer = setInterval(poll, 2000);
+    const fallback = () => { nightChoicePollingTimer = setInterval(poll, 2000); };
+    if (startActionWait('night', playerId, poll, fallback)) return;
+    fallback();
 }
 
 function stopNightChoicePolling() {
+    cancelActionWait('night');
     if (nightChoicePollingTimer) {
         clearInterval(nightChoicePollingTimer);
         nightChoicePollingTimer = null;
@@ -2733,6 +2784,7 @@ async function notifySlayerAction(slayerId) {
     });
     
     if (result.success) {
+        rememberPendingAction(slayerId, result);
         showToast(`已通知 ${slayerPlayer.name} 进行杀手行动`);
         // 开始轮询玩家选择
         startPollingSlayerChoice(slayerId);
@@ -2768,6 +2820,7 @@ function startPollingSlayerChoice(slayerId) {
         }
     };
     
+    if (startActionWait('slayer', slayerId, poll, () => { slayerChoicePollingInterval = setInterval(poll, 2000); })) return;
     slayerChoicePollingInterval = setInterval(poll, 2000);
     
     // 5分钟后停止
@@ -3395,7 +3448,7 @@ function renderNominations() {
                 ${nom.status === 'virgin_triggered' ? 
                     '<span style="color: var(--color-blood); font-size: 0.85rem;">⚡ 贞洁者能力触发</span>' :
                     `<span class="vote-count-badge">${nom.vote_count} 票</span>
-                    ${nom.status === 'pending' ? `<button class="btn btn-secondary" style="padding: 4px 8px; font-size: 0.8rem;" onclick="openVoteModal(${nom.id})">投票</button>` : ''}`
+                    ${nom.status === 'pending' || nom.status === 'voting' ? `<button class="btn btn-secondary" style="padding: 4px 8px; font-size: 0.8rem;" onclick="openVoteModal(${nom.id})">投票</button>` : ''}`
                 }
             </div>
         </div>
@@ -4161,6 +4214,7 @@ async function notifyPlayerAction(playerId, actionType, roleId = null) {
     });
     
     if (result.success) {
+        rememberPendingAction(playerId, result);
         showToast(`已通知 ${player.name} 进行行动选择`);
         
         // 开始轮询玩家的选择
@@ -4250,7 +4304,8 @@ function startPollingPlayerChoice(playerId) {
         }
     };
     
-    // 每2秒检查一次
+    // 已通知的行动直接等待提交；否则每2秒检查一次
+    if (startActionWait('player', playerId, poll, () => { playerChoicePollingInterval = setInterval(poll, 2000); })) return;
     playerChoicePollingInterval = setInterval(poll, 2000);
     
     // 10分钟后自动停止轮询
@@ -21,6 +21,8 @@ const playerState = {
     hasVoteToken: true,
     pollInterval: null,
     heartbeatInterval: null,
+    eventSource: null,
+    lastMessageSeq: 0,
     messages: [],
     nightAction: null,
     playerChoice: null,
@@ -353,6 +355,7 @@ function updateRoleCard() {
 function startPolling() {
     playerState.pollInterval = setInterval(pollGameState, 2000);
     pollGameState();
+    startEventStream();
 }
 
 function stopPolling() {
@@ -360,6 +363,23 @@ function stopPolling() {
         clearInterval(playerState.pollInterval);
         playerState.pollInterval = null;
     }
+    if (playerState.eventSource) {
+        playerState.eventSource.close();
+        playerState.eventSource = null;
+    }
+}
+
+// 更新日期: 2026-10-19 - 服务器推送（SSE），消息即时到达；轮询仍作为兜底
+function startEventStream() {
+    if (playerState.eventSource || typeof EventSource === 'undefined') return;
+    playerState.eventSource = new EventSource(`/api/player/events/${playerState.gameId}/${playerState.playerId}`);
+    playerState.eventSource.onmessage = (event) => {
+        try {
+            handleWebSocketMessage(JSON.parse(event.data));
+        } catch (e) {
+            console.error('推送消息解析失败:', e);
+        }
+    };
 }
 
 function startHeartbeat() {
@@ -466,6 +486,11 @@ async function pollGameState() {
 
 function handleNewMessages(messages) {
     messages.forEach(msg => {
+        // 推送与轮询可能送达同一条消息，按序号去重
+        if (msg.seq) {
+            if (msg.seq <= playerState.lastMessageSeq) return;
+            playerState.lastMessageSeq = msg.seq;
+        }
         if (!msg.read) {
             if (msg.type === 'night_result' || msg.type === 'info') {
                 displayMessageInNightPanel(msg);
@@ -1699,8 +1724,9 @@ function selectTargetByName(name) {
 // 在收到说书人信息时自动朗读
 const originalHandleNewMessages = handleNewMessages;
 handleNewMessages = function(messages) {
+    const fresh = messages.filter(msg => !msg.seq || msg.seq > playerState.lastMessageSeq);
     originalHandleNewMessages(messages);
-    messages.forEach(msg => {
+    fresh.forEach(msg => {
         if (msg.type === 'night_result' || msg.type === 'info') {
             if (voiceState.ttsEnabled) {
                 const plainText = msg.content.replace(/<[^>]*>/g, '');
@@ -1802,9 +1828,21 @@ function handleWebSocketMessage(data) {
                 showPendingAction(data.action);
             }
             break;
+        case 'night_turn':
+            // 夜间流程推进：立即拉取状态判断是否轮到自己
+            pollGameState();
+            break;
+        case 'vote':
+            // 实时票数：立即拉取状态刷新投票面板
+            pollGameState();
+            break;
         case 'message':
             if (data.player_id === playerState.playerId) {
                 handleNewMessages([data.message]);
+            } else if (data.player_ids && data.player_ids.includes(playerState.playerId)) {
+                // 群发：共享消息体 + 每位接收者自己的序号
+                const seq = data.seqs[playerState.playerId];
+                handleNewMessages([{ ...data.message, id: `msg_${seq}`, seq, read: false }]);
             }
             break;
         case 'game_end':
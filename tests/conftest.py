@@ -0,0 +1,11 @@
+"""
+血染钟楼 - 测试公共配置
+更新日期: 2026-10-19
+
+把仓库根目录加入导入路径，直接运行 pytest 时也能导入 clocktower 与 Web 模块。
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
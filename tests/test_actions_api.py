@@ -0,0 +1,51 @@
+"""待处理行动接口：按对局校验行动归属"""
+
+import pytest
+
+import main
+from clocktower import Game
+
+
+@pytest.fixture
+def client():
+    main.games.clear()
+    yield main.app.test_client()
+    main.games.clear()
+
+
+def _game(seed):
+    game = Game(f"game_actions_{seed}", "trouble_brewing", 5, seed=seed)
+    game.assign_roles_randomly([f"p{i}" for i in range(5)])
+    main.games[game.game_id] = game
+    return game.game_id
+
+
+def _notify(client, game_id):
+    return client.post('/api/storyteller/notify_action', json={
+        "game_id": game_id, "player_id": 1, "action_type": "night_action", "action_config": {}
+    }).get_json()["pending_action"]["action_id"]
+
+
+def test_wait_and_cancel_are_scoped_to_the_owning_game(client):
+    game_a = _game(1)
+    game_b = _game(2)
+    action_id = _notify(client, game_a)
+
+    assert client.get(f'/api/storyteller/{game_b}/actions/{action_id}/wait?timeout=0').status_code == 404
+    assert client.post(f'/api/storyteller/{game_b}/actions/{action_id}/cancel').status_code == 404
+    assert main.games[game_a].pending_actions[1]["status"] == "pending"
+
+    waited = client.get(f'/api/storyteller/{game_a}/actions/{action_id}/wait?timeout=0').get_json()
+    assert waited["done"] is False
+
+    cancelled = client.post(f'/api/storyteller/{game_a}/actions/{action_id}/cancel').get_json()
+    assert cancelled["status"] == "cancelled"
+    waited = client.get(f'/api/storyteller/{game_a}/actions/{action_id}/wait?timeout=0').get_json()
+    assert waited["done"] is True
+
+
+def test_unknown_game_or_action_is_not_found(client):
+    game_a = _game(1)
+    _notify(client, game_a)
+    assert client.get('/api/storyteller/missing/actions/act_1/wait?timeout=0').status_code == 404
+    assert client.get(f'/api/storyteller/{game_a}/actions/act_missing/wait?timeout=0').status_code == 404
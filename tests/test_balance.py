@@ -0,0 +1,38 @@
+"""配置推荐：排名缓存与并发去重"""
+
+import threading
+import time
+
+from clocktower import balance
+
+
+def test_top_n_is_sliced_from_one_cached_ranking():
+    balance.clear_cache()
+    kwargs = dict(method="heuristic", candidates=30, effect_games=20, workers=1, seed=7)
+    first = balance.suggest_setups("trouble_brewing", 7, top_n=3, **kwargs)
+    more = balance.suggest_setups("trouble_brewing", 7, top_n=8, **kwargs)
+    assert not first["cached"] and more["cached"]
+    assert len(first["setups"]) == 3 and len(more["setups"]) == 8
+    assert more["setups"][:3] == first["setups"]
+
+
+def test_concurrent_requests_compute_once(monkeypatch):
+    balance.clear_cache()
+    calls = []
+
+    def slow_rank(*args):
+        calls.append(args)
+        time.sleep(0.2)
+        return [{"role_ids": ["imp"]}]
+
+    monkeypatch.setattr(balance, "_rank_setups", slow_rank)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        balance.suggest_setups("trouble_brewing", 7, top_n=1, method="heuristic"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(r["cached"] for r in results) == [False, True, True, True]
+    balance.clear_cache()
@@ -0,0 +1,55 @@
+"""群发消息：接收者去重、ID 校验与消息体字节统计"""
+
+from clocktower import Game
+from clocktower.events import bus
+from clocktower.game import MESSAGE_REF_BYTES, _message_size
+from clocktower.mailbox import MAILBOX_CAPACITY
+
+
+def _game():
+    game = Game("broadcast_test", "trouble_brewing", 7, seed=1)
+    game.assign_roles_manually([{"name": f"p{i + 1}", "role_id": role_id} for i, role_id in enumerate(
+        ["imp", "poisoner", "butler", "chef", "empath", "monk", "soldier"])])
+    return game
+
+
+def test_duplicate_player_ids_deliver_once():
+    game = _game()
+    subscription = bus.subscribe(game.game_id, 3)
+    try:
+        result = game.broadcast("你好", player_ids=[3, 3, 4])
+        assert result["success"]
+        assert result["recipients"] == [3, 4]
+        assert len(game.get_mailbox(3)) == 1
+        event = subscription.get(timeout=1)
+        assert event["player_ids"] == [3, 4]
+        assert subscription.get(timeout=0.05) is None
+    finally:
+        subscription.close()
+
+
+def test_unknown_player_ids_are_rejected():
+    game = _game()
+    result = game.broadcast("你好", player_ids=[3, 99])
+    assert not result["success"]
+    assert result["unknown_player_ids"] == [99]
+    assert len(game.get_mailbox(3)) == 0
+    assert not game.broadcast("你好", player_ids="3")["success"]
+
+
+def test_shared_body_is_counted_once():
+    game = _game()
+    result = game.broadcast("邪恶阵营互认", group="evil")
+    body = _message_size(game.get_mailbox(1)._ring[0][1])
+    assert len(result["recipients"]) == 2
+    assert game.message_bytes == body + 2 * MESSAGE_REF_BYTES
+
+    # 一个信箱挤出后只扣引用；所有引用都被挤出才扣消息体
+    for _ in range(MAILBOX_CAPACITY):
+        game.send_message(1, "x")
+    single = _message_size(game.get_mailbox(1)._ring[0][1]) + MESSAGE_REF_BYTES
+    assert game.message_bytes == body + MESSAGE_REF_BYTES + MAILBOX_CAPACITY * single
+    for _ in range(MAILBOX_CAPACITY):
+        game.send_message(2, "x")
+    assert game.message_bytes == 2 * MAILBOX_CAPACITY * single
+    assert game.broadcast_refs == {}
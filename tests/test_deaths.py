@@ -0,0 +1,134 @@
+"""死亡结算流水线：恶魔夜袭免死、镇长替死、圣徒被处决、红唇女郎继承"""
+
+from clocktower import Game, build_player_view
+from clocktower.deaths import hooks_in_play
+
+
+def _game(script_id, roles, seed=1):
+    game = Game(f"deaths_{script_id}", script_id, len(roles), seed=seed)
+    game.assign_roles_manually([{"name": f"p{i + 1}", "role_id": role_id} for i, role_id in enumerate(roles)])
+    game.start_night()
+    return game
+
+
+def _alive(game, player_id):
+    return game.players[player_id - 1]["alive"]
+
+
+TB = ["imp", "poisoner", "soldier", "monk", "mayor", "chef", "saint"]
+
+
+def test_hooks_only_for_roles_in_play():
+    game = _game("trouble_brewing", TB)
+    hooks = hooks_in_play(game.role_table, game.roles_in_play)
+    assert hooks is game._death_hooks
+    assert {hook.role_id for hook in hooks["attack"]} == {"soldier", "mayor"}
+    assert [hook.role_id for hook in hooks["died"]] == ["saint"]
+    assert "dying" not in hooks
+
+
+def test_soldier_survives_demon_attack_unless_poisoned():
+    game = _game("trouble_brewing", TB)
+    game.record_night_action(1, "击杀", 3, action_type="kill")
+    game.start_day()
+    assert _alive(game, 3)
+
+    game.start_night()
+    game.players[2]["poisoned"] = True
+    game.record_night_action(1, "击杀", 3, action_type="kill")
+    game.start_day()
+    assert not _alive(game, 3)
+
+
+def test_monk_protects_target():
+    game = _game("trouble_brewing", TB)
+    game.record_night_action(4, "保护", 6, action_type="protect")
+    game.record_night_action(1, "击杀", 6, action_type="kill")
+    game.start_day()
+    assert _alive(game, 6)
+
+
+def test_tea_lady_protects_good_alive_neighbours():
+    game = _game("bad_moon_rising", ["po", "gambler", "tea_lady", "sailor", "godfather", "chambermaid"])
+    game.record_night_action(1, "击杀", 4, action_type="kill")
+    game.start_day()
+    assert _alive(game, 4)
+
+    # 茶艺师中毒时不再保护
+    game.start_night()
+    game.players[2]["poisoned"] = True
+    game.record_night_action(1, "击杀", 4, action_type="kill")
+    game.start_day()
+    assert not _alive(game, 4)
+
+
+def test_tea_lady_needs_both_neighbours_good():
+    game = _game("bad_moon_rising", ["po", "godfather", "tea_lady", "sailor", "gambler", "chambermaid"])
+    game.record_night_action(1, "击杀", 4, action_type="kill")
+    game.start_day()
+    assert not _alive(game, 4)
+
+
+def test_mayor_bounce_chosen_at_night_kills_substitute():
+    game = _game("trouble_brewing", TB)
+    game.record_night_action(1, "击杀", 5, action_type="kill")
+    assert game.process_mayor_death(6)["id"] == 6
+    game.start_day()
+    assert _alive(game, 5)
+    assert not _alive(game, 6)
+    assert game.night_deaths[0]["cause"] == "镇长替死"
+
+
+def test_mayor_dies_when_storyteller_declines_bounce():
+    game = _game("trouble_brewing", TB)
+    game.record_night_action(1, "击杀", 5, action_type="kill")
+    assert game.process_mayor_death(None) is None
+    game.start_day()
+    assert not _alive(game, 5)
+
+
+def _execute(game, nominee_id):
+    nomination = game.nominate(3, nominee_id)["nomination"]
+    for voter_id in (1, 2, 4, 5):
+        game.vote(nomination["id"], voter_id, True)
+    return game.execute(nomination["id"])
+
+
+def test_saint_execution_ends_game_for_evil():
+    game = _game("trouble_brewing", TB)
+    game.start_day()
+    result = _execute(game, 7)
+    assert result["executed"] and result["saint_executed"]
+    assert result["game_end"]["winner"] == "evil"
+
+
+def test_poisoned_saint_execution_does_not_end_game():
+    game = _game("trouble_brewing", TB)
+    game.start_day()
+    game.players[6]["poisoned"] = True
+    result = _execute(game, 7)
+    assert result["executed"]
+    assert "game_end" not in result
+
+
+SW = ["imp", "scarlet_woman", "soldier", "monk", "mayor", "chef", "saint"]
+
+
+def test_scarlet_woman_promoted_when_demon_is_executed():
+    game = _game("trouble_brewing", SW)
+    game.start_day()
+    result = _execute(game, 1)
+    assert result["executed"] and result["scarlet_woman_triggered"]
+    assert result["new_demon_name"] == "p2"
+    assert game.players[1]["role_type"] == "demon"
+    assert not game.check_game_end()["ended"]
+
+
+def test_game_end_check_and_views_do_not_promote():
+    game = _game("trouble_brewing", SW)
+    game.start_day()
+    game.players[0]["alive"] = False
+    build_player_view(game, game.players[2])
+    assert game.check_game_end()["winner"] == "good"
+    assert game.players[1]["role"]["id"] == "scarlet_woman"
+    assert game.players[1]["role_type"] == "minion"
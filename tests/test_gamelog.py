@@ -0,0 +1,78 @@
+"""结构化日志：渲染结果与并发读取"""
+
+import threading
+
+from clocktower.gamelog import GameLog
+
+PLAYERS = [{"id": 1, "name": "甲"}, {"id": 2, "name": "乙"}]
+
+
+def test_render_templates_and_type_filter():
+    log = GameLog()
+    log.append("phase.night", (1,))
+    log.append("night.kill", (1, 2))
+    log.append("night.kill", (1, 99))
+    log.append_text("说书人备注", "info")
+
+    messages = [e["message"] for e in log.render(PLAYERS)]
+    assert messages == ["第 1 个夜晚开始", "[夜间] 甲 选择击杀 乙", "[夜间] 甲 选择击杀 未知", "说书人备注"]
+    assert [e["message"] for e in log.render(PLAYERS, types=frozenset(["phase"]))] == ["第 1 个夜晚开始"]
+    assert log.query(event_id="night.kill")[0]["args"] == {"player": 1, "target": 2}
+
+
+def test_returned_snapshot_is_not_mutated_by_later_renders():
+    log = GameLog()
+    log.append("phase.day", (1,))
+    first = log.render(PLAYERS)
+    log.append("phase.night", (2,))
+    second = log.render(PLAYERS)
+    assert len(first) == 1
+    assert len(second) == 2
+
+
+def test_concurrent_renders_keep_every_entry_exactly_once():
+    for _ in range(20):
+        log = GameLog()
+        done = threading.Event()
+
+        def reader():
+            while not done.is_set():
+                log.render(PLAYERS)
+
+        readers = [threading.Thread(target=reader) for _ in range(3)]
+        for thread in readers:
+            thread.start()
+        for i in range(300):
+            log.append_text(str(i), "info")
+        done.set()
+        for thread in readers:
+            thread.join()
+        assert [e["message"] for e in log.render(PLAYERS)] == [str(i) for i in range(300)]
+
+
+def test_every_event_has_a_template_with_matching_fields():
+    import string
+
+    from clocktower.gamelog import LOG_EVENTS, LOG_TEMPLATES
+
+    for locale, templates in LOG_TEMPLATES.items():
+        for event_id, (_, fields) in LOG_EVENTS.items():
+            used = {name for _, name, _, _ in string.Formatter().parse(templates[event_id]) if name}
+            assert used <= set(fields), (locale, event_id)
+
+
+def test_role_bool_and_list_fields_render_by_name():
+    log = GameLog()
+    log.append("night.demon_kill", (1, "po", 2))
+    log.append("status.updated", (2, "poisoned", True))
+    log.append("player.choice", (1, "fortune_teller", (1, 2)))
+    log.append("setup.outsider_modifier", ("baron", 2, -2))
+
+    messages = [e["message"] for e in log.render(PLAYERS)]
+    assert messages == [
+        "[夜间] 甲 (珀) 选择击杀 乙",
+        "更新 乙 的 poisoned 状态为 是",
+        "[玩家选择] 甲 (占卜师) 选择了 甲、乙",
+        "男爵在场：外来者 +2，镇民 -2",
+    ]
+    assert log.query(event_id="night.demon_kill")[0]["args"] == {"player": 1, "role": "po", "target": 2}
@@ -0,0 +1,124 @@
+"""一致性世界求解器与信息生成的求解器使用"""
+
+from clocktower import Game
+from clocktower.info_solver import WorldSolver, seat_mask
+
+
+def test_world_count_on_fixed_seating():
+    # 5 个座位、1 个爪牙、观察者坐 0 号：恶魔 4 种 × 爪牙 3 种
+    solver = WorldSolver(5, 1, observer_seat=0)
+    assert solver.world_count == 12
+    assert all(not world[1] & 1 for world in solver.worlds)
+
+
+def test_constraints_prune_worlds():
+    solver = WorldSolver(5, 1, observer_seat=0)
+    solver.apply(("evil_count", seat_mask([1, 4]), 0))
+    # 邪恶玩家只能坐在 2、3 号
+    assert solver.world_count == 2
+    assert solver.support("demon_in", seat_mask([2])) == {True: 1, False: 1}
+    assert solver.consistent(("minion_in", seat_mask([3]), True))
+    assert not solver.consistent(("minion_in", seat_mask([1]), True))
+
+    # 占卜师“否”：3 号不是恶魔，且红鲱鱼不在 3 号
+    solver.apply(("demon_in", seat_mask([3]), False))
+    assert solver.world_count == 1
+    demon_bit, evil, minion, red_herring = solver.worlds[0]
+    assert (demon_bit, minion) == (1 << 2, 1 << 3)
+    assert not red_herring & seat_mask([3])
+
+
+def test_fortune_teller_yes_narrows_red_herring():
+    solver = WorldSolver(5, 1, observer_seat=0)
+    solver.apply(("evil_count", seat_mask([1, 4]), 0))
+    # “是”可以由红鲱鱼解释：世界数不变，但恶魔不在目标中的世界只剩目标作为红鲱鱼
+    solver.apply(("demon_in", seat_mask([1]), True))
+    assert solver.world_count == 2
+    assert all(world[3] == seat_mask([1]) for world in solver.worlds)
+
+
+def test_recluse_keeps_misregistered_worlds():
+    # 陌客坐 1 号：共情者看到 1 号邪恶时，也可以是陌客被误认为邪恶
+    solver = WorldSolver(5, 1, observer_seat=0, recluse_mask=seat_mask([1]))
+    solver.apply(("evil_count", seat_mask([1]), 1))
+    assert solver.world_count == 12
+
+
+def test_sync_reapplies_only_when_history_changes():
+    solver = WorldSolver(5, 1, observer_seat=0)
+    first = ("evil_count", seat_mask([1, 4]), 0)
+    solver.sync([first])
+    assert solver.world_count == 2
+    solver.sync([first, ("minion_in", seat_mask([3]), True)])
+    assert solver.world_count == 1
+    solver.sync([("evil_count", seat_mask([1, 4]), 2)])
+    assert solver.applied == [("evil_count", seat_mask([1, 4]), 2)]
+    assert solver.world_count == 2
+
+
+def _game():
+    game = Game("solver_test", "trouble_brewing", 7, seed=3)
+    game.assign_roles_manually([{"name": f"p{i + 1}", "role_id": role_id} for i, role_id in enumerate(
+        ["empath", "imp", "poisoner", "washerwoman", "chef", "investigator", "monk"])])
+    game.start_night()
+    return game
+
+
+def test_role_partitions_cached_until_invalidated():
+    game = _game()
+    partitions = game._get_role_partitions()
+    assert game._get_role_partitions() is partitions
+    assert [p["id"] for p in partitions["minion"]] == [3]
+
+    game.set_player_role(game.players[3], game._find_role_by_id("baron"), "minion")
+    partitions = game._get_role_partitions()
+    assert [p["id"] for p in partitions["minion"]] == [3, 4]
+
+    game.invalidate_targets()
+    assert game._get_role_partitions() is not partitions
+
+
+def test_solver_skipped_when_only_one_legal_result():
+    game = _game()
+    game.generate_info(1, "empath")
+    game.generate_info(6, "investigator")
+    assert game._world_solvers == {}
+    assert len(game.info_history[1]) == 1
+
+    game.players[0]["poisoned"] = True
+    info = game.generate_info(1, "empath")
+    assert 1 in game._world_solvers
+    assert "consistent_false_results" in info
+
+
+def _fortune_teller_game(seed, told):
+    """占卜师坐 0 号；told 为此前各夜（每夜一条）告知的“否”结果的目标"""
+    game = Game("solver_ft_test", "trouble_brewing", 7, seed=seed)
+    game.assign_roles_manually([{"name": f"p{i + 1}", "role_id": role_id} for i, role_id in enumerate(
+        ["fortune_teller", "recluse", "chef", "washerwoman", "poisoner", "imp", "monk"])])
+    game.players[0].pop("red_herring_id", None)
+    for targets in told:
+        game.start_night()
+        assert game.record_told_info(1, False, targets=targets)["success"]
+        game.start_day()
+    game.start_night()
+    return game
+
+
+def test_sober_recluse_result_is_consistent_with_earlier_info():
+    # 此前告知 3/4 号、5/6 号座位中都没有恶魔：恶魔只能在 1、2 号座位（陌客、厨师）
+    for seed in range(6):
+        game = _fortune_teller_game(seed, [[4, 5], [6, 7]])
+        info = game.generate_info(1, "fortune_teller", targets=[2, 3])
+        assert info["has_demon"] is True
+        assert 1 in game._world_solvers
+
+
+def test_drunk_fortune_teller_falls_back_to_consistent_result():
+    # 此前告知 1/3 号、4/6 号座位中都没有恶魔：恶魔只能在 2、5 号座位，“没有”与此前信息矛盾
+    for seed in range(6):
+        game = _fortune_teller_game(seed, [[2, 4], [5, 7]])
+        game.players[0]["poisoned"] = True
+        info = game.generate_info(1, "fortune_teller", targets=[6, 3])
+        assert info["has_demon"] is True
+        assert info["is_drunk_or_poisoned"]
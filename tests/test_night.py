@@ -0,0 +1,33 @@
+"""夜间行动配置与按数据依赖分类"""
+
+from clocktower import Game, classify_night_order, get_night_action_config
+from clocktower import night
+
+
+def _game():
+    game = Game("night_test", "trouble_brewing", 7, seed=1)
+    game.assign_roles_manually([{"name": f"p{i + 1}", "role_id": role_id} for i, role_id in enumerate(
+        ["spy", "monk", "fortune_teller", "imp", "chef", "empath", "butler"])])
+    game.start_night()
+    return game
+
+
+def _order(game, *player_ids):
+    return [{"player": game.players[pid - 1], "role": game.players[pid - 1]["role"]} for pid in player_ids]
+
+
+def test_config_records_target_kind():
+    game = _game()
+    assert get_night_action_config("monk", "townsfolk", game, 2)["target_kind"] == "alive"
+    assert get_night_action_config("fortune_teller", "townsfolk", game, 3)["target_kind"] == "all"
+    assert get_night_action_config("empath", "townsfolk", game, 6)["target_kind"] is None
+
+
+def test_alive_targets_depend_on_alive_writes_even_when_everyone_lives(monkeypatch):
+    game = _game()
+    # 首步只改变存活名单：按存活选目标的僧侣依赖它，占卜师（可选全部玩家）不依赖
+    monkeypatch.setattr(night, "_action_writes", lambda item, action_type: {"alive"} if item["role"]["id"] == "spy" else set())
+    entries = classify_night_order(game, _order(game, 1, 2, 3))
+    assert [entry["kind"] for entry in entries] == ["storyteller", "choice", "choice"]
+    assert entries[1]["depends_on"] == [0]
+    assert entries[2]["depends_on"] == []
@@ -0,0 +1,56 @@
+"""不可变角色与 encode_json"""
+
+import json
+
+import pytest
+
+from clocktower import Game
+from clocktower.game_data import SCRIPTS
+from clocktower.roles import Role, encode_json
+
+
+def _imp():
+    return next(r for r in SCRIPTS["trouble_brewing"]["roles"]["demon"] if r["id"] == "imp")
+
+
+def test_role_is_immutable_and_shared():
+    imp = _imp()
+    assert isinstance(imp, Role)
+    with pytest.raises(TypeError):
+        imp["name"] = "x"
+    with pytest.raises(AttributeError):
+        imp.extra = 1
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_encode_json_matches_plain_dumps(ensure_ascii):
+    imp = _imp()
+    payload = {"players": [{"id": 1, "role": imp}, {"id": 2, "role": imp}], "name": "魔典"}
+    plain = {"players": [{"id": 1, "role": dict(imp)}, {"id": 2, "role": dict(imp)}], "name": "魔典"}
+    encoded = encode_json(payload, ensure_ascii=ensure_ascii, sort_keys=True, separators=(",", ":"))
+    assert encoded == json.dumps(plain, ensure_ascii=ensure_ascii, sort_keys=True, separators=(",", ":"))
+
+
+@pytest.mark.parametrize("marker", [
+    "\x00role:0\x00",
+    "\x00role:5\x00",
+    "\x00role:0123456789abcdef:0\x00",
+    "\x00role:0123456789abcdef:99\x00",
+])
+def test_user_text_resembling_placeholder_round_trips(marker):
+    imp = _imp()
+    payload = {"name": marker, "role": imp, "notes": [marker, marker + "x"]}
+    decoded = json.loads(encode_json(payload))
+    assert decoded == {"name": marker, "role": dict(imp), "notes": [marker, marker + "x"]}
+
+
+def test_imp_starpass_uses_script_role():
+    game = Game("starpass_test", "trouble_brewing", 5, seed=2)
+    game.assign_roles_manually([{"name": f"p{i + 1}", "role_id": role_id} for i, role_id in enumerate(
+        ["imp", "poisoner", "chef", "empath", "monk"])])
+    game.start_night()
+    game.process_imp_suicide(1)
+    new_imp = game.players[1]
+    assert new_imp["role"] is game._find_role_by_id("imp")
+    assert new_imp["role"]["ability"]
+    assert game.roles_in_play == game.role_table.mask_of(["imp", "chef", "empath", "monk"])
@@ -0,0 +1,99 @@
+"""夜间流程器：中止后不再修改对局；与请求线程共用对局锁"""
+
+import copy
+import time
+
+import main
+from clocktower import Game
+from clocktower.sequencer import start_night_sequencer, stop_night_sequencer
+
+
+def _night_game():
+    game = Game("seq_test", "trouble_brewing", 8, seed=5)
+    game.assign_roles_randomly([f"p{i}" for i in range(8)])
+    game.start_night()
+    return game
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_stop_joins_thread_before_returning():
+    game = _night_game()
+    sequencer = start_night_sequencer(game, confirm="all", step_timeout=0.1)
+    assert _wait_for(lambda: sequencer.status == "awaiting_confirmation")
+
+    stop_night_sequencer(game)
+    assert not sequencer._thread.is_alive()
+    assert sequencer.status == "stopped"
+    assert game.current_night_index == len(sequencer.order)
+    assert all(action["status"] != "pending" for action in game.pending_actions.values())
+
+    # 中止后进入白天：线程不再写入轮次、行动或日志
+    log_size = len(game.game_log)
+    actions = dict(game.pending_actions)
+    game.start_day()
+    time.sleep(0.1)
+    assert game.current_phase == "day"
+    assert game.pending_actions == actions
+    assert len(game.game_log) == log_size + 1
+
+
+def test_confirmation_after_stop_is_rejected():
+    game = _night_game()
+    sequencer = start_night_sequencer(game, confirm="all", step_timeout=0.1)
+    assert _wait_for(lambda: sequencer.status == "awaiting_confirmation")
+    stop_night_sequencer(game)
+    nights = len(game.night_actions)
+    assert not sequencer.confirm_step()
+    assert len(game.night_actions) == nights
+
+
+def test_manual_night_action_during_active_sequence():
+    game = Game("seq_lock_test", "trouble_brewing", 8, seed=5)
+    game.assign_roles_manually([{"name": f"p{i + 1}", "role_id": role_id} for i, role_id in enumerate(
+        ["imp", "poisoner", "monk", "washerwoman", "chef", "empath", "butler", "saint"])])
+    game.start_night()
+    main.games.clear()
+    main.games[game.game_id] = game
+    client = main.app.test_client()
+    try:
+        sequencer = start_night_sequencer(game, confirm="all", step_timeout=0.1)
+        assert _wait_for(lambda: sequencer.status == "awaiting_confirmation")
+        first = sequencer.order[0]["player"]["id"]
+
+        # 请求期间持有对局锁：确认后的自动结算要等手动行动写完才进行
+        with game.lock:
+            assert sequencer.confirm_step()
+            time.sleep(0.2)
+            assert game.night_actions == []
+            response = client.post(f'/api/game/{game.game_id}/night_action', json={
+                "player_id": 1, "action": "击杀", "target": 8, "action_type": "kill"})
+            assert response.get_json()["success"]
+            assert [a["player_id"] for a in game.night_actions] == [1]
+
+        assert _wait_for(lambda: len(game.night_actions) >= 2)
+        assert [a["player_id"] for a in game.night_actions[:2]] == [1, first]
+
+        # 持锁中止不会空等流程线程
+        started = time.time()
+        with game.lock:
+            client.post(f'/api/game/{game.game_id}/night_sequencer/stop')
+        assert time.time() - started < 1
+        assert sequencer.join(1)
+    finally:
+        stop_night_sequencer(game)
+        main.games.clear()
+
+
+def test_game_deepcopy_gets_its_own_lock():
+    game = _night_game()
+    clone = copy.deepcopy(game)
+    assert clone.lock is not game.lock
+    with clone.lock:
+        assert game.lock.acquire(blocking=False)
+        game.lock.release()
@@ -0,0 +1,41 @@
+"""服务器统计：在线状态按 (游戏ID, 玩家ID) 记录，读取时解析玩家"""
+
+import server_stats
+from clocktower import Game
+from server_stats import PRESENCE_TIMEOUT, ServerStats
+
+
+def _setup():
+    game = Game("stats_test", "trouble_brewing", 5, seed=1)
+    game.assign_roles_randomly([f"p{i + 1}" for i in range(5)])
+    games = {game.game_id: game}
+    return games, game, ServerStats(10, games)
+
+
+def test_presence_follows_reassigned_players(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(server_stats.time, "monotonic", lambda: now[0])
+    games, game, stats = _setup()
+    stats.touch(game.game_id, game.players[0])
+
+    # 重新分配角色换掉了玩家字典；心跳过期时清除的是当前的玩家
+    game.assign_roles_randomly([f"q{i + 1}" for i in range(5)])
+    stats.touch(game.game_id, game.players[0])
+    assert game.players[0]["connected"]
+    assert stats.online_ids(game.game_id) == {1}
+
+    now[0] += PRESENCE_TIMEOUT + 1
+    assert stats.online_ids(game.game_id) == set()
+    assert not game.players[0]["connected"]
+
+
+def test_leave_clears_current_player():
+    games, game, stats = _setup()
+    stats.touch(game.game_id, game.players[1])
+    game.assign_roles_randomly([f"q{i + 1}" for i in range(5)])
+    game.players[1]["connected"] = True
+
+    stats.disconnect(game.game_id, 2)
+    assert not stats.is_online(game.game_id, 2)
+    assert not game.players[1]["connected"]
+    assert stats.snapshot(len(games))["online_players"] == 0
@@ -0,0 +1,122 @@
+"""投票账本与当天提名索引"""
+
+from clocktower import Game, build_player_view
+from clocktower.events import bus
+
+
+def _day_game():
+    game = Game("votes_test", "trouble_brewing", 7, seed=1)
+    game.assign_roles_manually([{"name": f"p{i + 1}", "role_id": role_id} for i, role_id in enumerate(
+        ["imp", "poisoner", "butler", "chef", "empath", "monk", "soldier"])])
+    game.start_night()
+    game.record_night_action(3, "选择主人", 4, action_type="butler_master")
+    game.start_day()
+    return game
+
+
+def test_butler_cannot_vote_yes_without_master():
+    game = _day_game()
+    nomination = game.nominate(1, 6)["nomination"]
+    result = game.vote(nomination["id"], 3, True)
+    assert not result["success"]
+    assert "管家" in result["error"]
+    # 反对票不受限制；主人赞成后管家才能赞成
+    assert game.vote(nomination["id"], 4, True)["success"]
+    assert game.vote(nomination["id"], 3, True)["success"]
+    assert nomination["vote_count"] == 2
+
+
+def test_butler_yes_rejected_when_master_votes_no():
+    game = _day_game()
+    nomination = game.nominate(1, 6)["nomination"]
+    game.vote(nomination["id"], 4, False)
+    assert not game.vote(nomination["id"], 3, True)["success"]
+    assert game.vote(nomination["id"], 3, False)["success"]
+
+
+def test_dead_player_votes_yes_only_once():
+    game = _day_game()
+    game.set_player_alive(game.players[4], False)
+    first = game.nominate(1, 6)["nomination"]
+    assert game.vote(first["id"], 5, True)["success"]
+    assert game.players[4]["vote_token"] is False
+    # 同一提名不能重复投票
+    assert game.vote(first["id"], 5, True)["error"] == "该玩家已经投过票"
+
+    second = game.nominate(2, 7)["nomination"]
+    assert game.vote(second["id"], 5, True)["error"] == "该死亡玩家已经使用过投票令牌"
+    # 顺时针轮到时跳过已用过令牌的死亡玩家
+    for voter_id in (1, 2, 3, 4):
+        game.vote(second["id"], voter_id, False)
+    assert game.get_vote_ledger(second).next_voter()["id"] == 6
+
+
+def test_tie_leaves_no_one_on_the_block():
+    game = _day_game()
+    required = game.required_votes()
+    first = game.nominate(1, 6)["nomination"]
+    second = game.nominate(2, 7)["nomination"]
+    for voter_id in (1, 2, 4, 5):
+        game.vote(first["id"], voter_id, True)
+        game.vote(second["id"], voter_id, True)
+    assert first["vote_count"] == second["vote_count"] == required
+
+    leader = game.nomination_leader()
+    assert leader["tied"]
+    assert not leader["on_the_block"]
+
+    # 再多一票即打破平票
+    game.vote(second["id"], 6, True)
+    leader = game.nomination_leader()
+    assert leader["nomination_id"] == second["id"]
+    assert leader["on_the_block"]
+
+
+def test_tally_follows_clockwise_order():
+    game = _day_game()
+    nomination = game.nominate(1, 4)["nomination"]
+    ledger = game.get_vote_ledger(nomination)
+    assert [game.players[seat]["id"] for seat in ledger.clockwise_seats()] == [5, 6, 7, 1, 2, 3, 4]
+    game.vote(nomination["id"], 5, True)
+    game.vote(nomination["id"], 6, False)
+    summary = ledger.summary(game.required_votes())
+    assert (summary["yes"], summary["no"], summary["next_voter_id"]) == (1, 1, 7)
+
+
+
+def test_batch_butler_before_master_is_recorded_clockwise():
+    game = _day_game()
+    # 提名 2 号：顺时针从管家（3 号）开始，主人（4 号）在其后
+    nomination = game.nominate(1, 2)["nomination"]
+    result = game.vote_batch(nomination["id"], [True, None, True, True, False, None, None])
+    assert result["rejected"] == []
+    assert nomination["vote_count"] == 3
+    assert [v["voter_id"] for v in nomination["votes"]] == [3, 4, 5, 1]
+    assert game.game_log.query(event_id="vote.batch")[-1]["args"]["voters"] == (3, 4, 1)
+    assert game.get_vote_ledger(nomination).summary()["next_voter_id"] == 6
+
+def test_votes_push_live_tally_and_open_voting_panel():
+    game = _day_game()
+    subscription = bus.subscribe(game.game_id, 2)
+    try:
+        nomination = game.nominate(1, 6)["nomination"]
+        assert build_player_view(game, game.players[1])["active_nomination"]["id"] == nomination["id"]
+
+        game.vote(nomination["id"], 7, True)
+        assert nomination["status"] == "voting"
+        event = subscription.get(timeout=1)
+        assert event["type"] == "vote" and event["nomination_id"] == nomination["id"]
+        assert (event["tally"]["yes"], event["tally"]["next_voter_id"]) == (1, 1)
+
+        # 整轮记票只推送一次
+        game.vote_batch(nomination["id"], [True, True, None, None, None, None, None])
+        event = subscription.get(timeout=1)
+        assert event["tally"]["yes"] == 3
+        assert subscription.get(timeout=0.05) is None
+        view = build_player_view(game, game.players[1])
+        assert view["active_nomination"]["tally"]["yes"] == 3
+
+        game.execute(nomination["id"])
+        assert build_player_view(game, game.players[1])["active_nomination"] is None
+    finally:
+        subscription.close()
@@ -0,0 +1,265 @@
+"""
+血染钟楼 - 引擎热路径微基准测试
+更新日期: 2026-10-19
+
+覆盖玩家视角状态构建、夜间顺序、各类夜间行动记录、夜间击杀结算、天亮、处决、胜负判定、
+各角色信息生成、to_dict + JSON 编码，以及 5/10/16 人的随机分配角色。
+所有对局使用固定种子，结果可在不同提交之间对比。
+
+用法：
+    python tools/bench.py                       # 输出表格
+    python tools/bench.py --json after.json     # 同时写入 JSON
+    python tools/bench.py --compare before.json # 与之前的结果对比
+    python tools/bench.py --filter info         # 只运行名称包含 info 的项目
+"""
+
+import argparse
+import copy
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from clocktower import Game, SCRIPTS, build_player_view  # noqa: E402
+from clocktower.roles import encode_json  # noqa: E402
+
+
+SEED = 20261019
+INFO_ROLES = [
+    "washerwoman", "librarian", "investigator", "chef", "empath", "fortune_teller", "clockmaker",
+    "chambermaid", "seamstress", "dreamer", "undertaker", "ravenkeeper", "oracle", "flowergirl",
+]
+# 夜间行动类型 -> 执行该行动的角色
+NIGHT_ACTIONS = {
+    "protect": "monk",
+    "kill": "imp",
+    "poison": "poisoner",
+    "drunk": "courtier",
+    "sailor_drunk": "sailor",
+    "grandchild_select": "grandmother",
+    "butler_master": "butler",
+    "exorcist": "exorcist",
+    "devils_advocate": "devils_advocate",
+    "pukka_poison": "pukka",
+    "zombuul_kill": "zombuul",
+    "shabaloth_kill": "shabaloth",
+    "po_kill": "po",
+    "pit_hag": "pit_hag",
+    "info": "empath",
+    "skip": "monk",
+}
+
+
+def _script_of(role_id):
+    for script_id, script in SCRIPTS.items():
+        for roles in script["roles"].values():
+            if any(r["id"] == role_id for r in roles):
+                return script_id
+    raise KeyError(role_id)
+
+
+def make_game(player_count=10, script_id="trouble_brewing", require_roles=None, seed=SEED):
+    """构建一局已分配角色并进入首夜的游戏"""
+    game = Game("bench", script_id, player_count, seed=seed)
+    board = None
+    if require_roles:
+        board = [r["id"] for r in game.draw_board(require_roles=require_roles)[0]]
+    game.assign_roles_randomly([f"玩家{i + 1}" for i in range(player_count)], board=board)
+    game.start_night()
+    return game
+
+
+def make_role_game(player_count, role_id):
+    """构建一局包含指定角色的游戏（该人数没有对应类型的名额时，改用最接近的人数）"""
+    script_id = _script_of(role_id)
+    for count in sorted(range(5, 17), key=lambda c: abs(c - player_count)):
+        game = make_game(count, script_id, require_roles=[role_id])
+        if any((p.get("true_role") or p["role"])["id"] == role_id for p in game.players):
+            return game
+    raise ValueError(f"无法构建包含 {role_id} 的对局")
+
+
+def make_day_game(player_count=10, script_id="trouble_brewing"):
+    """构建一局进入白天、已有一次满票提名的游戏"""
+    game = make_game(player_count, script_id)
+    game.start_day()
+    nominee = next(p for p in game.players if p["role_type"] == "townsfolk" and p["role"]["id"] != "virgin")
+    nominator = next(p for p in game.players if p["id"] != nominee["id"] and p["role_type"] != "townsfolk")
+    nomination = game.nominate(nominator["id"], nominee["id"])["nomination"]
+    for p in game.players:
+        game.vote(nomination["id"], p["id"], True)
+    return game, nomination["id"]
+
+
+def player_with_role(game, role_id):
+    return next(p for p in game.players if (p.get("true_role") or p["role"])["id"] == role_id)
+
+
+# ==================== 计时 ====================
+
+def time_call(func, setup=None, repeat=7, number=None, budget=0.2):
+    """返回每次调用耗时（秒）的样本列表
+
+    没有 setup 时按块计时（每块 number 次取平均）；有 setup 时每次调用前重新准备状态，只计调用本身。
+    """
+    samples = []
+    if setup is None:
+        if number is None:
+            number = 1
+            while True:
+                started = time.perf_counter()
+                for _ in range(number):
+                    func()
+                if time.perf_counter() - started >= budget / repeat or number >= 1 << 20:
+                    break
+                number *= 2
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - started) / number)
+        return samples
+
+    count = number or 50
+    for _ in range(repeat * count):
+        state = setup()
+        started = time.perf_counter()
+        func(state)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+# ==================== 基准项目 ====================
+
+def build_benchmarks(player_count):
+    """返回 [(名称, 函数, setup)]"""
+    benches = []
+    base = make_game(player_count)
+    viewer = base.players[0]
+
+    benches.append(("build_player_view", lambda: build_player_view(base, viewer), None))
+    benches.append(("get_night_order", base.get_night_order, None))
+    benches.append(("check_game_end", base.check_game_end, None))
+    benches.append(("to_dict+json", lambda: encode_json(base.to_dict()), None))
+
+    for players in (5, 10, 16):
+        names = [f"玩家{i + 1}" for i in range(players)]
+        game = Game("bench", "trouble_brewing", players, seed=SEED)
+        benches.append((f"assign_roles_randomly[{players}]", lambda g=game, n=names: g.assign_roles_randomly(list(n)), None))
+
+    # 夜间行动（每次在全新的首夜副本上执行）
+    for action_type, role_id in NIGHT_ACTIONS.items():
+        game = make_role_game(player_count, role_id)
+        actor = player_with_role(game, role_id)
+        target = next(p for p in game.players if p["id"] != actor["id"] and p["alive"])
+        extra = None
+        if action_type == "pit_hag":
+            extra = {"new_role_id": next(r["id"] for r in game.script["roles"]["townsfolk"])}
+
+        def record(g, a=actor["id"], t=target["id"], at=action_type, ex=extra):
+            g.record_night_action(a, at, t, action_type=at, extra_data=ex)
+
+        benches.append((f"record_night_action[{action_type}]", record, lambda g=game: copy.deepcopy(g)))
+
+    # 夜间击杀结算与天亮
+    night = make_game(player_count)
+    demon = next(p for p in night.players if p["role_type"] == "demon")
+    victim = next(p for p in night.players if p["role_type"] == "townsfolk")
+    night.record_night_action(demon["id"], "kill", victim["id"], action_type="kill")
+    benches.append(("process_night_kills", lambda g: g.process_night_kills(), lambda: copy.deepcopy(night)))
+    benches.append(("start_day", lambda g: g.start_day(), lambda: copy.deepcopy(night)))
+
+    day, nomination_id = make_day_game(player_count)
+    benches.append(("execute", lambda g: g.execute(nomination_id), lambda: copy.deepcopy(day)))
+
+    # 信息生成（清醒与醉酒两种情况）
+    for role_id in INFO_ROLES:
+        game = make_role_game(player_count, role_id)
+        player = player_with_role(game, role_id)
+        targets = [p for p in game.players if p["id"] != player["id"]][:2]
+        method = getattr(game, f"_generate_{role_id}_info")
+        takes_targets = "target_players" in inspect.signature(method).parameters
+        for drunk in (False, True):
+            if takes_targets:
+                func = lambda m=method, p=player, t=targets, d=drunk: m(p, t, d)
+            else:
+                func = lambda m=method, p=player, d=drunk: m(p, d)
+            suffix = "[drunk]" if drunk else ""
+            benches.append((f"_generate_{role_id}_info{suffix}", func, None))
+
+    return benches
+
+
+def run(player_count=10, name_filter=None, repeat=7):
+    results = {}
+    for name, func, setup in build_benchmarks(player_count):
+        if name_filter and name_filter not in name:
+            continue
+        samples = time_call(func, setup, repeat=repeat)
+        results[name] = {
+            "samples": len(samples),
+            "mean_us": round(statistics.fmean(samples) * 1e6, 3),
+            "median_us": round(statistics.median(samples) * 1e6, 3),
+            "min_us": round(min(samples) * 1e6, 3),
+            "stdev_us": round(statistics.pstdev(samples) * 1e6, 3),
+        }
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="血染钟楼引擎微基准测试")
+    parser.add_argument("--players", type=int, default=10, help="基准对局的玩家人数")
+    parser.add_argument("--repeat", type=int, default=7, help="每项重复次数")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的项目")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比（按中位数）")
+    args = parser.parse_args(argv)
+
+    results = run(args.players, args.filter, args.repeat)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "players": args.players,
+            "seed": SEED,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+
+    print(f"{'项目':<52}{'中位数(us)':>14}{'最小(us)':>12}{'标准差':>10}" + ("{:>10}".format("对比") if baseline else ""))
+    for name, row in results.items():
+        line = f"{name:<52}{row['median_us']:>14}{row['min_us']:>12}{row['stdev_us']:>10}"
+        if name in baseline and baseline[name]["median_us"]:
+            line += f"{row['median_us'] / baseline[name]['median_us']:>9.2f}x"
+        print(line)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,432 @@
+"""
+血染钟楼 - 负载测试工具
+更新日期: 2026-10-19
+
+启动本地服务器（或连接已有服务器），模拟 N 张桌子的说书人与玩家客户端，通过真实 HTTP 接口：
+- 玩家端：加入游戏后每 2 秒轮询 game_state、每 5 秒发送心跳（与 player.js 一致）；
+- 说书人端：每 5 秒刷新玩家在线状态，夜间每 2 秒轮询 night_progress / player_choices（与 app.js 一致）；
+- 说书人推进流程：入夜、逐个记录夜间行动与生成信息、天亮、提名、投票、处决。
+
+统计每个路由的 p50/p95/p99 延迟、吞吐量和服务器常驻内存（RSS，读取 /proc）。
+
+用法：
+    python tools/loadtest.py --tables 5 --players 10 --duration 60
+    python tools/loadtest.py --url http://127.0.0.1:5000 --tables 3 --json result.json
+
+注意：服务器最多同时保留 10 局游戏，超出时会清除最早的游戏。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT_IDS = ["trouble_brewing", "bad_moon_rising", "sects_and_violets"]
+STATE_POLL_INTERVAL = 2.0      # player.js 状态轮询
+HEARTBEAT_INTERVAL = 5.0       # player.js 心跳
+STATUS_POLL_INTERVAL = 5.0     # app.js 玩家在线状态刷新
+NIGHT_POLL_INTERVAL = 2.0      # app.js 夜间选择轮询
+
+
+# ==================== 统计 ====================
+
+class Stats:
+    """按路由模板统计延迟与状态码"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+
+    def record(self, route, status, elapsed):
+        self.latencies.setdefault(route, []).append(elapsed)
+        codes = self.statuses.setdefault(route, {})
+        codes[status] = codes.get(status, 0) + 1
+
+    def error(self, route, message):
+        errors = self.errors.setdefault(route, {})
+        errors[message] = errors.get(message, 0) + 1
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        routes = {}
+        total = 0
+        for route, values in sorted(self.latencies.items()):
+            values.sort()
+            total += len(values)
+            routes[route] = {
+                "count": len(values),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(_percentile(values, 50) * 1000, 2),
+                "p95_ms": round(_percentile(values, 95) * 1000, 2),
+                "p99_ms": round(_percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+                "status": {str(k): v for k, v in sorted(self.statuses[route].items())},
+            }
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "routes": routes,
+            "errors": self.errors,
+        }
+
+
+def _percentile(sorted_values, pct):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+# ==================== HTTP 客户端 ====================
+
+class HttpClient:
+    """基于 asyncio 流的最小 HTTP/1.1 客户端（保持连接，服务器关闭连接时自动重连）"""
+
+    def __init__(self, host, port, stats):
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.writer = None
+
+    async def request(self, method, path, route, body=None):
+        """发送请求并记录到 route 名下，返回 (状态码, 解析后的 JSON 或 None)"""
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Connection: keep-alive\r\n"
+        )
+        if body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+        data = head.encode("ascii") + b"\r\n" + payload
+
+        started = time.perf_counter()
+        for attempt in range(2):
+            try:
+                if self.writer is None:
+                    await self._connect()
+                self.writer.write(data)
+                await self.writer.drain()
+                status, headers, raw = await self._read_response()
+                break
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                await self.close()
+                if attempt:
+                    self.stats.error(route, type(e).__name__)
+                    return None, None
+        self.stats.record(route, status, time.perf_counter() - started)
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        status = int(parts[1])
+        version = parts[0]
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            raw = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            raw = await self.reader.read()
+            headers["connection"] = "close"
+        if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+            headers["connection"] = "close"
+        return status, headers, raw
+
+
+# ==================== 客户端行为 ====================
+
+async def _every(interval, stop_at, action):
+    """以固定间隔重复执行（首轮随机错开，避免所有客户端同时请求）"""
+    await asyncio.sleep(random.uniform(0, interval))
+    while time.monotonic() < stop_at:
+        began = time.monotonic()
+        await action()
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - began)))
+
+
+async def run_player(host, port, stats, game_id, player_id, stop_at):
+    """玩家客户端：加入游戏，然后轮询状态与心跳"""
+    client = HttpClient(host, port, stats)
+    await client.request("POST", "/api/player/join_game", "POST /api/player/join_game",
+                         {"game_id": game_id, "player_id": player_id})
+
+    async def poll():
+        await client.request("GET", f"/api/player/game_state/{game_id}/{player_id}",
+                             "GET /api/player/game_state/<game_id>/<player_id>")
+
+    async def heartbeat():
+        await client.request("POST", "/api/player/heartbeat", "POST /api/player/heartbeat",
+                             {"game_id": game_id, "player_id": player_id})
+
+    try:
+        await asyncio.gather(_every(STATE_POLL_INTERVAL, stop_at, poll),
+                             _every(HEARTBEAT_INTERVAL, stop_at, heartbeat))
+    finally:
+        await client.close()
+
+
+async def run_table(host, port, stats, table_index, player_count, stop_at, step_delay):
+    """一张桌子：说书人推进流程，玩家客户端并发轮询"""
+    rng = random.Random(table_index)
+    storyteller = HttpClient(host, port, stats)
+    script_id = SCRIPT_IDS[table_index % len(SCRIPT_IDS)]
+
+    status, created = await storyteller.request("POST", "/api/game/create", "POST /api/game/create",
+                                                {"script_id": script_id, "player_count": player_count,
+                                                 "seed": table_index})
+    if status != 200 or not created:
+        stats.error("POST /api/game/create", f"status {status}")
+        await storyteller.close()
+        return
+    game_id = created["game_id"]
+    base = f"/api/game/{game_id}"
+    await storyteller.request("POST", f"{base}/assign_random", "POST /api/game/<game_id>/assign_random",
+                              {"player_names": [f"桌{table_index}-玩家{i + 1}" for i in range(player_count)]})
+
+    player_ids = list(range(1, player_count + 1))
+    players = [asyncio.ensure_future(run_player(host, port, stats, game_id, pid, stop_at)) for pid in player_ids]
+
+    phase = {"night": False}
+
+    async def refresh_status():
+        await storyteller_poller.request("GET", f"/api/storyteller/player_status/{game_id}",
+                                         "GET /api/storyteller/player_status/<game_id>")
+
+    async def night_polls():
+        if phase["night"]:
+            await storyteller_poller.request("GET", f"/api/storyteller/night_progress/{game_id}",
+                                             "GET /api/storyteller/night_progress/<game_id>")
+            await storyteller_poller.request("GET", f"/api/storyteller/player_choices/{game_id}",
+                                             "GET /api/storyteller/player_choices/<game_id>")
+
+    storyteller_poller = HttpClient(host, port, stats)
+    pollers = [asyncio.ensure_future(_every(STATUS_POLL_INTERVAL, stop_at, refresh_status)),
+               asyncio.ensure_future(_every(NIGHT_POLL_INTERVAL, stop_at, night_polls))]
+
+    async def step():
+        await asyncio.sleep(step_delay * rng.uniform(0.5, 1.5))
+
+    try:
+        while time.monotonic() < stop_at:
+            # 夜晚
+            phase["night"] = True
+            _, night = await storyteller.request("POST", f"{base}/start_night", "POST /api/game/<game_id>/start_night")
+            alive = [p["id"] for p in (night or {}).get("alive_players", [])] or player_ids
+            for item in (night or {}).get("night_order", []):
+                if time.monotonic() >= stop_at:
+                    break
+                await step()
+                pid, action_type = item["player_id"], item["action_type"]
+                target = rng.choice([p for p in alive if p != pid] or alive)
+                if action_type.startswith("info"):
+                    await storyteller.request("POST", f"{base}/generate_info", "POST /api/game/<game_id>/generate_info",
+                                              {"player_id": pid, "info_type": item["role_id"], "targets": [target]})
+                else:
+                    await storyteller.request("POST", "/api/player/night_action", "POST /api/player/night_action",
+                                              {"game_id": game_id, "player_id": pid, "targets": [target],
+                                               "action_type": action_type})
+                    await storyteller.request("POST", f"{base}/night_action", "POST /api/game/<game_id>/night_action",
+                                              {"player_id": pid, "action": action_type, "target": target,
+                                               "action_type": action_type})
+            phase["night"] = False
+
+            # 白天
+            await step()
+            _, day = await storyteller.request("POST", f"{base}/start_day", "POST /api/game/<game_id>/start_day")
+            if (day or {}).get("game_end", {}).get("ended"):
+                break
+            _, state = await storyteller.request("GET", base, "GET /api/game/<game_id>")
+            alive = [p["id"] for p in (state or {}).get("players", []) if p.get("alive")]
+            if len(alive) < 3:
+                break
+            nominator, nominee = rng.sample(alive, 2)
+            _, nominated = await storyteller.request("POST", f"{base}/nominate", "POST /api/game/<game_id>/nominate",
+                                                     {"nominator_id": nominator, "nominee_id": nominee})
+            nomination = (nominated or {}).get("nomination")
+            if nomination:
+                for voter in player_ids:
+                    vote = rng.random() < 0.5
+                    await storyteller.request("POST", "/api/player/vote", "POST /api/player/vote",
+                                              {"game_id": game_id, "player_id": voter,
+                                               "nomination_id": nomination["id"], "vote": vote})
+                    await storyteller.request("POST", f"{base}/vote", "POST /api/game/<game_id>/vote",
+                                              {"nomination_id": nomination["id"], "voter_id": voter, "vote": vote})
+                await step()
+                _, executed = await storyteller.request("POST", f"{base}/execute", "POST /api/game/<game_id>/execute",
+                                                        {"nomination_id": nomination["id"]})
+                if (executed or {}).get("game_end", {}).get("ended"):
+                    break
+            await step()
+    finally:
+        # 桌子结束后玩家与轮询仍保持到测试结束，模拟牌局结束后仍停留在页面的客户端
+        await asyncio.gather(*players, *pollers, return_exceptions=True)
+        await storyteller.close()
+        await storyteller_poller.close()
+
+
+# ==================== 服务器进程 ====================
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch_server(port):
+    """在子进程中启动应用（关闭调试与重载器）"""
+    code = f"from main import app; app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)"
+    return subprocess.Popen([sys.executable, "-c", code], cwd=ROOT_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_for_server(host, port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return True
+        except OSError:
+            await asyncio.sleep(0.1)
+    return False
+
+
+def read_rss_kb(pid):
+    """读取进程常驻内存（KB），非 Linux 或进程不存在时返回 None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(pid, stop_at, samples):
+    while time.monotonic() < stop_at:
+        rss = read_rss_kb(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(1.0)
+
+
+# ==================== 入口 ====================
+
+async def run_load(host, port, tables, player_counts, duration, step_delay, server_pid=None):
+    stats = Stats()
+    stop_at = time.monotonic() + duration
+    rss_samples = []
+    tasks = [run_table(host, port, stats, i, player_counts[i % len(player_counts)], stop_at, step_delay)
+             for i in range(tables)]
+    if server_pid:
+        tasks.append(sample_rss(server_pid, stop_at, rss_samples))
+    await asyncio.gather(*tasks)
+
+    summary = stats.summary()
+    summary["tables"] = tables
+    if rss_samples:
+        summary["server_rss_mb"] = {
+            "start": round(rss_samples[0] / 1024, 1),
+            "peak": round(max(rss_samples) / 1024, 1),
+            "end": round(rss_samples[-1] / 1024, 1),
+        }
+    return summary
+
+
+def print_report(summary):
+    print(f"桌数: {summary['tables']}  时长: {summary['elapsed_s']}s  "
+          f"请求数: {summary['requests']}  吞吐量: {summary['throughput_rps']} req/s")
+    if "server_rss_mb" in summary:
+        rss = summary["server_rss_mb"]
+        print(f"服务器 RSS: 起始 {rss['start']} MB / 峰值 {rss['peak']} MB / 结束 {rss['end']} MB")
+    print(f"{'路由':<58}{'次数':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for route, row in summary["routes"].items():
+        print(f"{route:<58}{row['count']:>8}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+    if summary["errors"]:
+        print("错误:", json.dumps(summary["errors"], ensure_ascii=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="血染钟楼负载测试")
+    parser.add_argument("--tables", type=int, default=5, help="同时进行的桌数")
+    parser.add_argument("--players", nargs="+", type=int, default=[10], help="每桌人数（多个值时轮流使用）")
+    parser.add_argument("--duration", type=float, default=60.0, help="测试时长（秒）")
+    parser.add_argument("--step-delay", type=float, default=1.0, help="说书人每步操作的平均间隔（秒）")
+    parser.add_argument("--url", help="连接已有服务器（不指定时自动启动本地服务器）")
+    parser.add_argument("--server-pid", type=int, help="已有服务器的进程号（用于采样 RSS）")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    for count in args.players:
+        if not 5 <= count <= 16:
+            parser.error("每桌人数必须在5-16之间")
+    if args.tables > 10:
+        print("警告: 服务器最多保留 10 局游戏，超出的桌子会使最早的游戏被清除", file=sys.stderr)
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port, server_pid = parts.hostname, parts.port or 80, args.server_pid
+    else:
+        host, port = "127.0.0.1", _free_port()
+        server = launch_server(port)
+        server_pid = server.pid
+
+    try:
+        if not asyncio.run(wait_for_server(host, port)):
+            print("服务器未能启动", file=sys.stderr)
+            return 1
+        summary = asyncio.run(run_load(host, port, args.tables, args.players, args.duration,
+                                       args.step_delay, server_pid))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_report(summary)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())